@@ -0,0 +1,264 @@
+from DebaterAgent import DebaterAgent
+from JudgeAgent import JudgeAgent
+from DebateEngine import DebateEngine, DebateGraph
+from FeedbackDistiller import FeedbackDistiller
+from DebateCheckpoint import DebateCheckpoint, CheckpointLog, checkpoint_graph
+from llm_scheduler import TaskScheduler, run_scheduled
+from llm_helper import run_sync, warm_up_clients
+from llm_ratelimit import estimate_tokens
+from llm_tracing import tracer
+
+class BaseDebateOrchestrator:
+    """
+    Shared setup and execution of a two-debater debate declared as a `DebateGraph`.
+
+    Subclasses set `title` and implement `build_graph` (and `_print_settings` for their own
+    options); running, checkpointing, resuming and forking the graph are handled here.
+    """
+
+    title: str = "Debate"
+
+    def __init__(self, debater_a: DebaterAgent, debater_b: DebaterAgent, judge: JudgeAgent, topic: str, max_workers_round1: int = 2, warm_up: bool = False,
+                 pipelined: bool = False, engine: DebateEngine = None, scheduler: TaskScheduler = None,
+                 pairwise_judging: bool = False, distill_feedback: bool = True, feedback_distiller: FeedbackDistiller = None,
+                 checkpoints: DebateCheckpoint = None, debate_id: str = None):
+        """
+        Initializes the orchestrator.
+
+        Args:
+            debater_a (DebaterAgent): The first debater.
+            debater_b (DebaterAgent): The second debater.
+            judge (JudgeAgent): The judge.
+            topic (str): The topic of the debate.
+            max_workers_round1 (int): Max workers for parallel argument generation in round 1.
+            warm_up (bool): Open pooled connections to the debater and judge providers now, before round 1.
+            pipelined (bool): Start each step as soon as its inputs are ready instead of in the sequential
+                order. Produces the same debate_history.
+            engine (DebateEngine, optional): Engine to run the debate graph on; share one engine between
+                debates to put them under a single concurrency limit.
+            scheduler (TaskScheduler, optional): Long-lived scheduler for the debaters' LLM calls, shared across
+                debates; also handed to the judge unless it already has one.
+            pairwise_judging (bool): Judge both arguments of a round side by side in one request per layer
+                (`JudgeAgent.aevaluate_pair`) instead of one evaluation per debater.
+            distill_feedback (bool): Feed debaters a compact list of actionable points distilled from the judge's
+                feedback instead of the full judge output (which is still stored in debate_history).
+            feedback_distiller (FeedbackDistiller, optional): Distiller to use; defaults to local distillation.
+            checkpoints (DebateCheckpoint, optional): Write-ahead log store; every completed step is appended to
+                it as soon as it exists, so an interrupted debate can be continued with `resume`.
+            debate_id (str, optional): Id of the debate's log; generated if not given.
+        """
+        self.debater_a = debater_a
+        self.debater_b = debater_b
+        self.judge = judge
+        self.topic = topic
+        self.debate_history = [] # One dict per judged turn, appended by the graph's record tasks
+        self.max_workers_round1 = max_workers_round1 # Typically 2 for two debaters
+        self.pipelined = pipelined
+        self.engine = engine or DebateEngine()
+        self.scheduler = scheduler
+        self.pairwise_judging = pairwise_judging
+        self.feedback_distiller = (feedback_distiller or FeedbackDistiller()) if distill_feedback else None
+        if scheduler is not None and self.judge.scheduler is None:
+            self.judge.scheduler = scheduler
+        self.checkpoints = checkpoints
+        self.debate_id = debate_id
+        self.final_judgement = None
+        print(f"\n--- Starting {self.title} on Topic: {self.topic} ---")
+        print(f"Debater A: {self.debater_a.name} ({self.debater_a.stance})")
+        print(f"Debater B: {self.debater_b.name} ({self.debater_b.stance})")
+        print(f"Judge: {self.judge.name}")
+        if warm_up:
+            warm_up_clients([self.debater_a.model_name, self.debater_b.model_name, self.judge.model_name],
+                            connections=self.judge.max_workers)
+        self._print_settings()
+
+    def _print_settings(self):
+        """Prints the orchestrator's scheduling and judging options after the debate header."""
+
+    async def _generate_argument_task(self, debater: DebaterAgent, opponent_argument: str = None, feedback: str = None) -> tuple[str, str]:
+        """
+        Helper coroutine to wrap argument generation for parallel execution.
+
+        Errors are logged and re-raised, so a failed step is never recorded (or checkpointed) as an argument.
+        """
+        try:
+            argument = await run_scheduled(self.scheduler, debater.agenerate_argument, self.topic, opponent_argument, feedback)
+            return debater.name, argument
+        except Exception as e:
+            print(f"Error generating argument for {debater.name}: {e}")
+            raise
+
+    async def _opening_task(self, debater: DebaterAgent) -> str:
+        """Graph task: generates a debater's opening argument."""
+        debater_name, argument = await self._generate_argument_task(debater)
+        print(f"Opening argument generated for: {debater_name}")
+        print(f"\n{debater_name}'s Opening Argument:\n{argument}")
+        return argument
+
+    async def _turn_task(self, debater: DebaterAgent, opponent_argument: str, own_feedback: str) -> str:
+        """Graph task: generates a rebuttal to the opponent's latest argument using the debater's own last feedback."""
+        print(f"\n{debater.name}'s Turn:")
+        argument = await run_scheduled(self.scheduler, debater.agenerate_argument, self.topic, opponent_argument, own_feedback)
+        print(f"Argument: {argument}")
+        return argument
+
+    async def _distill_task(self, debater: DebaterAgent, evaluation: tuple[str, dict]) -> str:
+        """Graph task: turns the judge's evaluation into the feedback the debater works from."""
+        feedback_text, scores = evaluation
+        if self.feedback_distiller is None:
+            return feedback_text
+        distilled = await self.feedback_distiller.adistill(feedback_text, scores, debater.model_name)
+        print(f"Distilled feedback for {debater.name}: ~{estimate_tokens(feedback_text)} -> ~{estimate_tokens(distilled)} tokens")
+        return distilled
+
+    def build_graph(self, num_rounds: int = 3, declare_winner: bool = False) -> DebateGraph:
+        """
+        Declares the debate as a task graph.
+
+        Args:
+            num_rounds (int): The number of rounds for the debate.
+            declare_winner (bool): Add a final task asking the judge for the winner.
+
+        Returns:
+            DebateGraph: The graph to run on the engine.
+        """
+        raise NotImplementedError
+
+    async def arun_debate(self, num_rounds: int = 3, declare_winner: bool = False):
+        """
+        Executes the debate for a specified number of rounds.
+
+        With `checkpoints`, every step is logged as soon as it completes (see `resume`).
+
+        Args:
+            num_rounds (int): The number of rounds for the debate.
+            declare_winner (bool): Ask the judge for the winner once all rounds are done.
+
+        Returns:
+            list: The debate history.
+        """
+        graph = self.build_graph(num_rounds, declare_winner)
+        log = None
+        if self.checkpoints is not None:
+            self.debate_id = self.debate_id or DebateCheckpoint.new_debate_id()
+            log = self.checkpoints.begin(self.debate_id, self, num_rounds, declare_winner)
+            graph = checkpoint_graph(graph, log, {"A": self.debater_a, "B": self.debater_b})
+            print(f"Checkpointing debate {self.debate_id} to {log.path}")
+        return await self._run_graph(graph, num_rounds, declare_winner, log)
+
+    async def _run_graph(self, graph: DebateGraph, num_rounds: int, declare_winner: bool, log: CheckpointLog = None):
+        """Runs the debate graph (checkpointed if `log` is given), then reports the outcome."""
+        try:
+            with tracer.span(f"{self.debater_a.name} vs {self.debater_b.name}: {self.topic}", kind="debate",
+                             orchestrator=type(self).__name__, rounds=num_rounds, pipelined=self.pipelined,
+                             judge_mode="layered" if self.judge.use_strategic_layers else "comprehensive"):
+                results = await self.engine.run(graph)
+            if log is not None:
+                log.complete()
+        finally:
+            if log is not None:
+                log.close()
+
+        # --- End of Debate ---
+        print(f"\n--- {self.title} Concluded after {num_rounds} Rounds ---")
+
+        # Final Judgement
+        if declare_winner:
+            self.final_judgement = results["declare_winner"]
+            print("\n--- Final Judgement ---")
+            print(self.final_judgement)
+
+        return self.debate_history
+
+    def run_debate(self, num_rounds: int = 3, declare_winner: bool = False):
+        """
+        Executes the debate for a specified number of rounds.
+        Blocking wrapper around `arun_debate`.
+
+        Args:
+            num_rounds (int): The number of rounds for the debate.
+            declare_winner (bool): Ask the judge for the winner once all rounds are done.
+
+        Returns:
+            list: The debate history.
+        """
+        return run_sync(self.arun_debate(num_rounds, declare_winner))
+
+    async def aresume(self, debate_id: str):
+        """
+        Continues a checkpointed debate from its first unfinished steps.
+
+        Restores the debaters' contexts from the log in `checkpoints`, rebuilds debate_history from
+        the logged steps, and runs only the steps that never completed, with the debate's original
+        number of rounds. The orchestrator must be built with the same topic and debaters.
+
+        Args:
+            debate_id (str): The debate to resume (see `DebateCheckpoint.list_debates`).
+
+        Returns:
+            list: The debate history.
+        """
+        if self.checkpoints is None:
+            raise ValueError("Resuming a debate needs a checkpoint store (pass `checkpoints`).")
+        log = self.checkpoints.resume(debate_id, self)
+        print(f"\n--- Resuming debate {debate_id} with {len(log.completed)} completed steps ---")
+        return await self._run_from_log(log)
+
+    async def _run_from_log(self, log: CheckpointLog):
+        """Runs the steps of a resumed or forked debate that are not in its log."""
+        self.debate_id = log.header["debate_id"]
+        self.debate_history = []
+        self.final_judgement = None
+        num_rounds, declare_winner = log.header["num_rounds"], log.header["declare_winner"]
+        graph = checkpoint_graph(self.build_graph(num_rounds, declare_winner), log, {"A": self.debater_a, "B": self.debater_b})
+        return await self._run_graph(graph, num_rounds, declare_winner, log)
+
+    def resume(self, debate_id: str):
+        """
+        Continues a checkpointed debate from its first unfinished steps.
+        Blocking wrapper around `aresume`.
+
+        Args:
+            debate_id (str): The debate to resume.
+
+        Returns:
+            list: The debate history.
+        """
+        return run_sync(self.aresume(debate_id))
+
+    async def afork(self, parent_id: str, after_step: str = None, after_round: int = None, num_rounds: int = None,
+                    declare_winner: bool = None):
+        """
+        Runs this orchestrator as a variant of a checkpointed debate from a fork point on.
+
+        The steps up to the fork point are taken from the parent's log (not recomputed, and not
+        copied into the variant's log) and the debaters start from their contexts at that point;
+        everything after it runs with this orchestrator's judge and settings. Several variants can
+        fork the same parent concurrently (see `DebateCheckpoint.afork_variants`), each with its own agents.
+
+        Args:
+            parent_id (str): The debate to fork.
+            after_step (str, optional): Fork after this step (e.g. 'evaluate_B_2').
+            after_round (int, optional): Fork after this round.
+            num_rounds (int, optional): Rounds of the variant; defaults to the parent's.
+            declare_winner (bool, optional): Defaults to the parent's setting.
+
+        Returns:
+            list: The variant's debate history, inherited turns included.
+        """
+        if self.checkpoints is None:
+            raise ValueError("Forking a debate needs a checkpoint store (pass `checkpoints`).")
+        log = self.checkpoints.fork(parent_id, self, after_step, after_round, num_rounds, declare_winner, self.debate_id)
+        print(f"\n--- Forking debate {parent_id} into {log.header['debate_id']} with {len(log.completed)} shared steps ---")
+        return await self._run_from_log(log)
+
+    def fork(self, parent_id: str, after_step: str = None, after_round: int = None, num_rounds: int = None,
+             declare_winner: bool = None):
+        """
+        Runs this orchestrator as a variant of a checkpointed debate from a fork point on.
+        Blocking wrapper around `afork`.
+
+        Returns:
+            list: The variant's debate history.
+        """
+        return run_sync(self.afork(parent_id, after_step, after_round, num_rounds, declare_winner))
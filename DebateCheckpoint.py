@@ -0,0 +1,333 @@
+import os
+import json
+import uuid
+import asyncio
+import inspect
+from datetime import datetime
+from typing import Any, Dict, List
+from DebateEngine import DebateGraph
+from llm_helper import run_sync
+
+
+class CheckpointLog:
+    """
+    The write-ahead log of one debate: a JSON-lines file that every completed step is appended to.
+
+    Entries are {"type": "start", ...header} once, then {"type": "step", "task", "result"} per
+    completed step other than recording a turn (with {"context"} — the debater's conversation
+    state — after a generate step), {"type": "resume"} whenever the debate is picked up again,
+    and {"type": "complete"}.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any], completed: Dict[str, Any] = None,
+                 contexts: Dict[str, Dict[str, Any]] = None, fsync: bool = True):
+        self.path = path
+        self.header = header
+        self.completed = completed or {} # task name -> logged result
+        self.contexts = contexts or {} # debater name -> latest conversation state
+        self.fsync = fsync
+        self._file = open(path, "a", encoding="utf-8")
+
+    def append(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync: # the step survives a crash of the whole machine, not just of the process
+            os.fsync(self._file.fileno())
+
+    def record_step(self, task: str, result: Any, context: Dict[str, Any] = None):
+        entry = {"type": "step", "task": task, "result": result}
+        if context is not None:
+            entry["context"] = context
+        self.append(entry)
+        self.completed[task] = result
+
+    def complete(self):
+        """Marks the debate as finished and closes the log."""
+        self.append({"type": "complete", "time": datetime.now().isoformat()})
+        self.close()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class DebateCheckpoint:
+    """
+    Directory of per-debate write-ahead logs, so an interrupted debate can be resumed.
+
+    Pass one to an orchestrator as `checkpoints`: each LLM step (argument, evaluation,
+    distilled feedback, improved argument, re-evaluation, final judgement) is appended to
+    `<directory>/<debate_id>.jsonl` as soon as it finishes, and `orchestrator.resume(debate_id)`
+    rebuilds the debaters' contexts and the debate history from it, then runs only the steps
+    that never finished. `orchestrator.fork(parent_id, ...)` starts a variant from any step or
+    round of a logged debate; its log references the parent's instead of copying the shared prefix.
+    """
+
+    def __init__(self, directory: str = "checkpoints", fsync: bool = True):
+        """
+        Initializes the store.
+
+        Args:
+            directory (str): Where the logs are kept; created if missing.
+            fsync (bool): Force every entry to disk before the debate continues.
+        """
+        self.directory = directory
+        self.fsync = fsync
+        self._finished: Dict[str, Dict[str, Any]] = {} # loaded logs of completed debates, which no longer change
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, debate_id: str) -> str:
+        return os.path.join(self.directory, f"{debate_id}.jsonl")
+
+    @staticmethod
+    def new_debate_id() -> str:
+        return uuid.uuid4().hex[:12]
+
+    def _header(self, debate_id: str, orchestrator: Any, num_rounds: int, declare_winner: bool) -> Dict[str, Any]:
+        return {
+            "type": "start",
+            "debate_id": debate_id,
+            "time": datetime.now().isoformat(),
+            "orchestrator": type(orchestrator).__name__,
+            "topic": orchestrator.topic,
+            "debater_a": orchestrator.debater_a.name,
+            "debater_b": orchestrator.debater_b.name,
+            "judge": orchestrator.judge.name,
+            "num_rounds": num_rounds,
+            "declare_winner": declare_winner,
+        }
+
+    def _new_log(self, header: Dict[str, Any], completed: Dict[str, Any] = None, contexts: Dict[str, Dict[str, Any]] = None) -> CheckpointLog:
+        path = self.path(header["debate_id"])
+        if os.path.exists(path):
+            raise FileExistsError(f"Debate {header['debate_id']} already has a checkpoint log at {path}; resume it instead.")
+        log = CheckpointLog(path, header, completed, contexts, fsync=self.fsync)
+        log.append(header)
+        return log
+
+    def begin(self, debate_id: str, orchestrator: Any, num_rounds: int, declare_winner: bool) -> CheckpointLog:
+        """Starts the log of a new debate; raises FileExistsError if the id is taken (use `resume` instead)."""
+        return self._new_log(self._header(debate_id, orchestrator, num_rounds, declare_winner))
+
+    def load(self, debate_id: str) -> Dict[str, Any]:
+        """
+        Reads a debate's log; for a fork, the parent's steps up to the fork point come first.
+
+        Returns:
+            Dict[str, Any]: {"header", "steps" (step entries in completion order), "completed" (task -> result),
+            "contexts" (debater -> latest state), "complete" (bool)}. A torn last line from a crash mid-write is ignored.
+            Completed debates are read once, so forks of them share the prefix's result objects.
+        """
+        if debate_id in self._finished:
+            return self._finished[debate_id]
+        path = self.path(debate_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No checkpoint log for debate {debate_id} in {self.directory}")
+        header, steps, complete = None, [], False
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry["type"] == "start":
+                    header = entry
+                elif entry["type"] == "step":
+                    steps.append(entry)
+                elif entry["type"] == "complete":
+                    complete = True
+        if header is None:
+            raise ValueError(f"Checkpoint log {path} has no start entry")
+        if "parent" in header:
+            steps = self._prefix(self.load(header["parent"])["steps"], **header["fork"]) + steps
+        state = {"header": header, "steps": steps, "complete": complete, **_replayed_state(steps)}
+        if complete:
+            self._finished[debate_id] = state
+        return state
+
+    @staticmethod
+    def _prefix(steps: List[Dict[str, Any]], after_step: str = None, after_round: int = None) -> List[Dict[str, Any]]:
+        """The steps a fork inherits: everything logged up to and including `after_step`, or every step of rounds <= `after_round`."""
+        if after_round is not None:
+            return [step for step in steps if _round(step["task"]) is not None and _round(step["task"]) <= after_round]
+        names = [step["task"] for step in steps]
+        if after_step not in names:
+            raise ValueError(f"Step '{after_step}' is not in the parent debate's log")
+        return steps[:names.index(after_step) + 1]
+
+    def _check(self, debate_id: str, header: Dict[str, Any], orchestrator: Any):
+        expected = {"orchestrator": type(orchestrator).__name__, "topic": orchestrator.topic,
+                    "debater_a": orchestrator.debater_a.name, "debater_b": orchestrator.debater_b.name}
+        mismatched = [key for key, value in expected.items() if header.get(key) != value]
+        if mismatched:
+            raise ValueError(f"Debate {debate_id} was started with a different {', '.join(mismatched)}")
+
+    @staticmethod
+    def _restore_contexts(orchestrator: Any, contexts: Dict[str, Dict[str, Any]]):
+        for debater in (orchestrator.debater_a, orchestrator.debater_b):
+            if debater.name in contexts:
+                debater.memory.restore(contexts[debater.name])
+                debater.memory.schedule_compaction() # redo a summarization that was still running when the step was logged
+
+    def resume(self, debate_id: str, orchestrator: Any) -> CheckpointLog:
+        """
+        Reopens a debate's log for `orchestrator` and restores its debaters' conversation contexts.
+
+        Must be called on the event loop the debate will run on. The orchestrator must be built
+        with the same topic and debaters the debate was started with.
+
+        Returns:
+            CheckpointLog: The log, with the completed steps to skip and the original `num_rounds`/`declare_winner`.
+        """
+        state = self.load(debate_id)
+        header = state["header"]
+        self._check(debate_id, header, orchestrator)
+        self._restore_contexts(orchestrator, state["contexts"])
+        path = self.path(debate_id)
+        with open(path, "rb") as f: # don't glue the next entry onto a torn last line
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+        log = CheckpointLog(path, header, dict(state["completed"]), dict(state["contexts"]), fsync=self.fsync)
+        if torn:
+            log._file.write("\n")
+        log.append({"type": "resume", "time": datetime.now().isoformat(), "completed_steps": len(state["completed"])})
+        return log
+
+    def fork(self, parent_id: str, orchestrator: Any, after_step: str = None, after_round: int = None, num_rounds: int = None,
+             declare_winner: bool = None, debate_id: str = None) -> CheckpointLog:
+        """
+        Starts a variant of a logged debate that shares its steps up to a fork point.
+
+        The variant's log holds only a reference to the parent and the fork point, then its own
+        steps; the shared prefix stays in the parent's log. `orchestrator` (the variant, e.g. with a
+        different judge or improvement prompt) gets the debaters' contexts as of the fork point.
+        Each variant needs its own agents, since their contexts diverge. Must be called on the event
+        loop the variant will run on.
+
+        Args:
+            parent_id (str): Debate to fork (itself possibly a fork).
+            orchestrator (Any): The variant; same orchestrator class, topic and debater names as the parent.
+            after_step (str, optional): Fork after this step (e.g. 'evaluate_B_2'), inheriting everything logged up to it.
+            after_round (int, optional): Fork after this round, inheriting every step of rounds up to it.
+            num_rounds (int, optional): Rounds of the variant; defaults to the parent's.
+            declare_winner (bool, optional): Defaults to the parent's setting.
+            debate_id (str, optional): Id of the variant; generated if not given.
+
+        Returns:
+            CheckpointLog: The variant's log, with the inherited steps as completed.
+        """
+        if (after_step is None) == (after_round is None):
+            raise ValueError("Give exactly one of after_step and after_round.")
+        parent = self.load(parent_id)
+        self._check(parent_id, parent["header"], orchestrator)
+        fork_point = {"after_step": after_step} if after_step is not None else {"after_round": after_round}
+        header = self._header(debate_id or self.new_debate_id(), orchestrator,
+                              num_rounds if num_rounds is not None else parent["header"]["num_rounds"],
+                              declare_winner if declare_winner is not None else parent["header"]["declare_winner"])
+        header.update(parent=parent_id, fork=fork_point)
+        prefix = _replayed_state(self._prefix(parent["steps"], **fork_point))
+        self._restore_contexts(orchestrator, prefix["contexts"])
+        return self._new_log(header, prefix["completed"], prefix["contexts"])
+
+    def list_debates(self) -> List[Dict[str, Any]]:
+        """Returns the header of every logged debate, with its number of completed steps and whether it finished."""
+        debates = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".jsonl"):
+                state = self.load(filename[:-len(".jsonl")])
+                debates.append({**state["header"], "completed_steps": len(state["completed"]), "complete": state["complete"]})
+        return debates
+
+
+def _round(task: str) -> int:
+    suffix = task.rsplit("_", 1)[-1]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def _replayed_state(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    completed, contexts = {}, {}
+    for step in steps:
+        completed[step["task"]] = step["result"]
+        if "context" in step:
+            contexts[step["context"]["debater"]] = step["context"]["state"]
+    return {"completed": completed, "contexts": contexts}
+
+
+def _replay(result: Any):
+    return lambda *args: result
+
+
+def _logged(fn: Any, name: str, log: CheckpointLog, debater: Any):
+    async def run(*args):
+        result = fn(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        context = {"debater": debater.name, "state": debater.memory.state()} if debater is not None else None
+        log.record_step(name, result, context)
+        return result
+    return run
+
+
+def checkpoint_graph(graph: DebateGraph, log: CheckpointLog, debaters: Dict[str, Any]) -> DebateGraph:
+    """
+    Wires a debate graph to its write-ahead log.
+
+    Steps already in the log return their logged result (as 'local' tasks, with no LLM call);
+    every other step appends its result when it finishes, and a generate step also the
+    debater's conversation state. Per-debater results split out of a pairwise step are logged
+    too, so a fork can switch judging mode: a step whose results only feed replayed steps (the
+    pairwise evaluation of a round whose per-debater evaluations were logged, or the reverse) is
+    skipped. Recording turns is never logged: it reruns from the logged results, which rebuilds
+    debate_history in order.
+
+    Args:
+        graph (DebateGraph): Graph from the orchestrator's `build_graph`.
+        log (CheckpointLog): The debate's log.
+        debaters (Dict[str, Any]): Debater per tag ('A', 'B'), the tag being the second part of task names.
+
+    Returns:
+        DebateGraph: The same graph, modified.
+    """
+    replayed = {name for name in graph.tasks if name in log.completed}
+    consumers: Dict[str, List[str]] = {}
+    for task in graph.tasks.values():
+        for name in task.inputs:
+            consumers.setdefault(name, []).append(task.name)
+    unneeded = True
+    while unneeded:
+        unneeded = {name for name, used_by in consumers.items()
+                    if name not in replayed and all(consumer in replayed for consumer in used_by)}
+        replayed |= unneeded
+    for task in graph.tasks.values():
+        if task.name in replayed:
+            task.fn, task.kind = _replay(log.completed.get(task.name)), "local"
+        elif not task.name.startswith("record_"):
+            parts = task.name.split("_")
+            debater = debaters.get(parts[1]) if task.kind == "generate" and len(parts) > 2 else None
+            task.fn = _logged(task.fn, task.name, log, debater)
+    return graph
+
+
+async def afork_variants(parent_id: str, variants: List[Any], after_step: str = None, after_round: int = None,
+                         num_rounds: int = None) -> List[list]:
+    """
+    Runs several variants of a checkpointed debate concurrently from the same fork point.
+
+    Args:
+        parent_id (str): The debate to fork.
+        variants (List[Any]): Orchestrators with their own agents and a `checkpoints` store, differing in
+            judge, settings or improvement prompt.
+        after_step (str, optional): Fork after this step.
+        after_round (int, optional): Fork after this round.
+        num_rounds (int, optional): Rounds of every variant; defaults to the parent's.
+
+    Returns:
+        List[list]: The variants' debate histories, in order.
+    """
+    return list(await asyncio.gather(*[variant.afork(parent_id, after_step, after_round, num_rounds) for variant in variants]))
+
+
+def fork_variants(parent_id: str, variants: List[Any], after_step: str = None, after_round: int = None,
+                  num_rounds: int = None) -> List[list]:
+    """Blocking wrapper around `afork_variants`."""
+    return run_sync(afork_variants(parent_id, variants, after_step, after_round, num_rounds))
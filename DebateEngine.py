@@ -0,0 +1,186 @@
+import time
+import asyncio
+import inspect
+from typing import Any, Callable, Dict, Iterable, List
+from llm_tracing import tracer
+
+
+class GraphTask:
+    """A single step of a debate graph (generate, evaluate, improve, record, declare winner, ...)."""
+
+    def __init__(self, name: str, fn: Callable, inputs: Iterable[str] = (), after: Iterable[str] = (), kind: str = "local"):
+        """
+        Initializes the task.
+
+        Args:
+            name (str): Unique task name within the graph (e.g. 'generate_A_2').
+            fn (Callable): Sync or async callable; receives the results of `inputs` as positional arguments.
+            inputs (Iterable[str]): Tasks whose results this task consumes (data dependencies).
+            after (Iterable[str]): Tasks that must finish first without passing a value (ordering dependencies).
+            kind (str): 'generate', 'evaluate', 'distill', 'improve', 'declare_winner' or 'local'. Non-local tasks
+                count against the engine's concurrency limit; 'local' bookkeeping does not.
+        """
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.after = list(after)
+        self.kind = kind
+
+    @property
+    def dependencies(self) -> List[str]:
+        return list(dict.fromkeys(self.inputs + self.after))
+
+    @property
+    def round(self) -> int:
+        """The round a task belongs to, by the '<step>_<tag>_<round>' naming convention; None if not numbered."""
+        suffix = self.name.rsplit("_", 1)[-1]
+        return int(suffix) if suffix.isdigit() else None
+
+
+class DebateGraph:
+    """A debate format declared as tasks with explicit data and ordering dependencies."""
+
+    def __init__(self):
+        self.tasks: Dict[str, GraphTask] = {}
+
+    def add(self, name: str, fn: Callable, inputs: Iterable[str] = (), after: Iterable[str] = (), kind: str = "local") -> str:
+        """Adds a task (see `GraphTask`) and returns its name, so it can be used as a dependency."""
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task name: {name}")
+        self.tasks[name] = GraphTask(name, fn, inputs, after, kind)
+        return name
+
+    def chain(self, names: Iterable[str]):
+        """Adds ordering edges so the given tasks run one after another (used for sequential schedules)."""
+        names = list(names)
+        for previous, current in zip(names, names[1:]):
+            if previous not in self.tasks[current].dependencies:
+                self.tasks[current].after.append(previous)
+
+    def validate(self):
+        """Raises ValueError on unknown dependencies or cycles."""
+        for task in self.tasks.values():
+            for dep in task.dependencies:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task '{task.name}' depends on unknown task '{dep}'")
+        remaining = {name: len(task.dependencies) for name, task in self.tasks.items()}
+        dependents = self._dependents()
+        ready = [name for name, count in remaining.items() if count == 0]
+        visited = 0
+        while ready:
+            name = ready.pop()
+            visited += 1
+            for child in dependents[name]:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    ready.append(child)
+        if visited != len(self.tasks):
+            raise ValueError("Debate graph contains a cycle")
+
+    def _dependents(self) -> Dict[str, List[str]]:
+        dependents = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.dependencies:
+                dependents[dep].append(task.name)
+        return dependents
+
+
+class DebateEngine:
+    """
+    Runs a `DebateGraph` with maximal parallelism: every task starts as soon as all of its
+    dependencies have finished, with at most `max_concurrency` non-local tasks running at once.
+
+    One engine can be shared by many debates to put them under a single concurrency limit;
+    they must then run on the same event loop (the sync `run_debate` wrappers all do).
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        """
+        Initializes the engine.
+
+        Args:
+            max_concurrency (int, optional): Max concurrently running non-local tasks; None for unlimited.
+        """
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self.task_timings: List[tuple] = [] # (task name, kind, seconds) of every finished task
+
+    async def _timed(self, task: GraphTask, args: List[Any], parent=None) -> Any:
+        started = time.monotonic()
+        with tracer.span(task.name, kind=task.kind, parent=parent, dependencies=task.dependencies):
+            result = task.fn(*args)
+            if inspect.isawaitable(result):
+                result = await result
+        self.task_timings.append((task.name, task.kind, time.monotonic() - started))
+        return result
+
+    async def _execute(self, task: GraphTask, results: Dict[str, Any], parent=None) -> Any:
+        args = [results[name] for name in task.inputs]
+        if task.kind == "local" or self.max_concurrency is None:
+            return await self._timed(task, args, parent)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await self._timed(task, args, parent)
+
+    def phase_stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns count, total, mean and max seconds of the finished tasks per kind (time waiting for a slot excluded)."""
+        stats = {}
+        for _, kind, seconds in self.task_timings:
+            entry = stats.setdefault(kind, {"count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+        for entry in stats.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return stats
+
+    async def run(self, graph: DebateGraph) -> Dict[str, Any]:
+        """
+        Executes every task of the graph.
+
+        Args:
+            graph (DebateGraph): The graph to run.
+
+        Returns:
+            Dict[str, Any]: Task name -> result. If a task raises, the tasks still running are
+            cancelled and the exception is propagated.
+        """
+        graph.validate()
+        dependents = graph._dependents()
+        remaining = {name: len(task.dependencies) for name, task in graph.tasks.items()}
+        results: Dict[str, Any] = {}
+        running: Dict[asyncio.Future, str] = {}
+        rounds = {} # round -> its tracing span, from the first of its tasks starting to the last finishing
+        round_ends = {}
+
+        def start(name: str):
+            task = graph.tasks[name]
+            parent = None
+            if tracer.enabled and task.round is not None:
+                if task.round not in rounds:
+                    rounds[task.round] = tracer.start_span(f"round {task.round}", kind="round", round=task.round)
+                parent = rounds[task.round]
+            running[asyncio.ensure_future(self._execute(task, results, parent))] = name
+
+        for name, count in remaining.items():
+            if count == 0:
+                start(name)
+        try:
+            while running:
+                done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    if graph.tasks[name].round in rounds:
+                        round_ends[graph.tasks[name].round] = time.monotonic()
+                    for child in dependents[name]:
+                        remaining[child] -= 1
+                        if remaining[child] == 0:
+                            start(child)
+        finally:
+            for future in running:
+                future.cancel()
+            for round_num, span in rounds.items():
+                tracer.finish(span, round_ends.get(round_num))
+        return results
@@ -1,145 +1,104 @@
-import concurrent.futures
+from functools import partial
+from operator import itemgetter
 from DebaterAgent import DebaterAgent # Assuming DebaterAgent.py is accessible
-from JudgeAgent import JudgeAgent # Assuming JudgeAgent.py is accessible
+from DebateEngine import DebateGraph
+from BaseDebateOrchestrator import BaseDebateOrchestrator
 
-class DebateOrchestrator:
-    """Manages the flow of the debate between agents. Allows parallel generation for Round 1."""
+class DebateOrchestrator(BaseDebateOrchestrator):
+    """
+    Manages the flow of the debate between agents. Allows parallel generation for Round 1.
+    The debate format is declared as a `DebateGraph` and executed by a `DebateEngine`;
+    debate_history holds {"round", "debater", "argument", "feedback", "scores"} per turn.
+    With `pipelined`, judge evaluations run concurrently with the opponent's next argument.
+    """
 
-    def __init__(self, debater_a: DebaterAgent, debater_b: DebaterAgent, judge: JudgeAgent, topic: str, max_workers_round1: int = 2):
-        """
-        Initializes the orchestrator.
+    title = "Debate"
 
-        Args:
-            debater_a (DebaterAgent): The first debater.
-            debater_b (DebaterAgent): The second debater.
-            judge (JudgeAgent): The judge.
-            topic (str): The topic of the debate.
-            max_workers_round1 (int): Max workers for parallel argument generation in round 1.
-        """
-        self.debater_a = debater_a
-        self.debater_b = debater_b
-        self.judge = judge
-        self.topic = topic
-        self.debate_history = [] # Stores dicts: {"round": int, "debater": str, "argument": str, "feedback": str}
-        self.max_workers_round1 = max_workers_round1 # Typically 2 for two debaters
-        print(f"\n--- Starting Debate on Topic: {self.topic} ---")
-        print(f"Debater A: {self.debater_a.name} ({self.debater_a.stance})")
-        print(f"Debater B: {self.debater_b.name} ({self.debater_b.stance})")
-        print(f"Judge: {self.judge.name}")
+    def _print_settings(self):
         print(f"Parallel Argument Generation for Round 1: Enabled (Max Workers: {self.max_workers_round1})")
-
-    def _generate_argument_task(self, debater: DebaterAgent, opponent_argument: str = None, feedback: str = None) -> tuple[str, str]:
-        """Helper function to wrap argument generation for parallel execution."""
-        try:
-            argument = debater.generate_argument(self.topic, opponent_argument, feedback)
-            return debater.name, argument
-        except Exception as e:
-            print(f"Error generating argument for {debater.name}: {e}")
-            return debater.name, f"Error generating argument: {e}"
-
-    def run_debate(self, num_rounds: int = 3):
+        print(f"Pipelined Judging: {'Enabled' if self.pipelined else 'Disabled'}")
+        print(f"Pairwise Judging: {'Enabled' if self.pairwise_judging else 'Disabled'}")
+
+    async def _evaluate_task(self, debater: DebaterAgent, round_num: int, argument: str) -> tuple[str, dict]:
+        """Graph task: judges an argument, returning (feedback_text, scores)."""
+        return await self.judge.aevaluate_argument(argument, debater.name, self.topic, round_num)
+
+    async def _evaluate_pair_task(self, round_num: int, argument_a: str, argument_b: str) -> tuple:
+        """Graph task: judges both arguments of a round together, returning A's and B's (feedback_text, scores)."""
+        return await self.judge.aevaluate_pair(argument_a, self.debater_a.name, argument_b, self.debater_b.name, self.topic, round_num)
+
+    def _record_turn(self, round_num: int, debater: DebaterAgent, argument: str, evaluation: tuple[str, dict]):
+        """Graph task: prints a judged turn and appends it to the debate history."""
+        feedback_text, scores = evaluation
+        print(f"Feedback from {self.judge.name} for {debater.name}:\n{feedback_text}")
+        print(f"Scores for {debater.name}: {scores}")
+        self.debate_history.append({
+            "round": round_num,
+            "debater": debater.name,
+            "argument": argument,
+            "feedback": feedback_text, # Store text feedback
+            "scores": scores # Store scores dictionary
+        })
+
+    def build_graph(self, num_rounds: int = 3, declare_winner: bool = False) -> DebateGraph:
         """
-        Executes the debate for a specified number of rounds.
-        Round 1 arguments are generated in parallel. Subsequent rounds are sequential.
+        Declares the debate as a task graph.
+
+        Each debater's argument in round i depends on the opponent's latest argument and on the
+        judge's feedback on their own previous argument; the evaluation of A's argument is
+        therefore independent of B's next argument (with `pairwise_judging`, both evaluations of a
+        round come from one task that waits for both arguments). Record tasks are chained so turns land in
+        debate_history in A1, B1, A2, B2, ... order. Without `pipelined`, ordering edges
+        reproduce the sequential schedule.
 
         Args:
             num_rounds (int): The number of rounds for the debate.
-        """
-        argument_a = None
-        argument_b = None
-        feedback_a = None
-        feedback_b = None
-
-        for i in range(1, num_rounds + 1):
-            print(f"\n--- Round {i} ---")
-
-            # --- Round 1: Parallel Argument Generation ---
-            if i == 1:
-                print("\nGenerating opening arguments in parallel...")
-                round1_args = {}
-                with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers_round1) as executor:
-                    # Submit tasks for both debaters
-                    future_a = executor.submit(self._generate_argument_task, self.debater_a)
-                    future_b = executor.submit(self._generate_argument_task, self.debater_b)
-
-                    # Collect results as they complete
-                    for future in concurrent.futures.as_completed([future_a, future_b]):
-                        debater_name, argument = future.result()
-                        round1_args[debater_name] = argument
-                        print(f"Opening argument generated for: {debater_name}")
-
-                argument_a = round1_args.get(self.debater_a.name, "Error: Failed to generate argument A")
-                argument_b = round1_args.get(self.debater_b.name, "Error: Failed to generate argument B")
-
-                print(f"\n{self.debater_a.name}'s Opening Argument:\n{argument_a}")
-                feedback_a_text, scores_a = self.judge.evaluate_argument(argument_a, self.debater_a.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_a.name}:\n{feedback_a_text}")
-                print(f"Scores for {self.debater_a.name}: {scores_a}")
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_a.name,
-                    "argument": argument_a,
-                    "feedback": feedback_a_text, # Store text feedback
-                    "scores": scores_a # Store scores dictionary
-                })
-                feedback_a = feedback_a_text
-
-                print(f"\n{self.debater_b.name}'s Opening Argument:\n{argument_b}")
-                feedback_b_text, scores_b = self.judge.evaluate_argument(argument_b, self.debater_b.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_b.name}:\n{feedback_b_text}")
-                print(f"Scores for {self.debater_b.name}: {scores_b}")
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_b.name,
-                    "argument": argument_b,
-                    "feedback": feedback_b_text, # Store text feedback
-                    "scores": scores_b # Store scores dictionary
-                })
-                feedback_b = feedback_b_text
-
-            # --- Rounds 2+: Sequential Argument Generation ---
-            else:
-                # Debater A's turn
-                print(f"\n{self.debater_a.name}'s Turn:")
-                # Debater A uses Debater B's *previous* argument and its *own* previous feedback
-                argument_a = self.debater_a.generate_argument(self.topic, argument_b, feedback_a)
-                print(f"Argument: {argument_a}")
-                feedback_a_text, scores_a = self.judge.evaluate_argument(argument_a, self.debater_a.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_a.name}:\n{feedback_a_text}")
-                print(f"Scores for {self.debater_a.name}: {scores_a}")
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_a.name,
-                    "argument": argument_a,
-                    "feedback": feedback_a_text, # Store text feedback
-                    "scores": scores_a # Store scores dictionary
-                })
-                feedback_a = feedback_a_text
-                # Optional: self.debater_a.receive_feedback(feedback_a)
-
-                # Debater B's turn
-                print(f"\n{self.debater_b.name}'s Turn:")
-                 # Debater B uses Debater A's *current* argument and its *own* previous feedback
-                argument_b = self.debater_b.generate_argument(self.topic, argument_a, feedback_b)
-                print(f"Argument: {argument_b}")
-                feedback_b_text, scores_b = self.judge.evaluate_argument(argument_b, self.debater_b.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_b.name}:\n{feedback_b_text}")
-                print(f"Scores for {self.debater_b.name}: {scores_b}")
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_b.name,
-                    "argument": argument_b,
-                    "feedback": feedback_b_text, # Store text feedback
-                    "scores": scores_b # Store scores dictionary
-                })
-                feedback_b = feedback_b_text
-                # Optional: self.debater_b.receive_feedback(feedback_b)
+            declare_winner (bool): Add a final task asking the judge for the winner.
 
+        Returns:
+            DebateGraph: The graph to run on the engine.
+        """
+        graph = DebateGraph()
+        debaters = [("A", self.debater_a), ("B", self.debater_b)]
+        schedule = [] # step order of the sequential schedule
+        last_record = []
 
-        # --- End of Debate ---
-        print(f"\n--- Debate Concluded after {num_rounds} Rounds ---")
+        graph.add("generate_A_1", partial(self._opening_task, self.debater_a), kind="generate")
+        graph.add("generate_B_1", partial(self._opening_task, self.debater_b), kind="generate",
+                  after=[] if self.max_workers_round1 >= 2 else ["generate_A_1"])
+        schedule.append("generate_B_1")
 
-        # Final Judgement
-        # final_judgement = self.judge.declare_winner(self.debate_history, self.topic)
-        # print("\n--- Final Judgement ---")
-        # print(final_judgement)
+        for i in range(1, num_rounds + 1):
+            for index, (tag, debater) in enumerate(debaters):
+                if i > 1:
+                    # A answers B's previous argument; B answers A's argument from this round
+                    opponent_argument = f"generate_B_{i - 1}" if tag == "A" else f"generate_A_{i}"
+                    graph.add(f"generate_{tag}_{i}", partial(self._turn_task, debater),
+                              inputs=[opponent_argument, f"distill_{tag}_{i - 1}"], kind="generate")
+                    schedule.append(f"generate_{tag}_{i}")
+                if self.pairwise_judging:
+                    graph.add(f"evaluate_{tag}_{i}", itemgetter(index), inputs=[f"evaluate_pair_{i}"])
+                else:
+                    graph.add(f"evaluate_{tag}_{i}", partial(self._evaluate_task, debater, i),
+                              inputs=[f"generate_{tag}_{i}"], kind="evaluate")
+                    schedule.append(f"evaluate_{tag}_{i}")
+                if i < num_rounds: # the last round's feedback is never fed back
+                    graph.add(f"distill_{tag}_{i}", partial(self._distill_task, debater), inputs=[f"evaluate_{tag}_{i}"], kind="distill")
+                    if not self.pairwise_judging:
+                        schedule.append(f"distill_{tag}_{i}")
+                graph.add(f"record_{tag}_{i}", partial(self._record_turn, i, debater),
+                          inputs=[f"generate_{tag}_{i}", f"evaluate_{tag}_{i}"], after=last_record)
+                last_record = [f"record_{tag}_{i}"]
+            if self.pairwise_judging:
+                graph.add(f"evaluate_pair_{i}", partial(self._evaluate_pair_task, i),
+                          inputs=[f"generate_A_{i}", f"generate_B_{i}"], kind="evaluate")
+                schedule.append(f"evaluate_pair_{i}")
+                if i < num_rounds:
+                    schedule += [f"distill_A_{i}", f"distill_B_{i}"]
+
+        if declare_winner:
+            graph.add("declare_winner", lambda: self.judge.adeclare_winner(self.debate_history, self.topic),
+                      after=last_record, kind="declare_winner")
+        if not self.pipelined:
+            graph.chain(schedule)
+        return graph
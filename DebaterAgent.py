@@ -1,8 +1,48 @@
-from llm_helper import call_llm_api
+import re
+from typing import Any, Callable, Dict, List
+from llm_helper import call_llm_api_async, run_sync
+from llm_context import ConversationContext
+
+WORD_PATTERN = re.compile(r"\S+")
+
+
+def truncate_to_words(text: str, limit: int) -> str:
+    """Cuts `text` to at most `limit` words, ending at the last complete sentence when that keeps most of it."""
+    words = list(WORD_PATTERN.finditer(text))
+    if len(words) <= limit:
+        return text
+    cut = text[:words[limit - 1].end()]
+    sentence_end = max(cut.rfind(mark) for mark in (". ", "! ", "? ", ".\n", "\n\n"))
+    if sentence_end > len(cut) // 2:
+        cut = cut[:sentence_end + 1]
+    return cut.rstrip()
+
+
+class WordCounter:
+    """Counts the words of streamed text chunk by chunk, including words split across chunks."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.words = 0
+        self._in_word = False
+
+    def feed(self, delta: str) -> int:
+        if not delta:
+            return self.words
+        self.words += len(delta.split())
+        if self._in_word and not delta[0].isspace():
+            self.words -= 1 # continues the previous chunk's last word
+        self._in_word = not delta[-1].isspace()
+        return self.words
+
+
 class DebaterAgent:
     """Represents an AI agent participating in the debate."""
 
-    def __init__(self, name: str, model_name: str, stance: str, system_prompt: str):
+    def __init__(self, name: str, model_name: str, stance: str, system_prompt: str, context_budget: int = None,
+                 word_cap: int = None, max_regenerations: int = 0, on_text: Callable[[str, str], Any] = None):
         """
         Initializes the Debater Agent.
 
@@ -11,26 +51,34 @@ class DebaterAgent:
             model_name (str): The LLM model this agent uses.
             stance (str): The initial stance or side the agent takes in the debate.
             system_prompt (str): A base instruction defining the agent's role and persona.
+            context_budget (int, optional): History budget in estimated tokens; older turns beyond it are
+                summarized. Defaults to a per-model budget (see llm_context.MODEL_HISTORY_BUDGETS).
+            word_cap (int, optional): Hard word limit. Arguments are streamed, and generation is stopped as
+                soon as it passes the cap instead of paying for the rest; None leaves length unchecked.
+            max_regenerations (int): Times to regenerate, with a stricter length instruction, after hitting the
+                cap; once they are used up the argument is truncated to the cap.
+            on_text (Callable, optional): Receives partial text as `on_text(delta, text_so_far)` while an argument
+                streams (e.g. `llm_helper.print_stream`, or incremental persistence).
         """
         self.name = name
         self.model_name = model_name
         self.stance = stance
         self.system_prompt = system_prompt
-        self.context = [{"role": "system", "content": system_prompt + f" You are arguing for the '{stance}' stance."}]
+        # The system message carrying the stance is pinned; old turns are folded into a running summary
+        self.memory = ConversationContext(system_prompt + f" You are arguing for the '{stance}' stance.", model_name, context_budget)
+        self.word_cap = word_cap
+        self.max_regenerations = max_regenerations
+        self.on_text = on_text
+        self.word_cap_stats = {"stopped": 0, "regenerated": 0, "truncated": 0}
         print(f"Initialized Debater: {self.name} (Model: {self.model_name}, Stance: {self.stance})")
 
-    def generate_argument(self, topic: str, opponent_argument: str = None, feedback: str = None) -> str:
-        """
-        Generates the next argument based on the topic, opponent's last point, and judge feedback.
-
-        Args:
-            topic (str): The main topic of the debate.
-            opponent_argument (str, optional): The previous argument from the opponent. Defaults to None.
-            feedback (str, optional): Feedback received from the judge on the last argument. Defaults to None.
+    @property
+    def context(self) -> List[Dict[str, str]]:
+        """The messages sent with the next turn: pinned system prompt (plus summary) and recent turns."""
+        return self.memory.messages()
 
-        Returns:
-            str: The newly generated argument.
-        """
+    def _build_prompt(self, topic: str, opponent_argument: str = None, feedback: str = None) -> str:
+        """Builds the turn prompt from the topic, opponent's last point, and judge feedback."""
         prompt = f"Debate Topic: {topic}\nYour Stance: {self.stance}\n"
         prompt += f"Your role: {self.system_prompt}\n"
 
@@ -44,25 +92,74 @@ class DebaterAgent:
             prompt += f"\nFeedback on your previous argument:\n'''{feedback}'''\nPlease incorporate this feedback into your response.\n"
         prompt += "\nVery important: Your argument must be 520 words or less (approximately 4 minutes of speaking time at 130 words per minute). You will be penalised if you go over this limit."
         prompt += "\nGenerate your argument:"
+        return prompt
+
+    async def _agenerate_streamed(self, prompt: str, messages: List[Dict[str, str]], on_text: Callable[[str, str], Any]) -> str:
+        """Streams an argument, stopping at `word_cap`; regenerates or truncates an argument that hit it."""
+        request = prompt
+        for attempt in range(self.max_regenerations + 1):
+            counter = WordCounter()
+            def watch(delta: str, text: str) -> bool:
+                if on_text is not None:
+                    on_text(delta, text)
+                if text == delta: # first chunk, or a retried stream starting over
+                    counter.reset()
+                return self.word_cap is not None and counter.feed(delta) > self.word_cap
+
+            argument = await call_llm_api_async(request, self.model_name, messages, on_text=watch)
+            if self.word_cap is None or len(argument.split()) <= self.word_cap:
+                return argument
+            self.word_cap_stats["stopped"] += 1
+            print(f"[WORD CAP] {self.name}'s argument passed {self.word_cap} words; generation stopped.")
+            if attempt < self.max_regenerations:
+                self.word_cap_stats["regenerated"] += 1
+                request = (prompt + f"\n\nYour previous draft ran past the hard limit of {self.word_cap} words and was cut off. "
+                           f"Write a complete argument well under {self.word_cap} words.")
+        self.word_cap_stats["truncated"] += 1
+        return truncate_to_words(argument, self.word_cap)
+
+    async def agenerate_argument(self, topic: str, opponent_argument: str = None, feedback: str = None,
+                                 on_text: Callable[[str, str], Any] = None) -> str:
+        """
+        Generates the next argument based on the topic, opponent's last point, and judge feedback.
+
+        Args:
+            topic (str): The main topic of the debate.
+            opponent_argument (str, optional): The previous argument from the opponent. Defaults to None.
+            feedback (str, optional): Feedback received from the judge on the last argument. Defaults to None.
+            on_text (Callable, optional): Partial-text callback for this argument; defaults to the agent's `on_text`.
 
-        # Add current prompt to context before calling LLM
-        self.context.append({"role": "user", "content": prompt})
+        Returns:
+            str: The newly generated argument (at most `word_cap` words when a cap is set).
+        """
+        prompt = self._build_prompt(topic, opponent_argument, feedback)
 
-        # Call the LLM API
-        argument = call_llm_api(prompt, self.model_name, self.context[:-1]) # Pass context *before* this turn's prompt
+        # Let a summarization started after the previous turn finish (it normally already has, during judging)
+        await self.memory.ready()
 
-        # Add LLM response to context
-        self.context.append({"role": "assistant", "content": argument})
+        # Call the LLM API with the context *before* this turn's prompt
+        on_text = on_text or self.on_text
+        if self.word_cap is None and on_text is None:
+            argument = await call_llm_api_async(prompt, self.model_name, self.memory.messages())
+        else:
+            argument = await self._agenerate_streamed(prompt, self.memory.messages(), on_text)
 
-        # Optional: Context window management (e.g., limit history size)
-        if len(self.context) > 10: self.context = self.context[-10:]
+        # Record the turn, then compact the history in the background if it is over budget
+        self.memory.append("user", prompt)
+        self.memory.append("assistant", argument)
+        self.memory.schedule_compaction()
 
         print(f"{self.name} generated argument.")
         return argument
 
+    def generate_argument(self, topic: str, opponent_argument: str = None, feedback: str = None,
+                          on_text: Callable[[str, str], Any] = None) -> str:
+        """Blocking wrapper around `agenerate_argument`."""
+        return run_sync(self.agenerate_argument(topic, opponent_argument, feedback, on_text))
+
     def receive_feedback(self, feedback: str):
         """Stores feedback for the next turn."""
         # Feedback can be added to context or handled separately
         print(f"{self.name} received feedback.")
         # Example: Add feedback explicitly to context for the next turn's prompt
-        self.context.append({"role": "system", "content": f"Feedback received: {feedback}"})
+        self.memory.append("system", f"Feedback received: {feedback}")
@@ -0,0 +1,159 @@
+import re
+from typing import Dict, List, Tuple
+from llm_helper import call_llm_api_async
+from llm_ratelimit import estimate_tokens
+from JudgeAgent import SCORE_LABELS, SCORE_PATTERNS
+
+# Judge-output scaffolding that carries no advice for the debater
+ECHOED_ARGUMENT_PATTERN = re.compile(r"Argument:\s*'''.*?'''", re.DOTALL)
+FEEDBACK_HEADER_PATTERN = re.compile(r"^Feedback for .*? on Round \d+.*$", re.MULTILINE)
+SECTION_PATTERN = re.compile(r"^\s*---\s*(.+?)\s*---\s*$", re.MULTILINE)
+BOILERPLATE_PATTERN = re.compile(
+    r"^\s*(?:Analysis:|CRITIQUE\s*\(\d+ words\):|\(Where 0 .*\)|For example:|Warning: The argument exceeded.*)\s*$", re.IGNORECASE | re.MULTILINE)
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])|\n+\s*(?:[-*•]|\d+[.)])\s*|\n{2,}")
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Words that mark a sentence as advice (something to change) rather than description
+ACTION_CUES = (
+    "should", "could", "consider", "needs", "need to", "lack", "missing", "improve", "strengthen", "avoid", "address",
+    "clarify", "provide", "cite", "support", "weak", "fallac", "unsupported", "vague", "contradict", "fails", "instead",
+    "more ", "better", "evidence", "counterargument", "rebut", "specific",
+)
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "was", "be", "that", "this", "it", "its",
+    "with", "as", "by", "their", "they", "debater", "debater's", "argument", "arguments", "would", "could", "should",
+}
+
+
+class FeedbackDistiller:
+    """
+    Turns judge output into a compact, deduplicated list of actionable points for the debater.
+
+    'local' mode extracts and ranks advice sentences without any model call; 'llm' mode makes
+    one short call to `model_name`; 'auto' is local, falling back to the model only when the
+    feedback has no recognizable advice sentences.
+    """
+
+    def __init__(self, max_tokens: int = 250, mode: str = "local", model_name: str = None, similarity_threshold: float = 0.6):
+        """
+        Initializes the distiller.
+
+        Args:
+            max_tokens (int): Token budget of the distilled feedback.
+            mode (str): 'local', 'llm' or 'auto'.
+            model_name (str, optional): Model for 'llm'/'auto' modes; defaults to the debater's own model.
+            similarity_threshold (float): Word-overlap (Jaccard) ratio above which two points count as duplicates.
+        """
+        if mode not in ("local", "llm", "auto"):
+            raise ValueError(f"Unknown distillation mode: {mode}")
+        self.max_tokens = max_tokens
+        self.mode = mode
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+
+    def _points(self, feedback: str) -> List[Tuple[str, str]]:
+        """Splits judge output into (focus, sentence) candidates, dropping the echoed argument and scaffolding."""
+        text = ECHOED_ARGUMENT_PATTERN.sub("", feedback)
+        text = FEEDBACK_HEADER_PATTERN.sub("", text)
+        text = BOILERPLATE_PATTERN.sub("", text)
+        for pattern in SCORE_PATTERNS.values():
+            text = pattern.sub("", text)
+
+        points = []
+        sections = SECTION_PATTERN.split(text) # [preamble, focus, body, focus, body, ...]
+        bodies = [("", sections[0])] + list(zip(sections[1::2], sections[2::2]))
+        for focus, body in bodies:
+            for sentence in SENTENCE_SPLIT_PATTERN.split(body):
+                sentence = " ".join(sentence.replace("**", "").split()).strip(" -*:")
+                if len(sentence.split()) >= 5:
+                    points.append((focus, sentence))
+        return points
+
+    def _is_duplicate(self, words: set, kept: List[set]) -> bool:
+        for other in kept:
+            union = len(words | other)
+            if union and len(words & other) / union >= self.similarity_threshold:
+                return True
+        return False
+
+    def _header(self, scores: Dict[str, float]) -> str:
+        if not scores:
+            return ""
+        ranked = sorted((key for key in SCORE_LABELS if key in scores), key=lambda key: scores[key])
+        return "Scores (weakest first): " + ", ".join(f"{SCORE_LABELS[key][0].lower()} {scores[key]:g}/10" for key in ranked) + "\n"
+
+    def distill_local(self, feedback: str, scores: Dict[str, float] = None, actionable_only: bool = False) -> str:
+        """
+        Extracts the judge's sentences, drops near-duplicates and keeps the most actionable ones within the budget.
+
+        Args:
+            feedback (str): The judge's feedback text.
+            scores (Dict[str, float], optional): The judge's scores, summarized in one line.
+            actionable_only (bool): Return "" unless some sentence reads as advice.
+
+        Returns:
+            str: The distilled feedback, or "" if there was nothing to keep.
+        """
+        candidates = []
+        for position, (focus, sentence) in enumerate(self._points(feedback)):
+            lowered = sentence.lower()
+            cue_hits = sum(cue in lowered for cue in ACTION_CUES)
+            candidates.append((cue_hits, position, focus, sentence))
+        if not candidates or (actionable_only and not any(cue_hits for cue_hits, *_ in candidates)):
+            return ""
+
+        header = self._header(scores or {})
+        budget = self.max_tokens - estimate_tokens(header)
+        kept, kept_words = [], []
+        # Most actionable first; ties keep the judge's order
+        for cue_hits, position, focus, sentence in sorted(candidates, key=lambda c: (-c[0], c[1])):
+            words = set(WORD_PATTERN.findall(sentence.lower())) - STOPWORDS
+            if self._is_duplicate(words, kept_words):
+                continue
+            line = f"- ({focus}) {sentence}" if focus else f"- {sentence}"
+            cost = estimate_tokens(line) + 1
+            if cost > budget:
+                if kept or budget < 20:
+                    continue
+                # Nothing fits yet: keep the start of the most actionable point rather than an empty list
+                line = line[:(budget - 2) * 4].rsplit(" ", 1)[0] + "..."
+                cost = estimate_tokens(line) + 1
+            budget -= cost
+            kept.append((position, line))
+            kept_words.append(words)
+        return header + "Points to act on:\n" + "\n".join(line for _, line in sorted(kept))
+
+    async def adistill_llm(self, feedback: str, scores: Dict[str, float] = None, model_name: str = None) -> str:
+        """Distills with one short model call, capped at `max_tokens` output tokens."""
+        prompt = (
+            "Below is a judge's feedback on a debate argument. Rewrite it as a short list of distinct, actionable "
+            "improvements for the debater, most important first. Merge duplicates, drop praise, restated scores and any "
+            f"quoted argument text. Use at most {int(self.max_tokens * 0.75)} words. Output only the list.\n\n"
+            f"Feedback:\n'''{ECHOED_ARGUMENT_PATTERN.sub('', feedback)}'''"
+        )
+        points = await call_llm_api_async(prompt, self.model_name or model_name, max_tokens=self.max_tokens)
+        return self._header(scores or {}) + points.strip()
+
+    async def adistill(self, feedback: str, scores: Dict[str, float] = None, model_name: str = None) -> str:
+        """
+        Distills judge feedback for the next debater prompt.
+
+        Args:
+            feedback (str): The judge's feedback text.
+            scores (Dict[str, float], optional): The judge's scores, summarized in one line.
+            model_name (str, optional): Model to use in 'llm'/'auto' modes when the distiller has none.
+
+        Returns:
+            str: The distilled feedback (the original feedback if nothing could be distilled).
+        """
+        if not feedback:
+            return feedback
+        if self.mode != "llm":
+            distilled = self.distill_local(feedback, scores, actionable_only=self.mode == "auto")
+            if distilled or self.mode == "local":
+                return distilled or feedback
+        try:
+            return await self.adistill_llm(feedback, scores, model_name)
+        except Exception as e:
+            print(f"[DISTILL] Model distillation failed ({e}); using the full feedback.")
+            return feedback
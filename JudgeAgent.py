@@ -1,13 +1,17 @@
 # Fetched content from Project/JudgeAgent.py [cite: 3]
-import concurrent.futures
+import asyncio
+import json
 from typing import Any, Dict, List
-from llm_helper import call_llm_api # Assuming llm_helper is in the same directory or accessible
+from llm_helper import call_llm_api_async, run_sync # Assuming llm_helper is in the same directory or accessible
+from llm_scheduler import TaskScheduler, run_scheduled
+from llm_tracing import tracer
 import re
 
 # --- Keep your existing ANALYSIS_LAYERS definition ---
 ANALYSIS_LAYERS = [
     {
         "focus": "Logical Consistency",
+        "score_key": "logic",
         "prompt_template": """You are an advanced debate judge AI whose exclusive focus is to assess the logical structure and consistency of a debater's arguments. Your role is not to evaluate factual correctness or persuasive style, but to determine whether the debater's reasoning is coherent and free from logical fallacies.
 
       The debate under review concerns:
@@ -49,6 +53,7 @@ ANALYSIS_LAYERS = [
     },
     {
         "focus": "Rhetorical Effectiveness",
+        "score_key": "persuasive",
         "prompt_template": """You are an advanced debate judge AI whose sole responsibility is evaluating the persuasive and stylistic elements of a debater's performance. You are not concerned with factual correctness or pure logical consistency; instead, you focus on how effectively the debater conveys their message, engages the audience, and sustains rhetorical impact across all rounds.
 
       The debate you are judging is centered on:
@@ -94,6 +99,7 @@ ANALYSIS_LAYERS = [
     },
     {
         "focus": "Factual Accuracy",
+        "score_key": "factual",
         "prompt_template": """You are an advanced debate judge AI whose sole focus is evaluating the factual accuracy of arguments across multiple debate rounds. Your analysis must be methodical, rigorous, and based on established principles of factual verification.
       
       You will evaluate the following argument from a debater who took the {stance} position on the topic: "{topic}".
@@ -142,6 +148,7 @@ ANALYSIS_LAYERS = [
     },
     {
         "focus": "Belief Impact",
+        "score_key": "belief",
         "prompt_template": """You are an advanced debate judge AI focused exclusively on determining how effectively a debater's arguments could shift the beliefs of various audiences. Your primary measure is the likelihood of changing minds, not merely how logical or factual the arguments are in isolation.
 
       The topic of the debate is:
@@ -185,10 +192,175 @@ ANALYSIS_LAYERS = [
 ]
 # --- End of ANALYSIS_LAYERS ---
 
+# Score keys of the scores dict and the labels judges use for them (first label is the one prompts ask for)
+SCORE_LABELS = {
+    "logic": ["LOGICAL CONSISTENCY"],
+    "persuasive": ["PERSUASIVE QUALITY", "RHETORICAL EFFECTIVENESS"],
+    "factual": ["FACTUAL ACCURACY"],
+    "belief": ["BELIEF-SHIFT", "BELIEF IMPACT"],
+}
+SCORE_KEYS = list(SCORE_LABELS)
+
+def _label_regex(label: str) -> str:
+    return r"[\s_-]*".join(re.escape(word) for word in re.split(r"[\s-]+", label))
+
+# Tolerant score-line patterns: any case, markdown emphasis/bullets, 'BELIEF SHIFT', '8/10', '[8]', 'Score = 8.5'
+SCORE_PATTERNS = {
+    key: re.compile(r"(?:" + "|".join(_label_regex(label) for label in labels) + r")[\s_-]*SCORE[\s*:=\-\[\]()_]*(\d+(?:\.\d+)?)", re.IGNORECASE)
+    for key, labels in SCORE_LABELS.items()
+}
+# Stand-ins for the per-call values in the layer templates, so the instructions form a stable prefix;
+# the values themselves are sent after the instructions (see JudgeAgent._call_judge)
+LAYER_PLACEHOLDERS = {
+    "topic": "[the DEBATE TOPIC given below]",
+    "stance": "[the DEBATER given below]",
+    "argument": "[the ARGUMENT(S) given below]",
+}
+
+COMPREHENSIVE_RUBRIC = (
+    "Provide a comprehensive evaluation covering these key areas:\n\n"
+
+    "1) LOGICAL CONSISTENCY:\n"
+    "- Identify any logical fallacies (ad hominem, straw man, false dichotomies, hasty generalizations)\n"
+    "- Assess internal contradictions and self-consistency of claims\n"
+    "- Evaluate how premises connect to conclusions\n"
+    "- Analyze the strength of logical progression and cohesiveness\n\n"
+
+    "2) RHETORICAL EFFECTIVENESS:\n"
+    "- Assess clarity and focus of the central thesis\n"
+    "- Evaluate emotional appeal and audience engagement techniques\n"
+    "- Analyze language, style, and delivery effectiveness\n"
+    "- Examine how well counterarguments are anticipated and addressed\n"
+    "- Consider flow and overall persuasiveness\n\n"
+
+    "3) FACTUAL ACCURACY:\n"
+    "- Verify claim validity against established knowledge\n"
+    "- Evaluate quality and credibility of sources (if cited)\n"
+    "- Assess evidence completeness and sufficiency\n"
+    "- Check for contextual integrity and proper framing of facts\n\n"
+
+    "4) BELIEF IMPACT:\n"
+    "- Estimate persuasive impact on opposing audiences\n"
+    "- Analyze effectiveness for neutral/undecided audiences\n"
+    "- Consider reinforcement value for already supportive audiences\n"
+    "- Identify any elements that might reduce appeal to certain audiences\n\n"
+
+    "Provide specific, constructive feedback that will help the debater improve their argument. Be balanced and fair in your assessment.\n\n"
+)
+
+SCORE_LINES_FORMAT = (
+    "IMPORTANT: After your analysis, provide quantitative scores on a scale of 1-10 for the following categories:\n"
+    "- LOGICAL CONSISTENCY SCORE: [score]\n"
+    "- PERSUASIVE QUALITY SCORE: [score]\n"
+    "- FACTUAL ACCURACY SCORE: [score]\n"
+    "- BELIEF-SHIFT SCORE: [score]\n"
+    "For example, your output should look like below with the only change be the score:\n"
+    "- LOGICAL CONSISTENCY SCORE: 9\n"
+    "- PERSUASIVE QUALITY SCORE: 7\n"
+    "- FACTUAL ACCURACY SCORE: 8\n"
+    "- BELIEF-SHIFT SCORE: 10\n"
+)
+
+SCORES_ONLY_RUBRIC = (
+    "Score it from 0 to 10 on each of these areas:\n"
+    "- logic: LOGICAL CONSISTENCY (fallacies, contradictions, how premises support conclusions)\n"
+    "- persuasive: PERSUASIVE QUALITY (clarity of thesis, engagement, handling of counterarguments)\n"
+    "- factual: FACTUAL ACCURACY (validity of claims, quality and sufficiency of evidence)\n"
+    "- belief: BELIEF-SHIFT (likely impact on opposing, neutral and supportive audiences)\n\n"
+    "Do not write any critique. "
+)
+
+# Output-token cap for the follow-up that asks only for missing scores
+RESCORE_MAX_TOKENS = 60
+# Output-token cap for scores-only evaluations (a four-number JSON object)
+SCORES_ONLY_MAX_TOKENS = 80
+# Section headings of a comparative evaluation written without JSON: '### DEBATER A', '**Debater B**', 'DEBATER A:'
+# (a prose line such as "Debater B's claim..." is not a heading)
+PAIR_HEADING_PATTERN = re.compile(
+    r"^\s*(?:[#*=\[]+\s*DEBATER\s+([AB])\b[^\n]*|DEBATER\s+([AB])\s*(?:\([^)\n]*\))?\s*:?\s*)$", re.IGNORECASE | re.MULTILINE)
+JSON_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """Returns the last JSON object in a response (fenced or bare), or None."""
+    for block in reversed(JSON_FENCE_PATTERN.findall(text)):
+        try:
+            data = json.loads(block)
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+    decoder = json.JSONDecoder()
+    found = None
+    start = text.find("{")
+    while start != -1:
+        try:
+            data, end = decoder.raw_decode(text, start)
+            found = data # keep the outermost object, not one nested inside it
+            start = text.find("{", end)
+        except ValueError:
+            start = text.find("{", start + 1)
+    return found
+
+
+def validate_scores(data: Dict[str, Any], keys: List[str] = SCORE_KEYS) -> Dict[str, float]:
+    """
+    Validates structured judge output against the score schema.
+
+    Args:
+        data (Dict[str, Any]): Parsed JSON, either {"scores": {...}, "critique": ...} or a bare scores object.
+        keys (List[str]): Score keys to accept.
+
+    Returns:
+        Dict[str, float]: The valid scores (numbers in 0-10); invalid or absent keys are left out.
+    """
+    scores_obj = data.get("scores") if isinstance(data.get("scores"), dict) else data
+    scores = {}
+    for key in keys:
+        value = scores_obj.get(key)
+        if isinstance(value, bool):
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= value <= 10:
+            scores[key] = value
+    return scores
+
+
+def parse_score_lines(text: str, keys: List[str] = SCORE_KEYS) -> Dict[str, float]:
+    """Fallback parser: reads 'LABEL SCORE: n' lines, keeping the last occurrence of each score in 0-10."""
+    scores = {}
+    for key in keys:
+        matches = SCORE_PATTERNS[key].findall(text)
+        if matches and 0 <= float(matches[-1]) <= 10:
+            scores[key] = float(matches[-1])
+    return scores
+
+
+def pair_json_instructions(keys: List[str], critique: str = None) -> str:
+    """Prompt suffix asking for the structured (JSON) output format of a comparative evaluation."""
+    scores_schema = ", ".join(f'"{key}": <0-10>' for key in keys)
+    entry = f'{{"scores": {{{scores_schema}}}}}' if critique is None else f'{{"critique": "<{critique}>", "scores": {{{scores_schema}}}}}'
+    return f'Respond with only a JSON object of this form, and nothing else:\n{{"A": {entry}, "B": {entry}}}\n'
+
+
+def score_json_instructions(keys: List[str], critique: str = None) -> str:
+    """Prompt suffix asking for the structured (JSON) output format."""
+    scores_schema = ", ".join(f'"{key}": <{SCORE_LABELS[key][0].lower()} score, number from 0-10>' for key in keys)
+    if critique is None:
+        return f"Respond with only a JSON object of this form, and nothing else:\n{{{scores_schema}}}\n"
+    return (
+        f"Respond with only a JSON object of this form, and nothing else:\n"
+        f'{{"critique": "<{critique}>", "scores": {{{scores_schema}}}}}\n'
+    )
+
 class JudgeAgent:
     """Represents an AI agent (or interface for a human) evaluating the debate."""
 
-    def __init__(self, name: str = "AI Judge", model_name: str = "gpt-4-turbo", use_strategic_layers: bool = True, max_workers: int = 4):
+    def __init__(self, name: str = "AI Judge", model_name: str = "gpt-4-turbo", use_strategic_layers: bool = True, max_workers: int = 4,
+                 scheduler: TaskScheduler = None, structured_output: bool = False, rescore_missing: bool = True):
         """
         Initializes the Judge Agent.
 
@@ -196,12 +368,22 @@ class JudgeAgent:
             name (str): Name of the judge.
             model_name (str): LLM model used by the judge.
             use_strategic_layers (bool): Whether to use the defined ANALYSIS_LAYERS for evaluation.
-            max_workers (int): Max number of threads for parallel feedback generation.
+            max_workers (int): Max number of concurrent LLM calls for parallel feedback generation.
+            scheduler (TaskScheduler, optional): Long-lived scheduler shared with other judges and debates;
+                every judge LLM call goes through it so one concurrency cap covers the whole process.
+            structured_output (bool): Ask for a JSON object with the critique and scores instead of score lines.
+                Responses are schema-validated; the score-line parser remains the fallback.
+            rescore_missing (bool): When some scores can't be parsed, send a short follow-up asking only
+                for those scores instead of defaulting them to 0.
         """
         self.name = name
         self.model_name = model_name
         self.use_strategic_layers = use_strategic_layers
         self.max_workers = min(max_workers, len(ANALYSIS_LAYERS))
+        self.scheduler = scheduler
+        self.structured_output = structured_output
+        self.rescore_missing = rescore_missing
+        self.score_stats = {"parsed": 0, "rescored": 0, "defaulted": 0} # evaluations complete as parsed / after a follow-up / with zeros
         self.system_prompt = "You are an impartial debate judge."
         self.context = [{"role": "system", "content": self.system_prompt}]
         print(f"Initialized Judge: {self.name} (Model: {self.model_name}, Parallel Layers: {self.use_strategic_layers}, Max Workers: {self.max_workers if self.use_strategic_layers else 'N/A'})")
@@ -233,24 +415,129 @@ class JudgeAgent:
              return False # Not compliant
 
 
-    def _run_layer_analysis(self, layer: Dict[str, str], argument: str, debater_name: str, topic: str, round_num: int) -> Dict[str, str]:
-        """Helper function to run analysis for a single layer."""
+    # --- Prompt layout ---
+    # Every judge request is split into stable instructions (system prompt, layer template or
+    # rubric, output format), sent first as a system message marked cacheable, and the variable
+    # part (topic, round, debater, argument) sent after it. The instructions are then an
+    # identical prefix across calls, which provider-side prompt caching requires.
+    async def _call_judge(self, instructions: str, body: str, max_tokens: int = None) -> str:
+        """Sends one judge request: cacheable instructions first, then the per-call body."""
+        context = [{"role": "system", "content": instructions, "cache": True}]
+        return await run_scheduled(self.scheduler, call_llm_api_async, body, self.model_name, context, max_tokens=max_tokens)
+
+    def _argument_body(self, argument: str, debater_name: str, topic: str, round_num: int) -> str:
+        return f"DEBATE TOPIC: {topic}\nROUND: {round_num}\nDEBATER: {debater_name}\nARGUMENT:\n'''{argument}'''"
+
+    def _build_layer_prompt(self, layer: Dict[str, str], argument: str, debater_name: str, topic: str, round_num: int) -> tuple[str, str]:
+        """Builds the (instructions, body) of the prompt for a single analysis layer."""
+        layer_prompt = layer["prompt_template"].format(**LAYER_PLACEHOLDERS)
+        instructions = f"{self.system_prompt}\nAnalyze based on '{layer['focus']}':\n{layer_prompt}"
+        if self.structured_output:
+            instructions += "\n\nInstead of the format above, " + score_json_instructions([layer["score_key"]], "your 200-word critique")
+        return instructions, self._argument_body(argument, debater_name, topic, round_num)
+
+    async def _run_layer_analysis(self, layer: Dict[str, str], argument: str, debater_name: str, topic: str, round_num: int, semaphore: asyncio.Semaphore) -> Dict[str, str]:
+        """
+        Helper coroutine to run analysis for a single layer.
+        Transient errors are retried inside call_llm_api_async; a layer that still fails raises,
+        rather than returning placeholder text that would parse as all-zero scores.
+        """
         try:
-            layer_prompt = layer["prompt_template"].format(argument=argument, stance=debater_name, topic=topic)
-            full_layer_prompt = f"{self.system_prompt}\nDebate Topic: {topic}\nRound: {round_num}\nAnalyze based on '{layer['focus']}':\n{layer_prompt}"
-            # print(f"DEBUG: Calling LLM for layer '{layer['focus']}'") # Optional debug print
-            layer_analysis = call_llm_api(full_layer_prompt, self.model_name) # Context management might be simplified here for parallel calls
-            # print(f"DEBUG: Received LLM response for layer '{layer['focus']}'") # Optional debug print
-            return {"focus": layer['focus'], "analysis": layer_analysis}
+            instructions, body = self._build_layer_prompt(layer, argument, debater_name, topic, round_num)
+            async with semaphore:
+                with tracer.span(f"layer {layer['focus']}", kind="judge_layer"):
+                    layer_analysis = await self._call_judge(instructions, body)
+            print(f"Completed analysis layer: {layer['focus']}") # Progress indicator
+            analysis, scores = self._parse_scores(layer_analysis, [layer["score_key"]])
+            return {"focus": layer['focus'], "analysis": analysis, "scores": scores}
         except Exception as e:
             print(f"Error during analysis layer '{layer['focus']}': {e}")
-            return {"focus": layer['focus'], "analysis": f"Error generating analysis: {e}"}
+            raise
+
+    def _build_comprehensive_prompt(self, argument: str, debater_name: str, topic: str, round_num: int) -> tuple[str, str]:
+        """Builds the (instructions, body) of the single-prompt evaluation covering all analysis layers."""
+        instructions = f"{self.system_prompt}\nYou will be given a debate topic, the round, a debater and their argument to evaluate.\n" + COMPREHENSIVE_RUBRIC
+        if self.structured_output:
+            instructions += score_json_instructions(SCORE_KEYS, "your full evaluation and constructive feedback")
+        else:
+            instructions += SCORE_LINES_FORMAT
+        return instructions, self._argument_body(argument, debater_name, topic, round_num)
+
+    def _parse_scores(self, feedback: str, keys: List[str] = SCORE_KEYS) -> tuple[str, Dict[str, float]]:
+        """
+        Separates the textual feedback from the scores in a judge response.
+
+        Structured (JSON) output is validated first; score lines are the fallback for anything
+        it doesn't provide. Missing scores are left out rather than zeroed, see `_rescore_missing`.
 
+        Args:
+            feedback (str): The judge's response.
+            keys (List[str]): Score keys the response is expected to contain.
+
+        Returns:
+            tuple[str, Dict[str, float]]: The feedback text and the scores that could be parsed.
+        """
+        feedback_text = feedback.split("IMPORTANT:")[0].strip()
+        scores = {}
+        data = extract_json_object(feedback) if "{" in feedback else None
+        if data is not None:
+            scores = validate_scores(data, keys)
+            critique = data.get("critique")
+            if isinstance(critique, str) and critique.strip():
+                feedback_text = critique.strip()
+        missing = [key for key in keys if key not in scores]
+        if missing:
+            scores.update(parse_score_lines(feedback, missing))
+        return feedback_text, scores
+
+    def _build_rescore_prompt(self, argument: str, debater_name: str, topic: str, round_num: int, feedback_text: str, missing: List[str]) -> str:
+        """Builds the short follow-up asking only for the scores missing from an evaluation."""
+        return (
+            f"{self.system_prompt}\n"
+            f"Debate Topic: {topic}\nRound: {round_num}\nDebater: {debater_name}\n"
+            f"Argument:\n'''{argument}'''\n\n"
+            + (f"Your evaluation of this argument:\n'''{feedback_text}'''\n\n" if feedback_text else "")
+            + f"Your evaluation did not include the following score(s): {', '.join(SCORE_LABELS[key][0] for key in missing)}.\n"
+            + score_json_instructions(missing)
+        )
+
+    async def _rescore_missing(self, argument: str, debater_name: str, topic: str, round_num: int, feedback_text: str,
+                               scores: Dict[str, float]) -> Dict[str, float]:
+        """
+        Completes a partially parsed set of scores.
+
+        Asks the judge only for the missing scores (a few output tokens) rather than re-running the
+        evaluation; whatever is still missing afterwards defaults to 0.
+
+        Returns:
+            Dict[str, float]: All four scores, in SCORE_KEYS order.
+        """
+        missing = [key for key in SCORE_KEYS if key not in scores]
+        if not missing:
+            self.score_stats["parsed"] += 1
+            return {key: scores[key] for key in SCORE_KEYS}
+        if self.rescore_missing:
+            print(f"[JUDGE] Missing score(s) {missing} for {debater_name}; asking for them only.")
+            prompt = self._build_rescore_prompt(argument, debater_name, topic, round_num, feedback_text, missing)
+            try:
+                with tracer.span("rescore", kind="judge_layer"):
+                    response = await run_scheduled(self.scheduler, call_llm_api_async, prompt, self.model_name,
+                                                   max_tokens=RESCORE_MAX_TOKENS)
+                scores = {**scores, **self._parse_scores(response, missing)[1]}
+            except Exception as e:
+                print(f"[ERROR] Follow-up scoring request failed: {e}")
+        still_missing = [key for key in SCORE_KEYS if key not in scores]
+        if still_missing:
+            print(f"[WARN] Failed to parse score(s) {still_missing} from LLM response; defaulting them to 0.")
+            self.score_stats["defaulted"] += 1
+        else:
+            self.score_stats["rescored"] += 1
+        return {key: scores.get(key, 0) for key in SCORE_KEYS}
 
-    def evaluate_argument(self, argument: str, debater_name: str, topic: str, round_num: int) -> str:
+    async def aevaluate_argument(self, argument: str, debater_name: str, topic: str, round_num: int) -> tuple[str, Dict[str, float]]:
         """
         Evaluates a single argument using the LLM or predefined rules.
-        Uses parallel execution if use_strategic_layers is True.
+        Runs the analysis layers concurrently if use_strategic_layers is True.
 
         Args:
             argument (str): The argument text to evaluate.
@@ -259,7 +546,7 @@ class JudgeAgent:
             round_num (int): The current round number.
 
         Returns:
-            str: Constructive feedback for the debater.
+            tuple[str, Dict[str, float]]: Constructive feedback for the debater and the parsed scores.
         """
         print(f"{self.name} evaluating argument from {debater_name}...")
 
@@ -279,118 +566,271 @@ class JudgeAgent:
         if self.use_strategic_layers:
             print(f"Running strategic layer analysis in parallel (max_workers={self.max_workers})...")
             full_feedback = f"Feedback for {debater_name} on Round {round_num} (Topic: {topic}):\nArgument:\n'''{argument}'''\n\nAnalysis:\n"
-            layer_results = []
-
-            # Use ThreadPoolExecutor for parallel API calls
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Prepare future tasks
-                future_to_layer = {
-                    executor.submit(self._run_layer_analysis, layer, argument, debater_name, topic, round_num): layer
-                    for layer in ANALYSIS_LAYERS
-                }
-
-                # Collect results as they complete
-                for future in concurrent.futures.as_completed(future_to_layer):
-                    layer_name = future_to_layer[future]['focus']
-                    try:
-                        result = future.result()
-                        layer_results.append(result)
-                        print(f"Completed analysis layer: {result['focus']}") # Progress indicator
-                    except Exception as exc:
-                        print(f"Layer '{layer_name}' generated an exception: {exc}")
-                        layer_results.append({"focus": layer_name, "analysis": f"Error during analysis: {exc}"})
-
-            # Sort results back into original order (optional, but good for consistency)
-            layer_results.sort(key=lambda x: [l['focus'] for l in ANALYSIS_LAYERS].index(x['focus']))
-
-            # Assemble feedback
+
+            # Run the layer calls concurrently on the event loop, at most max_workers at a time.
+            # gather() returns results in ANALYSIS_LAYERS order.
+            semaphore = asyncio.Semaphore(self.max_workers)
+            layer_tasks = [
+                asyncio.ensure_future(self._run_layer_analysis(layer, argument, debater_name, topic, round_num, semaphore))
+                for layer in ANALYSIS_LAYERS
+            ]
+            try:
+                layer_results = await asyncio.gather(*layer_tasks)
+            except Exception:
+                for task in layer_tasks: # Don't keep paying for the other layers of a failed evaluation
+                    task.cancel()
+                raise
+
+            # Assemble feedback; each layer contributes its own score
+            layer_scores = {}
             for result in layer_results:
                 full_feedback += f"\n--- {result['focus']} ---\n{result['analysis']}\n"
+                layer_scores.update(result['scores'])
 
             feedback = full_feedback
 
         else:
             # Comprehensive single-prompt evaluation incorporating all analysis layers
             print("Running comprehensive single prompt evaluation...")
-            prompt = (
-                f"{self.system_prompt}\n"
-                f"Debate Topic: {topic}\nRound: {round_num}\nDebater: {debater_name}\n"
-                f"Evaluate the following argument:\n'''{argument}'''\n\n"
-                f"Provide a comprehensive evaluation covering these key areas:\n\n"
-                
-                f"1) LOGICAL CONSISTENCY:\n"
-                f"- Identify any logical fallacies (ad hominem, straw man, false dichotomies, hasty generalizations)\n"
-                f"- Assess internal contradictions and self-consistency of claims\n"
-                f"- Evaluate how premises connect to conclusions\n"
-                f"- Analyze the strength of logical progression and cohesiveness\n\n"
-                
-                f"2) RHETORICAL EFFECTIVENESS:\n"
-                f"- Assess clarity and focus of the central thesis\n"
-                f"- Evaluate emotional appeal and audience engagement techniques\n"
-                f"- Analyze language, style, and delivery effectiveness\n"
-                f"- Examine how well counterarguments are anticipated and addressed\n"
-                f"- Consider flow and overall persuasiveness\n\n"
-                
-                f"3) FACTUAL ACCURACY:\n"
-                f"- Verify claim validity against established knowledge\n"
-                f"- Evaluate quality and credibility of sources (if cited)\n"
-                f"- Assess evidence completeness and sufficiency\n"
-                f"- Check for contextual integrity and proper framing of facts\n\n"
-                
-                f"4) BELIEF IMPACT:\n"
-                f"- Estimate persuasive impact on opposing audiences\n"
-                f"- Analyze effectiveness for neutral/undecided audiences\n"
-                f"- Consider reinforcement value for already supportive audiences\n"
-                f"- Identify any elements that might reduce appeal to certain audiences\n\n"
-                
-                f"Provide specific, constructive feedback that will help the debater improve their argument. Be balanced and fair in your assessment.\n\n"
-                f"IMPORTANT: After your analysis, provide quantitative scores on a scale of 1-10 for the following categories:\n"
-                f"- LOGICAL CONSISTENCY SCORE: [score]\n"
-                f"- PERSUASIVE QUALITY SCORE: [score]\n"
-                f"- FACTUAL ACCURACY SCORE: [score]\n"
-                f"- BELIEF-SHIFT SCORE: [score]\n"
-                f"For example, your output should look like below with the only change be the score:\n"
-                f"- LOGICAL CONSISTENCY SCORE: 9\n"
-                f"- PERSUASIVE QUALITY SCORE: 7\n"
-                f"- FACTUAL ACCURACY SCORE: 8\n"
-                f"- BELIEF-SHIFT SCORE: 10\n"
-            )
-            feedback = call_llm_api(prompt, self.model_name) # Context management might be needed
-        
-        # Separate the textual feedback from the scores (e.g., using string splitting or regex)
-        # For example (this is basic, regex might be more robust):
-        try:
-            feedback_text = feedback.split("IMPORTANT:")[0].strip() # Or split based on score markers
-            scores = {}
-            # Example parsing (needs refinement based on actual LLM output format)
-            lines = feedback.splitlines()
-            for line in reversed(lines): # Start from the end
-                if "LOGICAL CONSISTENCY SCORE" in line:
-                    scores['logic'] = float(re.search(r"[-+]?\d*\.?\d+", line).group())
-                elif "PERSUASIVE QUALITY SCORE" in line:
-                    scores['persuasive'] = float(re.search(r"[-+]?\d*\.?\d+", line).group())
-                elif "FACTUAL ACCURACY SCORE" in line:
-                    scores['factual'] = float(re.search(r"[-+]?\d*\.?\d+", line).group())
-                elif "BELIEF-SHIFT SCORE" in line:
-                    scores['belief'] = float(re.search(r"[-+]?\d*\.?\d+", line).group())
-                if len(scores) == 4:
-                    break # Stop once all scores found
-            if len(scores) != 4: # Handle case where parsing failed
-                print("[WARN] Failed to parse all scores from LLM response.")
-                scores = {'logic': 0, 'persuasive': 0, 'factual': 0, 'belief': 0} # Default scores with new keys
-        except Exception as e:
-            print(f"[ERROR] Could not parse scores: {e}")
-            feedback_text = feedback # Keep original response if parsing fails
-            scores = {'logic': 0, 'persuasive': 0, 'factual': 0, 'belief': 0} # Default scores with new keys
+            feedback = await self._call_judge(*self._build_comprehensive_prompt(argument, debater_name, topic, round_num))
+
+        feedback_text, scores = self._parse_scores(feedback)
+        if self.use_strategic_layers:
+            scores.update(layer_scores)
+        scores = await self._rescore_missing(argument, debater_name, topic, round_num, feedback_text, scores)
 
         # Add word count feedback if needed
         feedback_text += word_count_feedback
 
         print(f"{self.name} generated feedback and scores for {debater_name}.")
-        return feedback_text, scores 
+        return feedback_text, scores
+
+    def evaluate_argument(self, argument: str, debater_name: str, topic: str, round_num: int) -> tuple[str, Dict[str, float]]:
+        """
+        Evaluates a single argument using the LLM or predefined rules.
+        Blocking wrapper around `aevaluate_argument`.
+
+        Args:
+            argument (str): The argument text to evaluate.
+            debater_name (str): The name of the debater who made the argument.
+            topic (str): The debate topic.
+            round_num (int): The current round number.
+
+        Returns:
+            tuple[str, Dict[str, float]]: Constructive feedback for the debater and the parsed scores.
+        """
+        return run_sync(self.aevaluate_argument(argument, debater_name, topic, round_num))
+
+    def _build_scores_prompt(self, argument: str, debater_name: str, topic: str, round_num: int) -> tuple[str, str]:
+        """Builds the (instructions, body) of the scores-only evaluation: the rubric of all analysis layers, no critique."""
+        instructions = (
+            f"{self.system_prompt}\nYou will be given a debate topic, the round, a debater and their argument to evaluate.\n"
+            + SCORES_ONLY_RUBRIC + score_json_instructions(SCORE_KEYS)
+        )
+        return instructions, self._argument_body(argument, debater_name, topic, round_num)
+
+    async def aevaluate_scores(self, argument: str, debater_name: str, topic: str, round_num: int,
+                               max_tokens: int = SCORES_ONLY_MAX_TOKENS) -> Dict[str, float]:
+        """
+        Scores an argument without generating any critique.
+
+        A single short request with a tight output-token cap, regardless of use_strategic_layers.
+        Use it when only the scores are consumed (e.g. re-judging an improved argument).
+
+        Args:
+            argument (str): The argument text to evaluate.
+            debater_name (str): The name of the debater who made the argument.
+            topic (str): The debate topic.
+            round_num (int): The current round number.
+            max_tokens (int): Cap on output tokens for the scoring request.
+
+        Returns:
+            Dict[str, float]: The four scores.
+        """
+        print(f"{self.name} scoring argument from {debater_name} (scores only)...")
+        response = await self._call_judge(*self._build_scores_prompt(argument, debater_name, topic, round_num), max_tokens=max_tokens)
+        _, scores = self._parse_scores(response)
+        return await self._rescore_missing(argument, debater_name, topic, round_num, "", scores)
+
+    def evaluate_scores(self, argument: str, debater_name: str, topic: str, round_num: int,
+                        max_tokens: int = SCORES_ONLY_MAX_TOKENS) -> Dict[str, float]:
+        """Blocking wrapper around `aevaluate_scores`."""
+        return run_sync(self.aevaluate_scores(argument, debater_name, topic, round_num, max_tokens))
+
+    # --- Comparative (pairwise) evaluation ---
+    def _pair_body(self, argument_a: str, debater_a: str, argument_b: str, debater_b: str, topic: str, round_num: int) -> str:
+        return (
+            f"DEBATE TOPIC: {topic}\nROUND: {round_num}\nDEBATERS: Debater A: {debater_a}; Debater B: {debater_b}\nARGUMENTS:\n"
+            f"[DEBATER A: {debater_a}]\n{argument_a}\n\n[DEBATER B: {debater_b}]\n{argument_b}"
+        )
+
+    def _pair_format_instructions(self, keys: List[str], critique: str) -> str:
+        if self.structured_output:
+            return pair_json_instructions(keys, critique)
+        return ("Evaluate each debater separately, in the format above: write your evaluation of Debater A under the heading "
+                "'### DEBATER A' and your evaluation of Debater B under the heading '### DEBATER B'.\n")
+
+    def _build_pair_layer_prompt(self, layer: Dict[str, str], argument_a: str, debater_a: str, argument_b: str, debater_b: str,
+                                 topic: str, round_num: int) -> tuple[str, str]:
+        """Builds the (instructions, body) of the prompt for a single analysis layer covering both debaters."""
+        layer_prompt = layer["prompt_template"].format(**LAYER_PLACEHOLDERS)
+        instructions = (
+            f"{self.system_prompt}\n"
+            f"You are comparing the arguments of two debaters from the same round. Apply the analysis below to each of them separately, "
+            f"judging both by the same standard.\nAnalyze based on '{layer['focus']}':\n{layer_prompt}\n\n"
+            + self._pair_format_instructions([layer["score_key"]], "your 200-word critique of this debater")
+        )
+        return instructions, self._pair_body(argument_a, debater_a, argument_b, debater_b, topic, round_num)
+
+    def _build_pair_comprehensive_prompt(self, argument_a: str, debater_a: str, argument_b: str, debater_b: str, topic: str,
+                                         round_num: int) -> tuple[str, str]:
+        """Builds the (instructions, body) of the single-prompt evaluation covering all analysis layers for both debaters."""
+        instructions = f"{self.system_prompt}\nYou will be given a debate topic, the round, and the arguments of two debaters to evaluate.\n" + COMPREHENSIVE_RUBRIC
+        if self.structured_output:
+            instructions += "Evaluate each debater separately. " + pair_json_instructions(SCORE_KEYS, "your full evaluation and constructive feedback for this debater")
+        else:
+            instructions += SCORE_LINES_FORMAT + "\n" + self._pair_format_instructions(SCORE_KEYS, None)
+        return instructions, self._pair_body(argument_a, debater_a, argument_b, debater_b, topic, round_num)
+
+    def _build_pair_scores_prompt(self, argument_a: str, debater_a: str, argument_b: str, debater_b: str, topic: str,
+                                  round_num: int) -> tuple[str, str]:
+        """Builds the (instructions, body) of the scores-only evaluation of both debaters."""
+        instructions = (
+            f"{self.system_prompt}\nYou will be given a debate topic, the round, and the arguments of two debaters to evaluate.\n"
+            + SCORES_ONLY_RUBRIC + "Score each debater separately. " + pair_json_instructions(SCORE_KEYS)
+        )
+        return instructions, self._pair_body(argument_a, debater_a, argument_b, debater_b, topic, round_num)
+
+    def _parse_pair(self, response: str, keys: List[str] = SCORE_KEYS) -> List[tuple[str, Dict[str, float]]]:
+        """
+        Splits a comparative response into per-debater (feedback_text, scores).
+
+        Reads the {"A": ..., "B": ...} JSON format first, then '### DEBATER A/B' sections. If the
+        response can't be attributed to a debater, both get the full text and no scores.
+        """
+        data = extract_json_object(response) if "{" in response else None
+        if data is not None and all(isinstance(data.get(label), dict) for label in ("A", "B")):
+            results = []
+            for label in ("A", "B"):
+                critique = data[label].get("critique")
+                text = critique.strip() if isinstance(critique, str) and critique.strip() else response
+                results.append((text, validate_scores(data[label], keys)))
+            return results
+        headings = list(PAIR_HEADING_PATTERN.finditer(response))
+        sections = {}
+        for index, heading in enumerate(headings):
+            end = headings[index + 1].start() if index + 1 < len(headings) else len(response)
+            sections[(heading.group(1) or heading.group(2)).upper()] = response[heading.end():end] # last heading wins over an echoed one
+        if "A" in sections and "B" in sections:
+            return [self._parse_scores(sections[label].strip(), keys) for label in ("A", "B")]
+        print("[WARN] Could not split comparative evaluation by debater.")
+        return [(response.strip(), {}), (response.strip(), {})]
+
+    async def _run_pair_layer_analysis(self, layer: Dict[str, str], argument_a: str, debater_a: str, argument_b: str, debater_b: str,
+                                       topic: str, round_num: int, semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        """Helper coroutine to run analysis for a single layer on both debaters in one request."""
+        try:
+            instructions, body = self._build_pair_layer_prompt(layer, argument_a, debater_a, argument_b, debater_b, topic, round_num)
+            async with semaphore:
+                with tracer.span(f"layer {layer['focus']}", kind="judge_layer"):
+                    layer_analysis = await self._call_judge(instructions, body)
+            print(f"Completed comparative analysis layer: {layer['focus']}")
+            return [{"focus": layer['focus'], "analysis": analysis, "scores": scores}
+                    for analysis, scores in self._parse_pair(layer_analysis, [layer["score_key"]])]
+        except Exception as e:
+            print(f"Error during comparative analysis layer '{layer['focus']}': {e}")
+            raise
+
+    async def aevaluate_pair(self, argument_a: str, debater_a: str, argument_b: str, debater_b: str, topic: str,
+                             round_num: int) -> tuple[tuple[str, Dict[str, float]], tuple[str, Dict[str, float]]]:
+        """
+        Evaluates both debaters' arguments for a round side by side.
+
+        One request per analysis layer (or one request in single-prompt mode) covers both
+        arguments, instead of one per layer per debater.
+
+        Args:
+            argument_a (str): Debater A's argument.
+            debater_a (str): Debater A's name.
+            argument_b (str): Debater B's argument.
+            debater_b (str): Debater B's name.
+            topic (str): The debate topic.
+            round_num (int): The current round number.
+
+        Returns:
+            tuple: (feedback_text, scores) for debater A and for debater B, as returned by `aevaluate_argument`.
+        """
+        print(f"{self.name} comparing arguments from {debater_a} and {debater_b}...")
+        pairs = [(argument_a, debater_a), (argument_b, debater_b)]
+        word_count_feedback = [
+            "" if self.check_word_count(argument, name)
+            else f"\nWarning: The argument exceeded the 520-word requirement ({len(argument.split())} words).\n"
+            for argument, name in pairs
+        ]
+
+        if self.use_strategic_layers:
+            print(f"Running comparative strategic layer analysis in parallel (max_workers={self.max_workers})...")
+            semaphore = asyncio.Semaphore(self.max_workers)
+            layer_tasks = [
+                asyncio.ensure_future(self._run_pair_layer_analysis(layer, argument_a, debater_a, argument_b, debater_b, topic, round_num, semaphore))
+                for layer in ANALYSIS_LAYERS
+            ]
+            try:
+                layer_results = await asyncio.gather(*layer_tasks)
+            except Exception:
+                for task in layer_tasks:
+                    task.cancel()
+                raise
+
+            parsed = []
+            for index, (argument, name) in enumerate(pairs):
+                full_feedback = f"Feedback for {name} on Round {round_num} (Topic: {topic}):\nArgument:\n'''{argument}'''\n\nAnalysis:\n"
+                scores = {}
+                for result in layer_results:
+                    full_feedback += f"\n--- {result[index]['focus']} ---\n{result[index]['analysis']}\n"
+                    scores.update(result[index]['scores'])
+                parsed.append((full_feedback, scores))
+        else:
+            print("Running comprehensive comparative evaluation...")
+            prompt = self._build_pair_comprehensive_prompt(argument_a, debater_a, argument_b, debater_b, topic, round_num)
+            parsed = self._parse_pair(await self._call_judge(*prompt))
+
+        scores = await asyncio.gather(*[
+            self._rescore_missing(argument, name, topic, round_num, feedback_text, partial_scores)
+            for (argument, name), (feedback_text, partial_scores) in zip(pairs, parsed)
+        ])
+        print(f"{self.name} generated comparative feedback and scores for {debater_a} and {debater_b}.")
+        return tuple((feedback_text + word_count_feedback[index], scores[index]) for index, (feedback_text, _) in enumerate(parsed))
+
+    def evaluate_pair(self, argument_a: str, debater_a: str, argument_b: str, debater_b: str, topic: str,
+                      round_num: int) -> tuple[tuple[str, Dict[str, float]], tuple[str, Dict[str, float]]]:
+        """Blocking wrapper around `aevaluate_pair`."""
+        return run_sync(self.aevaluate_pair(argument_a, debater_a, argument_b, debater_b, topic, round_num))
+
+    async def aevaluate_pair_scores(self, argument_a: str, debater_a: str, argument_b: str, debater_b: str, topic: str, round_num: int,
+                                    max_tokens: int = 2 * SCORES_ONLY_MAX_TOKENS) -> tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Scores both debaters' arguments for a round in one scores-only request (see `aevaluate_scores`).
+
+        Returns:
+            tuple[Dict[str, float], Dict[str, float]]: The four scores for debater A and for debater B.
+        """
+        print(f"{self.name} scoring arguments from {debater_a} and {debater_b} (scores only)...")
+        prompt = self._build_pair_scores_prompt(argument_a, debater_a, argument_b, debater_b, topic, round_num)
+        response = await self._call_judge(*prompt, max_tokens=max_tokens)
+        parsed = self._parse_pair(response)
+        return tuple(await asyncio.gather(*[
+            self._rescore_missing(argument, name, topic, round_num, "", partial_scores)
+            for (argument, name), (_, partial_scores) in zip([(argument_a, debater_a), (argument_b, debater_b)], parsed)
+        ]))
+
+    def evaluate_pair_scores(self, argument_a: str, debater_a: str, argument_b: str, debater_b: str, topic: str, round_num: int,
+                             max_tokens: int = 2 * SCORES_ONLY_MAX_TOKENS) -> tuple[Dict[str, float], Dict[str, float]]:
+        """Blocking wrapper around `aevaluate_pair_scores`."""
+        return run_sync(self.aevaluate_pair_scores(argument_a, debater_a, argument_b, debater_b, topic, round_num, max_tokens))
 
     # --- Keep your existing declare_winner function ---
-    def declare_winner(self, debate_history: List[Dict[str, Any]], topic: str) -> str:
+    async def adeclare_winner(self, debate_history: List[Dict[str, Any]], topic: str) -> str:
         """
         Evaluates the entire debate and declares a winner (or assesses overall performance).
 
@@ -402,7 +842,8 @@ class JudgeAgent:
             str: A summary of the debate outcome.
         """
         print(f"{self.name} evaluating the overall debate...")
-        history_summary = "\n".join([f"Round {turn['round']} - {turn['debater']}: {turn['argument'][:100]}..." for turn in debate_history])
+        # Self-improving debates record 'improved_argument' instead of 'argument'
+        history_summary = "\n".join([f"Round {turn['round']} - {turn['debater']}: {turn.get('argument', turn.get('improved_argument', ''))[:100]}..." for turn in debate_history])
 
         prompt = (
             f"{self.system_prompt}\n"
@@ -414,6 +855,10 @@ class JudgeAgent:
         )
 
         # Call LLM for final judgement
-        final_judgement = call_llm_api(prompt, self.model_name)
+        final_judgement = await run_scheduled(self.scheduler, call_llm_api_async, prompt, self.model_name)
         print(f"{self.name} provided final judgement.")
         return final_judgement
+
+    def declare_winner(self, debate_history: List[Dict[str, Any]], topic: str) -> str:
+        """Blocking wrapper around `adeclare_winner`."""
+        return run_sync(self.adeclare_winner(debate_history, topic))
@@ -0,0 +1,429 @@
+import os
+import csv
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from Tournament import match_score
+
+SCHEMA_VERSION = 1
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS debates ("
+    "debate_id TEXT PRIMARY KEY, sweep TEXT, timestamp TEXT, topic TEXT, orchestrator TEXT, "
+    "debater_a TEXT, model_a TEXT, stance_a TEXT, debater_b TEXT, model_b TEXT, stance_b TEXT, "
+    "judge TEXT, judge_model TEXT, judge_mode TEXT, rounds INTEGER, score_a REAL, score_b REAL, "
+    "final_judgement TEXT, seconds REAL, error TEXT, config TEXT)",
+    # One row per argument: phase is 'argument' in plain debates, 'original' / 'improved' in self-improving ones
+    "CREATE TABLE IF NOT EXISTS turns ("
+    "debate_id TEXT NOT NULL, round INTEGER NOT NULL, debater TEXT NOT NULL, side TEXT, model TEXT, "
+    "phase TEXT NOT NULL, text TEXT, feedback TEXT, PRIMARY KEY (debate_id, round, debater, phase))",
+    "CREATE TABLE IF NOT EXISTS scores ("
+    "debate_id TEXT NOT NULL, round INTEGER NOT NULL, debater TEXT NOT NULL, phase TEXT NOT NULL, "
+    "criterion TEXT NOT NULL, score REAL, PRIMARY KEY (debate_id, round, debater, phase, criterion))",
+    "CREATE INDEX IF NOT EXISTS idx_debates_topic ON debates(topic)",
+    "CREATE INDEX IF NOT EXISTS idx_debates_debater_a ON debates(debater_a)",
+    "CREATE INDEX IF NOT EXISTS idx_debates_debater_b ON debates(debater_b)",
+    "CREATE INDEX IF NOT EXISTS idx_debates_model_a ON debates(model_a)",
+    "CREATE INDEX IF NOT EXISTS idx_debates_model_b ON debates(model_b)",
+    "CREATE INDEX IF NOT EXISTS idx_turns_debater ON turns(debater)",
+    "CREATE INDEX IF NOT EXISTS idx_turns_model ON turns(model)",
+    "CREATE INDEX IF NOT EXISTS idx_scores_debater ON scores(debater, criterion)",
+)
+TABLES = ("debates", "turns", "scores")
+# Errors that mean one record can't be stored, as opposed to the database failing
+RECORD_ERRORS = (KeyError, TypeError, ValueError, AttributeError, sqlite3.IntegrityError, sqlite3.InterfaceError,
+                 sqlite3.ProgrammingError) # unbindable values
+
+# Wide export layout (the columns of the old per-debate CSV rows): per phase, the argument
+# column, the score columns and where the judge feedback goes
+WIDE_SCORE_COLUMNS = {"logic": "logic", "factual": "evidence", "persuasive": "rhetoric", "belief": "belief"}
+WIDE_PHASES = {
+    "argument": ("arg", "feedback", "scores"),
+    "original": ("original_arg", "original_scores", "feedback"),
+    "improved": ("improved_arg", "improved_scores"),
+}
+WIDE_LEADING_COLUMNS = ["timestamp", "topic", "debater_a", "debater_b"]
+WIDE_TRAILING_COLUMNS = ["final_judgement", "final_score_A", "final_score_B", "debate_id"]
+
+
+def _phases(turn: Dict[str, Any]) -> List[Tuple[str, str, Dict[str, Any], str]]:
+    """(phase, text, scores, feedback) of each argument in a history entry."""
+    if "improved_argument" in turn or "original_argument" in turn:
+        return [("original", turn.get("original_argument", ""), turn.get("scores") or {}, turn.get("feedback", "")),
+                ("improved", turn.get("improved_argument", ""), turn.get("improved_scores") or {}, None)]
+    return [("argument", turn.get("argument", ""), turn.get("scores") or {}, turn.get("feedback", ""))]
+
+
+def debate_record(debate: Any, **fields) -> Dict[str, Any]:
+    """
+    Builds the `ResultsStore.append` record of a finished debate.
+
+    Args:
+        debate: A DebateOrchestrator or SelfImprovingDebateOrchestrator that has run.
+        **fields: Record fields to set or override (id, sweep, orchestrator, judge mode, config, seconds, ...).
+
+    Returns:
+        Dict[str, Any]: The record.
+    """
+    history = debate.debate_history
+    a, b = debate.debater_a, debate.debater_b
+    record = {
+        "id": getattr(debate, "debate_id", None),
+        "timestamp": datetime.now().isoformat(),
+        "topic": debate.topic,
+        "orchestrator": type(debate).__name__,
+        "debater_a": {"name": a.name, "model": a.model_name, "stance": a.stance},
+        "debater_b": {"name": b.name, "model": b.model_name, "stance": b.stance},
+        "judge": {"name": debate.judge.name, "model": debate.judge.model_name},
+        "rounds": max((turn["round"] for turn in history), default=0),
+        "history": history,
+        "final_judgement": debate.final_judgement,
+        "scores": {a.name: match_score(history, a.name), b.name: match_score(history, b.name)},
+    }
+    record.update(fields)
+    return record
+
+
+class ResultsStore:
+    """
+    Long-format SQLite store of debate results.
+
+    A debate is one row of `debates` (topic, debaters, models, judge, totals, configuration),
+    one row of `turns` per argument (debate, round, debater, phase, text, feedback) and one row
+    of `scores` per criterion of each argument, so debates of any length sit side by side and
+    can be filtered by topic, debater or model through indexes. Appended debates are buffered
+    and written in one transaction per batch, once `batch_size` debates are waiting or
+    `flush_seconds` have passed since the last write (callers that append rarely can also call
+    `flush` on a timer); `close` writes the rest. Rewriting a debate id replaces it.
+    `export_wide` produces the one-row-per-debate CSV/XLSX layout on demand. Safe to share
+    across threads.
+    """
+
+    def __init__(self, path: str = "debate_results.sqlite", batch_size: int = 20, flush_seconds: float = 5.0):
+        """
+        Initializes the store, creating the file and schema if needed.
+
+        Args:
+            path (str): SQLite file.
+            batch_size (int): Buffered debates that trigger a write.
+            flush_seconds (float): Time since the last write after which an append writes straight away
+                (0 writes every debate as it is appended).
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self.rejected: List[Tuple[Dict[str, Any], str]] = [] # (record, error) of debates that couldn't be stored
+        self._last_flush = time.monotonic()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Writing ---
+    def append(self, record: Dict[str, Any]):
+        """
+        Buffers a debate for writing.
+
+        Args:
+            record (Dict[str, Any]): A debate, as built by `debate_record`: 'id' (generated if missing), 'topic',
+                'debater_a' / 'debater_b' ({name, model, stance}), 'judge' ({name, model, mode}), 'history',
+                and optionally 'sweep', 'timestamp', 'orchestrator', 'rounds', 'scores' (total by debater name),
+                'final_judgement', 'seconds', 'error' and 'config' (stored as JSON).
+        """
+        record = dict(record, id=record.get("id") or uuid.uuid4().hex[:12])
+        with self._lock:
+            self._pending.append(record)
+            due = len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered debates in one transaction.
+
+        A malformed debate (missing fields, duplicate turns, unstorable values) is logged, kept in
+        `rejected` and skipped without affecting the rest of the batch. If the write itself fails
+        (database locked, disk full, ...), the whole batch stays buffered for the next flush and the
+        error is raised.
+        """
+        with self._lock:
+            pending, self._pending = list({record["id"]: record for record in self._pending}.values()), []
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                for record in pending:
+                    self._conn.execute("SAVEPOINT debate")
+                    try:
+                        self._write(record)
+                    except RECORD_ERRORS as e:
+                        self._conn.execute("ROLLBACK TO debate")
+                        self.rejected.append((record, f"{type(e).__name__}: {e}"))
+                        print(f"[RESULTS] Skipping debate {record['id']}, which can't be stored: {type(e).__name__}: {e}")
+                    self._conn.execute("RELEASE debate")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                self._pending = pending + self._pending # keep them for the next attempt
+                self.rejected = [entry for entry in self.rejected if entry[0] not in pending]
+                raise
+
+    def _write(self, record: Dict[str, Any]):
+        debate, turns, scores = self._rows(record)
+        for table in TABLES:
+            self._conn.execute(f"DELETE FROM {table} WHERE debate_id = ?", (record["id"],))
+        self._conn.execute(f"INSERT INTO debates VALUES ({', '.join('?' * 21)})", debate)
+        self._conn.executemany("INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)", turns)
+        self._conn.executemany("INSERT INTO scores VALUES (?, ?, ?, ?, ?, ?)", scores)
+
+    @staticmethod
+    def _rows(record: Dict[str, Any]) -> Tuple[tuple, List[tuple], List[tuple]]:
+        debate_id = record["id"]
+        a, b = record.get("debater_a") or {}, record.get("debater_b") or {}
+        judge, totals = record.get("judge") or {}, record.get("scores") or {}
+        debate = (debate_id, record.get("sweep"), record.get("timestamp") or datetime.now().isoformat(), record.get("topic"),
+                  record.get("orchestrator"), a.get("name"), a.get("model"), a.get("stance"), b.get("name"), b.get("model"),
+                  b.get("stance"), judge.get("name"), judge.get("model"), judge.get("mode"), record.get("rounds"),
+                  totals.get(a.get("name")), totals.get(b.get("name")), record.get("final_judgement"), record.get("seconds"),
+                  record.get("error"), json.dumps(record["config"], default=str) if record.get("config") is not None else None)
+        sides = {a.get("name"): ("A", a.get("model")), b.get("name"): ("B", b.get("model"))}
+        turns, scores = [], []
+        for turn in record.get("history") or []:
+            side, model = sides.get(turn["debater"], (None, None))
+            for phase, text, phase_scores, feedback in _phases(turn):
+                turns.append((debate_id, turn["round"], turn["debater"], side, model, phase, text, feedback))
+                scores.extend((debate_id, turn["round"], turn["debater"], phase, criterion, score)
+                              for criterion, score in phase_scores.items())
+        return debate, turns, scores
+
+    def close(self):
+        """Writes the buffered debates and closes the database (even if the write fails)."""
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._conn.close()
+
+    # --- Reading ---
+    def done_ids(self) -> Set[str]:
+        """Ids of the debates stored (or buffered) without an error."""
+        with self._lock:
+            done = {row[0] for row in self._conn.execute("SELECT debate_id FROM debates WHERE error IS NULL")}
+            return done | {record["id"] for record in self._pending if not record.get("error")}
+
+    @staticmethod
+    def _where(sweep: str = None, topic: str = None, debater: str = None, model: str = None) -> Tuple[str, list]:
+        clauses, params = ["error IS NULL"], []
+        if sweep is not None:
+            clauses.append("sweep = ?")
+            params.append(sweep)
+        if topic is not None:
+            clauses.append("topic = ?")
+            params.append(topic)
+        if debater is not None:
+            clauses.append("(debater_a = ? OR debater_b = ?)")
+            params += [debater, debater]
+        if model is not None:
+            clauses.append("(model_a = ? OR model_b = ?)")
+            params += [model, model]
+        return " AND ".join(clauses), params
+
+    def debates(self, **filters) -> List[Dict[str, Any]]:
+        """
+        Lists stored debates (without errors), oldest first.
+
+        Args:
+            **filters: Any of sweep, topic, debater (either side) and model (either side).
+
+        Returns:
+            List[Dict[str, Any]]: One `debates` row per debate, as a dict.
+        """
+        where, params = self._where(**filters)
+        self.flush()
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT * FROM debates WHERE {where} ORDER BY timestamp, debate_id", params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+
+    def _turns(self, debate_ids: Iterable[str]) -> Dict[Tuple[str, int, str, str], Dict[str, Any]]:
+        # (debate, round, side, phase) -> {'text', 'feedback', 'scores'}, read in one pass per table
+        ids = list(debate_ids)
+        turns = {}
+        with self._lock:
+            for start in range(0, len(ids), 500): # stay under SQLite's bound-parameter limit
+                chunk = ids[start:start + 500]
+                marks = ", ".join("?" * len(chunk))
+                sides = {}
+                for debate_id, round_num, debater, side, phase, text, feedback in self._conn.execute(
+                        f"SELECT debate_id, round, debater, side, phase, text, feedback FROM turns WHERE debate_id IN ({marks})", chunk):
+                    turns[(debate_id, round_num, side, phase)] = {"text": text, "feedback": feedback, "scores": {}}
+                    sides[(debate_id, round_num, debater, phase)] = side
+                for debate_id, round_num, debater, phase, criterion, score in self._conn.execute(
+                        f"SELECT debate_id, round, debater, phase, criterion, score FROM scores WHERE debate_id IN ({marks})", chunk):
+                    key = (debate_id, round_num, sides.get((debate_id, round_num, debater, phase)), phase)
+                    if key in turns:
+                        turns[key]["scores"][criterion] = score
+        return turns
+
+    # --- Export ---
+    def wide_rows(self, **filters) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        The stored debates in the one-row-per-debate layout: for every round and side, the argument,
+        feedback and score columns of each phase present.
+
+        The columns cover the longest debate and every phase in the selection, so debates of
+        different lengths and orchestrators line up (missing cells are empty).
+
+        Args:
+            **filters: As for `debates`.
+
+        Returns:
+            Tuple[List[str], List[Dict[str, Any]]]: (column names, rows).
+        """
+        debates = self.debates(**filters)
+        turns = self._turns(debate["debate_id"] for debate in debates)
+        max_rounds = max((key[1] for key in turns), default=0)
+        phases = [phase for phase in WIDE_PHASES if any(key[3] == phase for key in turns)]
+        round_columns, seen = [], set()
+        for round_num in range(1, max_rounds + 1):
+            for side in ("A", "B"):
+                for phase in phases:
+                    for part in WIDE_PHASES[phase]:
+                        key = (round_num, side, phase, part)
+                        if part.endswith("scores"):
+                            prefix = part[:-len("scores")]
+                            round_columns += [(f"round_{round_num}_{side}_{prefix}score_{label}", key, criterion)
+                                              for criterion, label in WIDE_SCORE_COLUMNS.items()]
+                        elif f"round_{round_num}_{side}_{part}" not in seen: # one feedback column when phases mix
+                            seen.add(f"round_{round_num}_{side}_{part}")
+                            round_columns.append((f"round_{round_num}_{side}_{part}", key, None))
+        rows = []
+        for debate in debates:
+            row = {"timestamp": debate["timestamp"], "topic": debate["topic"], "debater_a": debate["debater_a"],
+                   "debater_b": debate["debater_b"], "final_judgement": debate["final_judgement"] or "",
+                   "final_score_A": debate["score_a"], "final_score_B": debate["score_b"], "debate_id": debate["debate_id"]}
+            for column, (round_num, side, phase, part), criterion in round_columns:
+                if part == "feedback": # judge feedback belongs to the first argument of the turn, whatever its phase
+                    phase = next((name for name in ("argument", "original") if (debate["debate_id"], round_num, side, name) in turns), phase)
+                turn = turns.get((debate["debate_id"], round_num, side, phase))
+                if turn is None:
+                    value = ""
+                elif criterion is not None:
+                    value = turn["scores"].get(criterion, "")
+                else:
+                    value = turn["feedback"] if part == "feedback" else turn["text"]
+                row[column] = "" if value is None else value
+            rows.append(row)
+        return WIDE_LEADING_COLUMNS + [column for column, _, _ in round_columns] + WIDE_TRAILING_COLUMNS, rows
+
+    def export_wide(self, path: str, **filters) -> int:
+        """
+        Writes the `wide_rows` layout to a CSV or (with openpyxl installed) XLSX file, replacing it.
+
+        A CSV at `path` that wasn't written by a store (the old append-only logs) is first moved
+        to '<name>.legacy.csv' rather than overwritten.
+
+        Args:
+            path (str): Output file; '.xlsx' for Excel, anything else is CSV.
+            **filters: As for `debates`.
+
+        Returns:
+            int: Number of debates exported.
+        """
+        headers, rows = self.wide_rows(**filters)
+        if path.lower().endswith(".xlsx"):
+            try:
+                from openpyxl import Workbook
+            except ImportError as e:
+                raise ImportError("XLSX export needs openpyxl (pip install openpyxl); export to .csv instead.") from e
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.append(headers)
+            for row in rows:
+                sheet.append([row.get(header, "") for header in headers])
+            workbook.save(path)
+        else:
+            self._move_legacy_csv(path)
+            temporary = f"{path}.tmp"
+            with open(temporary, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=headers)
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(temporary, path)
+        print(f"[RESULTS] Exported {len(rows)} debates to {path}")
+        return len(rows)
+
+    @staticmethod
+    def _move_legacy_csv(path: str):
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), [])
+        except FileNotFoundError:
+            return
+        if header and WIDE_TRAILING_COLUMNS[-1] not in header:
+            stem, extension = os.path.splitext(path)
+            legacy = f"{stem}.legacy{extension or '.csv'}"
+            os.replace(path, legacy)
+            print(f"[RESULTS] Moved the existing {path} (not written by a results store) to {legacy}")
+
+    def export_parquet(self, directory: str, **filters) -> List[str]:
+        """
+        Writes the long-format tables (debates, turns, scores) as Parquet files; needs pyarrow.
+
+        Args:
+            directory (str): Output directory ('<table>.parquet' files).
+            **filters: As for `debates`.
+
+        Returns:
+            List[str]: The files written.
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow); the SQLite file holds the same tables.") from e
+        ids = [debate["debate_id"] for debate in self.debates(**filters)]
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        with self._lock:
+            for table in TABLES:
+                rows, columns = [], None
+                for start in range(0, max(len(ids), 1), 500):
+                    chunk = ids[start:start + 500]
+                    cursor = self._conn.execute(f"SELECT * FROM {table} WHERE debate_id IN ({', '.join('?' * len(chunk))})", chunk)
+                    columns = [column[0] for column in cursor.description]
+                    rows += cursor.fetchall()
+                path = os.path.join(directory, f"{table}.parquet")
+                pyarrow.parquet.write_table(pyarrow.Table.from_pylist([dict(zip(columns, row)) for row in rows]), path)
+                paths.append(path)
+        return paths
+
+    def import_jsonl(self, path: str) -> int:
+        """Stores the debates of a JSON-lines results file (e.g. an earlier sweep's); returns how many were read."""
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError: # torn last line of an interrupted run
+                    continue
+                self.append(record)
+                count += 1
+        self.flush()
+        return count
@@ -1,47 +1,67 @@
-import concurrent.futures
+from functools import partial
+from operator import itemgetter
 from DebaterAgent import DebaterAgent
 from JudgeAgent import JudgeAgent
-from llm_helper import call_llm_api
+from DebateEngine import DebateEngine, DebateGraph
+from FeedbackDistiller import FeedbackDistiller
+from DebateCheckpoint import DebateCheckpoint
+from BaseDebateOrchestrator import BaseDebateOrchestrator
+from llm_scheduler import TaskScheduler, run_scheduled
+from llm_helper import call_llm_api_async
+
+# Prompt asking a debater to revise an argument; {original_argument} and {feedback} are filled in
+IMPROVE_PROMPT = """
+You previously made the following argument:
+'''{original_argument}'''
+
+You received this feedback:
+'''{feedback}'''
+
+Please improve your argument based on the feedback. Focus on strengthening your reasoning, 
+addressing weaknesses identified in the feedback, and maintaining a clear structure.
+Your improved argument must still be 520 words or less.
 
-class SelfImprovingDebateOrchestrator:
+Provide only the improved argument.
+"""
+
+class SelfImprovingDebateOrchestrator(BaseDebateOrchestrator):
     """
     Manages the flow of debate between agents with a self-improvement cycle.
     Each debater gets feedback on their argument and a chance to improve it before the next round.
+    The debate format is declared as a `DebateGraph` and executed by a `DebateEngine`.
     """
 
-    def __init__(self, debater_a: DebaterAgent, debater_b: DebaterAgent, judge: JudgeAgent, topic: str, max_workers_round1: int = 2):
+    title = "Self-Improving Debate"
+
+    def __init__(self, debater_a: DebaterAgent, debater_b: DebaterAgent, judge: JudgeAgent, topic: str, max_workers_round1: int = 2, warm_up: bool = False,
+                 pipelined: bool = False, engine: DebateEngine = None, scheduler: TaskScheduler = None,
+                 full_reevaluation: bool = False, pairwise_judging: bool = False, distill_feedback: bool = True,
+                 feedback_distiller: FeedbackDistiller = None, checkpoints: DebateCheckpoint = None, debate_id: str = None,
+                 improve_prompt: str = IMPROVE_PROMPT):
         """
-        Initializes the orchestrator.
+        Initializes the orchestrator; see `BaseDebateOrchestrator` for the shared arguments.
 
         Args:
-            debater_a (DebaterAgent): The first debater.
-            debater_b (DebaterAgent): The second debater.
-            judge (JudgeAgent): The judge.
-            topic (str): The topic of the debate.
-            max_workers_round1 (int): Max workers for parallel argument generation in round 1.
+            pipelined (bool): Re-evaluate improved arguments concurrently with the opponent's next argument,
+                and run both round-1 cycles in parallel. Produces the same debate_history.
+            full_reevaluation (bool): Re-judge improved arguments with a full evaluation. By default only
+                the scores are requested, since the critique of an improved argument is never used.
+            pairwise_judging (bool): Re-judge both improved arguments of a round side by side in one request
+                (`JudgeAgent.aevaluate_pair_scores` / `aevaluate_pair`). First evaluations stay per debater,
+                since each one feeds an improvement the opponent answers before writing.
+            improve_prompt (str): Template of the improvement request, with {original_argument} and {feedback}.
         """
-        self.debater_a = debater_a
-        self.debater_b = debater_b
-        self.judge = judge
-        self.topic = topic
-        self.debate_history = [] # Stores dicts: {"round": int, "debater": str, "argument": str, "feedback": str, "improved_argument": str}
-        self.max_workers_round1 = max_workers_round1 # Typically 2 for two debaters
-        print(f"\n--- Starting Self-Improving Debate on Topic: {self.topic} ---")
-        print(f"Debater A: {self.debater_a.name} ({self.debater_a.stance})")
-        print(f"Debater B: {self.debater_b.name} ({self.debater_b.stance})")
-        print(f"Judge: {self.judge.name}")
-        print(f"Process: Generate argument → Receive feedback → Improve argument → Evaluate improvement → Proceed to next round")
+        self.full_reevaluation = full_reevaluation
+        self.improve_prompt = improve_prompt
+        super().__init__(debater_a, debater_b, judge, topic, max_workers_round1, warm_up, pipelined, engine, scheduler,
+                         pairwise_judging, distill_feedback, feedback_distiller, checkpoints, debate_id)
 
-    def _generate_argument_task(self, debater: DebaterAgent, opponent_argument: str = None, feedback: str = None) -> tuple[str, str]:
-        """Helper function to wrap argument generation for parallel execution."""
-        try:
-            argument = debater.generate_argument(self.topic, opponent_argument, feedback)
-            return debater.name, argument
-        except Exception as e:
-            print(f"Error generating argument for {debater.name}: {e}")
-            return debater.name, f"Error generating argument: {e}"
+    def _print_settings(self):
+        print(f"Process: Generate argument → Receive feedback → Improve argument → Evaluate improvement → Proceed to next round")
+        print(f"Pipelined Re-evaluation: {'Enabled' if self.pipelined else 'Disabled'}")
+        print(f"Pairwise Re-evaluation: {'Enabled' if self.pairwise_judging else 'Disabled'}")
 
-    def _improve_argument(self, debater: DebaterAgent, original_argument: str, feedback: str) -> str:
+    async def _improve_argument(self, debater: DebaterAgent, original_argument: str, feedback: str) -> str:
         """
         Ask the debater to improve their argument based on feedback.
         
@@ -53,187 +73,125 @@ class SelfImprovingDebateOrchestrator:
         Returns:
             str: The improved argument
         """
-        prompt = f"""
-You previously made the following argument:
-'''{original_argument}'''
-
-You received this feedback:
-'''{feedback}'''
-
-Please improve your argument based on the feedback. Focus on strengthening your reasoning, 
-addressing weaknesses identified in the feedback, and maintaining a clear structure.
-Your improved argument must still be 520 words or less.
-
-Provide only the improved argument.
-"""
+        prompt = self.improve_prompt.format(original_argument=original_argument, feedback=feedback)
         # Call the LLM to improve the argument
-        improved_argument = call_llm_api(prompt, debater.model_name, 
-                                       [{"role": "system", "content": debater.system_prompt}])
+        improved_argument = await run_scheduled(self.scheduler, call_llm_api_async, prompt, debater.model_name,
+                                                 [{"role": "system", "content": debater.system_prompt}])
         
         print(f"{debater.name} improved their argument based on feedback.")
         return improved_argument
 
-    def run_debate(self, num_rounds: int = 3):
+    async def _evaluate_task(self, debater: DebaterAgent, round_num: int, argument: str) -> tuple[str, dict]:
+        """Graph task: judges an original argument, returning (feedback_text, scores)."""
+        feedback_text, scores = await self.judge.aevaluate_argument(argument, debater.name, self.topic, round_num)
+        print(f"Feedback from {self.judge.name} for {debater.name}:\n{feedback_text}")
+        print(f"Scores for {debater.name}'s original argument: {scores}")
+        return feedback_text, scores
+
+    async def _improve_task(self, debater: DebaterAgent, argument: str, feedback: str) -> str:
+        """Graph task: asks the debater to improve their argument based on the judge's feedback."""
+        print(f"\n{debater.name} is improving their argument based on feedback...")
+        improved_argument = await self._improve_argument(debater, argument, feedback)
+        print(f"{debater.name}'s Improved Argument:\n{improved_argument}")
+        return improved_argument
+
+    async def _reevaluate_task(self, debater: DebaterAgent, round_num: int, improved_argument: str) -> dict:
+        """Graph task: judges an improved argument and returns its scores."""
+        print(f"\nEvaluating {debater.name}'s improved argument...")
+        if self.full_reevaluation:
+            improved_feedback, improved_scores = await self.judge.aevaluate_argument(
+                improved_argument, debater.name, self.topic, round_num
+            )
+        else:
+            improved_scores = await self.judge.aevaluate_scores(improved_argument, debater.name, self.topic, round_num)
+        print(f"Scores for {debater.name}'s improved argument: {improved_scores}")
+        return improved_scores
+
+    async def _reevaluate_pair_task(self, round_num: int, improved_a: str, improved_b: str) -> tuple[dict, dict]:
+        """Graph task: judges both improved arguments of a round together and returns A's and B's scores."""
+        print(f"\nEvaluating {self.debater_a.name}'s and {self.debater_b.name}'s improved arguments...")
+        if self.full_reevaluation:
+            (_, scores_a), (_, scores_b) = await self.judge.aevaluate_pair(
+                improved_a, self.debater_a.name, improved_b, self.debater_b.name, self.topic, round_num
+            )
+        else:
+            scores_a, scores_b = await self.judge.aevaluate_pair_scores(
+                improved_a, self.debater_a.name, improved_b, self.debater_b.name, self.topic, round_num
+            )
+        print(f"Scores for {self.debater_a.name}'s improved argument: {scores_a}")
+        print(f"Scores for {self.debater_b.name}'s improved argument: {scores_b}")
+        return scores_a, scores_b
+
+    def _record_cycle(self, round_num: int, debater: DebaterAgent, argument: str, evaluation: tuple[str, dict],
+                      improved_argument: str, improved_scores: dict):
+        """Graph task: records a full generate → feedback → improve → re-evaluate cycle in the history."""
+        feedback_text, scores = evaluation
+        self.debate_history.append({
+            "round": round_num,
+            "debater": debater.name,
+            "original_argument": argument,
+            "feedback": feedback_text,
+            "scores": scores,
+            "improved_argument": improved_argument,
+            "improved_scores": improved_scores
+        })
+
+    def build_graph(self, num_rounds: int = 3, declare_winner: bool = False) -> DebateGraph:
         """
-        Executes the debate for a specified number of rounds with self-improvement.
-        
+        Declares the self-improving debate as a task graph.
+
+        Per debater and round: generate → evaluate → improve → re-evaluate. The next
+        argument of the opponent depends only on the improved argument (and their own last
+        feedback), so re-evaluation is off the critical path, and the two round-1 cycles are
+        independent. Record tasks are chained to keep the history order. Without
+        `pipelined`, ordering edges reproduce the sequential schedule.
+
         Args:
             num_rounds (int): The number of rounds for the debate.
+            declare_winner (bool): Add a final task asking the judge for the winner.
+
+        Returns:
+            DebateGraph: The graph to run on the engine.
         """
-        argument_a = None
-        argument_b = None
-        improved_argument_a = None
-        improved_argument_b = None
-        feedback_a = None
-        feedback_b = None
+        graph = DebateGraph()
+        debaters = [("A", self.debater_a), ("B", self.debater_b)]
+        schedule = [] # step order of the sequential schedule
+        last_record = []
+
+        graph.add("generate_A_1", partial(self._opening_task, self.debater_a), kind="generate")
+        graph.add("generate_B_1", partial(self._opening_task, self.debater_b), kind="generate",
+                  after=[] if self.max_workers_round1 >= 2 else ["generate_A_1"])
+        schedule.append("generate_B_1")
 
         for i in range(1, num_rounds + 1):
-            print(f"\n--- Round {i} ---")
-
-            # --- Round 1: Parallel Argument Generation ---
-            if i == 1:
-                print("\nGenerating opening arguments in parallel...")
-                round1_args = {}
-                with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers_round1) as executor:
-                    # Submit tasks for both debaters
-                    future_a = executor.submit(self._generate_argument_task, self.debater_a)
-                    future_b = executor.submit(self._generate_argument_task, self.debater_b)
-
-                    # Collect results as they complete
-                    for future in concurrent.futures.as_completed([future_a, future_b]):
-                        debater_name, argument = future.result()
-                        round1_args[debater_name] = argument
-                        print(f"Opening argument generated for: {debater_name}")
-
-                argument_a = round1_args.get(self.debater_a.name, "Error: Failed to generate argument A")
-                argument_b = round1_args.get(self.debater_b.name, "Error: Failed to generate argument B")
-
-                # --- Debater A Cycle: Generate → Feedback → Improve → Evaluate Improvement ---
-                print(f"\n{self.debater_a.name}'s Opening Argument:\n{argument_a}")
-                feedback_a_text, scores_a = self.judge.evaluate_argument(argument_a, self.debater_a.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_a.name}:\n{feedback_a_text}")
-                print(f"Scores for {self.debater_a.name}'s original argument: {scores_a}")
-                
-                print(f"\n{self.debater_a.name} is improving their argument based on feedback...")
-                improved_argument_a = self._improve_argument(self.debater_a, argument_a, feedback_a_text)
-                print(f"{self.debater_a.name}'s Improved Argument:\n{improved_argument_a}")
-                
-                # Evaluate the improved argument
-                print(f"\nEvaluating {self.debater_a.name}'s improved argument...")
-                improved_feedback_a, improved_scores_a = self.judge.evaluate_argument(
-                    improved_argument_a, self.debater_a.name, self.topic, i
-                )
-                print(f"Scores for {self.debater_a.name}'s improved argument: {improved_scores_a}")
-                
-                # Record the cycle in history with improved scores
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_a.name,
-                    "original_argument": argument_a,
-                    "feedback": feedback_a_text,
-                    "scores": scores_a,
-                    "improved_argument": improved_argument_a,
-                    "improved_scores": improved_scores_a
-                })
-                feedback_a = feedback_a_text
-                
-                # --- Debater B Cycle: Generate → Feedback → Improve → Evaluate Improvement ---
-                print(f"\n{self.debater_b.name}'s Opening Argument:\n{argument_b}")
-                feedback_b_text, scores_b = self.judge.evaluate_argument(argument_b, self.debater_b.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_b.name}:\n{feedback_b_text}")
-                print(f"Scores for {self.debater_b.name}'s original argument: {scores_b}")
-                
-                print(f"\n{self.debater_b.name} is improving their argument based on feedback...")
-                improved_argument_b = self._improve_argument(self.debater_b, argument_b, feedback_b_text)
-                print(f"{self.debater_b.name}'s Improved Argument:\n{improved_argument_b}")
-                
-                # Evaluate the improved argument
-                print(f"\nEvaluating {self.debater_b.name}'s improved argument...")
-                improved_feedback_b, improved_scores_b = self.judge.evaluate_argument(
-                    improved_argument_b, self.debater_b.name, self.topic, i
-                )
-                print(f"Scores for {self.debater_b.name}'s improved argument: {improved_scores_b}")
-                
-                # Record the cycle in history with improved scores
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_b.name,
-                    "original_argument": argument_b,
-                    "feedback": feedback_b_text,
-                    "scores": scores_b,
-                    "improved_argument": improved_argument_b,
-                    "improved_scores": improved_scores_b
-                })
-                feedback_b = feedback_b_text
-
-            # --- Rounds 2+: Sequential Argument Generation with Improvement ---
-            else:
-                # Debater A's turn - using B's previous improved argument as context
-                print(f"\n{self.debater_a.name}'s Turn:")
-                argument_a = self.debater_a.generate_argument(self.topic, improved_argument_b, feedback_a)
-                print(f"Argument: {argument_a}")
-                
-                feedback_a_text, scores_a = self.judge.evaluate_argument(argument_a, self.debater_a.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_a.name}:\n{feedback_a_text}")
-                print(f"Scores for {self.debater_a.name}'s original argument: {scores_a}")
-                
-                print(f"\n{self.debater_a.name} is improving their argument based on feedback...")
-                improved_argument_a = self._improve_argument(self.debater_a, argument_a, feedback_a_text)
-                print(f"{self.debater_a.name}'s Improved Argument:\n{improved_argument_a}")
-                
-                # Evaluate the improved argument
-                print(f"\nEvaluating {self.debater_a.name}'s improved argument...")
-                improved_feedback_a, improved_scores_a = self.judge.evaluate_argument(
-                    improved_argument_a, self.debater_a.name, self.topic, i
-                )
-                print(f"Scores for {self.debater_a.name}'s improved argument: {improved_scores_a}")
-                
-                # Record the cycle in history with improved scores
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_a.name,
-                    "original_argument": argument_a,
-                    "feedback": feedback_a_text,
-                    "scores": scores_a,
-                    "improved_argument": improved_argument_a,
-                    "improved_scores": improved_scores_a
-                })
-                feedback_a = feedback_a_text
-
-                # Debater B's turn - using A's current improved argument as context
-                print(f"\n{self.debater_b.name}'s Turn:")
-                argument_b = self.debater_b.generate_argument(self.topic, improved_argument_a, feedback_b)
-                print(f"Argument: {argument_b}")
-                
-                feedback_b_text, scores_b = self.judge.evaluate_argument(argument_b, self.debater_b.name, self.topic, i)
-                print(f"Feedback from {self.judge.name} for {self.debater_b.name}:\n{feedback_b_text}")
-                print(f"Scores for {self.debater_b.name}'s original argument: {scores_b}")
-                
-                print(f"\n{self.debater_b.name} is improving their argument based on feedback...")
-                improved_argument_b = self._improve_argument(self.debater_b, argument_b, feedback_b_text)
-                print(f"{self.debater_b.name}'s Improved Argument:\n{improved_argument_b}")
-                
-                # Evaluate the improved argument
-                print(f"\nEvaluating {self.debater_b.name}'s improved argument...")
-                improved_feedback_b, improved_scores_b = self.judge.evaluate_argument(
-                    improved_argument_b, self.debater_b.name, self.topic, i
-                )
-                print(f"Scores for {self.debater_b.name}'s improved argument: {improved_scores_b}")
-                
-                # Record the cycle in history with improved scores
-                self.debate_history.append({
-                    "round": i,
-                    "debater": self.debater_b.name,
-                    "original_argument": argument_b,
-                    "feedback": feedback_b_text,
-                    "scores": scores_b,
-                    "improved_argument": improved_argument_b,
-                    "improved_scores": improved_scores_b
-                })
-                feedback_b = feedback_b_text
-
-        # --- End of Debate ---
-        print(f"\n--- Self-Improving Debate Concluded after {num_rounds} Rounds ---")
-        
-        # Return debate history for analysis
-        return self.debate_history
+            for index, (tag, debater) in enumerate(debaters):
+                generate, evaluate, distill, improve, reevaluate = (f"{step}_{tag}_{i}" for step in ("generate", "evaluate", "distill", "improve", "reevaluate"))
+                if i > 1:
+                    # A answers B's previous improved argument; B answers A's improved argument from this round
+                    opponent_improved = f"improve_B_{i - 1}" if tag == "A" else f"improve_A_{i}"
+                    graph.add(generate, partial(self._turn_task, debater),
+                              inputs=[opponent_improved, f"distill_{tag}_{i - 1}"], kind="generate")
+                    schedule.append(generate)
+                graph.add(evaluate, partial(self._evaluate_task, debater, i), inputs=[generate], kind="evaluate")
+                graph.add(distill, partial(self._distill_task, debater), inputs=[evaluate], kind="distill")
+                graph.add(improve, partial(self._improve_task, debater), inputs=[generate, distill], kind="improve")
+                if self.pairwise_judging:
+                    graph.add(reevaluate, itemgetter(index), inputs=[f"reevaluate_pair_{i}"])
+                    schedule += [evaluate, distill, improve]
+                else:
+                    graph.add(reevaluate, partial(self._reevaluate_task, debater, i), inputs=[improve], kind="evaluate")
+                    schedule += [evaluate, distill, improve, reevaluate]
+                graph.add(f"record_{tag}_{i}", partial(self._record_cycle, i, debater),
+                          inputs=[generate, evaluate, improve, reevaluate], after=last_record)
+                last_record = [f"record_{tag}_{i}"]
+            if self.pairwise_judging:
+                graph.add(f"reevaluate_pair_{i}", partial(self._reevaluate_pair_task, i),
+                          inputs=[f"improve_A_{i}", f"improve_B_{i}"], kind="evaluate")
+                schedule.append(f"reevaluate_pair_{i}")
+
+        if declare_winner:
+            graph.add("declare_winner", lambda: self.judge.adeclare_winner(self.debate_history, self.topic),
+                      after=last_record, kind="declare_winner")
+        if not self.pipelined:
+            graph.chain(schedule)
+        return graph
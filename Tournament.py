@@ -0,0 +1,344 @@
+import math
+import asyncio
+import itertools
+from typing import Any, Callable, Dict, List, Tuple, Union
+from DebaterAgent import DebaterAgent
+from JudgeAgent import JudgeAgent
+from DebateEngine import DebateEngine
+from DebateOrchestrator import DebateOrchestrator
+from llm_helper import run_sync
+
+ELO_SCALE = 400.0
+FORMATS = ("round_robin", "swiss")
+
+
+class DebaterSpec:
+    """A debater configuration entered into a tournament; a fresh `DebaterAgent` is built for every match."""
+
+    def __init__(self, name: str, model_name: str, system_prompt: str, **agent_kwargs):
+        """
+        Initializes the spec.
+
+        Args:
+            name (str): Unique contestant name (also the debater's name in every match).
+            model_name (str): LLM model the debater uses.
+            system_prompt (str): The debater's persona.
+            **agent_kwargs: Other `DebaterAgent` options (context_budget, word_cap, ...).
+        """
+        self.name = name
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.agent_kwargs = agent_kwargs
+
+    def build(self, stance: str) -> DebaterAgent:
+        return DebaterAgent(self.name, self.model_name, stance, self.system_prompt, **self.agent_kwargs)
+
+
+def _topic_stances(topic: Union[str, Tuple[str, str, str]]) -> Tuple[str, str, str]:
+    if isinstance(topic, str):
+        return topic, f"In favour of: {topic}", f"Against: {topic}"
+    return tuple(topic)
+
+
+def match_score(history: List[Dict[str, Any]], debater_name: str) -> float:
+    """A debater's total score over a debate: the sum of every round's scores (improved scores when there are any)."""
+    return sum(sum((turn.get("improved_scores") or turn.get("scores") or {}).values())
+               for turn in history if turn["debater"] == debater_name)
+
+
+def bradley_terry(matches: List[Dict[str, Any]], names: List[str], iterations: int = 200, prior: float = 0.5) -> Dict[str, float]:
+    """
+    Fits Bradley–Terry strengths to the results (draws count half a win each) with the MM algorithm.
+
+    Args:
+        matches (List[Dict[str, Any]]): Finished matches with 'a', 'b' and 'result' (1, 0.5 or 0 from a's side).
+        names (List[str]): Every contestant.
+        iterations (int): MM iterations.
+        prior (float): Virtual half-win each contestant gets against every other, so unbeaten or winless
+            contestants keep a finite strength.
+
+    Returns:
+        Dict[str, float]: Strengths on the Elo scale, centred on 0 (a 400-point gap means 10:1 odds).
+    """
+    wins = {(i, j): prior for i in names for j in names if i != j}
+    for match in matches:
+        wins[(match["a"], match["b"])] += match["result"]
+        wins[(match["b"], match["a"])] += 1 - match["result"]
+    strength = {name: 1.0 for name in names}
+    for _ in range(iterations):
+        updated = {}
+        for i in names:
+            total_wins = sum(wins[(i, j)] for j in names if j != i)
+            denominator = sum((wins[(i, j)] + wins[(j, i)]) / (strength[i] + strength[j]) for j in names if j != i)
+            updated[i] = total_wins / denominator if denominator else strength[i]
+        mean_log = sum(math.log(value) for value in updated.values()) / len(updated)
+        strength = {name: value / math.exp(mean_log) for name, value in updated.items()}
+    return {name: round(ELO_SCALE * math.log10(value), 1) for name, value in strength.items()}
+
+
+def _invert(matrix: List[List[float]]) -> List[List[float]]:
+    """Gauss-Jordan inverse of a small non-singular matrix."""
+    n = len(matrix)
+    rows = [list(row) + [1.0 if i == j else 0.0 for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        scale = rows[col][col]
+        if abs(scale) < 1e-9:
+            raise ZeroDivisionError("singular matrix")
+        rows[col] = [value / scale for value in rows[col]]
+        for r in range(n):
+            if r != col and rows[r][col]:
+                factor = rows[r][col]
+                rows[r] = [value - factor * pivot_value for value, pivot_value in zip(rows[r], rows[col])]
+    return [row[n:] for row in rows]
+
+
+def margin_ratings(matches: List[Dict[str, Any]], names: List[str], noise_floor: float = 1.0) -> Tuple[Dict[str, float], List[List[float]], Dict[str, int]]:
+    """
+    Least-squares performance ratings from score margins (a Massey rating).
+
+    Models every match as score_a - score_b = q_a - q_b + noise and fits q (summing to 0).
+    Margins carry far more information per match than win/loss, which is what lets the
+    tournament tell contestants apart after a few matches.
+
+    Args:
+        matches (List[Dict[str, Any]]): Finished matches with 'a', 'b', 'score_a', 'score_b'.
+        names (List[str]): Every contestant.
+        noise_floor (float): Lower bound on the residual standard deviation, so a few perfectly
+            consistent matches don't look infinitely certain.
+
+    Returns:
+        Tuple: (ratings by name, covariance matrix of the ratings in `names` order, or None when there are
+        too few matches to estimate the noise, index by name).
+    """
+    index = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    normal = [[1.0] * n for _ in range(n)] # X'X plus the all-ones matrix, which pins the mean to 0
+    rhs = [0.0] * n
+    for match in matches:
+        a, b, margin = index[match["a"]], index[match["b"]], match["score_a"] - match["score_b"]
+        normal[a][a] += 1
+        normal[b][b] += 1
+        normal[a][b] -= 1
+        normal[b][a] -= 1
+        rhs[a] += margin
+        rhs[b] -= margin
+    try:
+        inverse = _invert(normal)
+    except ZeroDivisionError: # contestants not yet connected by any chain of matches
+        return {name: 0.0 for name in names}, None, index
+    q = [sum(inverse[i][j] * rhs[j] for j in range(n)) for i in range(n)]
+    ratings = {name: q[index[name]] for name in names}
+    dof = len(matches) - (n - 1)
+    if dof <= 0:
+        return ratings, None, index
+    residuals = sum((m["score_a"] - m["score_b"] - (q[index[m["a"]]] - q[index[m["b"]]])) ** 2 for m in matches)
+    variance = max(residuals / dof, noise_floor * noise_floor)
+    return ratings, [[variance * value for value in row] for row in inverse], index
+
+
+class Tournament:
+    """
+    Runs many debaters against each other across topics and ranks them.
+
+    Pairings are scheduled round-robin (every pair on every topic, sides alternating) or Swiss
+    (each round pairs contestants with similar ratings who have met least often), and matches run
+    concurrently, at most `max_concurrent_matches` at a time; an `engine` shared by all matches
+    additionally caps the concurrent LLM steps. Elo ratings are updated as each match's scores
+    land. Separation is judged on score margins (`margin_ratings`), which pin a contestant down
+    in far fewer matches than win/loss outcomes: with `early_stop`, a pairing is skipped once the
+    two performance ratings differ by more than `confidence_z` standard errors, and the tournament
+    ends once every neighbouring pair in that ranking is separated.
+    """
+
+    def __init__(self, contestants: List[DebaterSpec], topics: List[Union[str, Tuple[str, str, str]]],
+                 judge_factory: Callable[[], JudgeAgent], orchestrator_cls: type = DebateOrchestrator,
+                 orchestrator_kwargs: Dict[str, Any] = None, num_rounds: int = 3, format: str = "round_robin",
+                 swiss_rounds: int = None, max_concurrent_matches: int = 4, engine: DebateEngine = None,
+                 k_factor: float = 32.0, initial_rating: float = 1500.0, draw_margin: float = 0.0,
+                 early_stop: bool = True, confidence_z: float = 1.96, min_matches: int = 2, noise_floor: float = 1.0):
+        """
+        Initializes the tournament.
+
+        Args:
+            contestants (List[DebaterSpec]): The debaters; names must be unique.
+            topics (List[str | tuple]): Topics as strings, or (topic, stance for, stance against) tuples.
+            judge_factory (Callable): Returns the judge for a match (a fresh one, or a shared one).
+            orchestrator_cls (type): DebateOrchestrator or SelfImprovingDebateOrchestrator.
+            orchestrator_kwargs (Dict[str, Any], optional): Extra orchestrator options (pipelined, scheduler, ...).
+            num_rounds (int): Rounds per debate.
+            format (str): 'round_robin' or 'swiss'.
+            swiss_rounds (int, optional): Swiss rounds; defaults to ceil(log2(contestants)) + 2.
+            max_concurrent_matches (int): Matches running at once.
+            engine (DebateEngine, optional): Engine shared by every match; defaults to one without a step limit.
+            k_factor (float): Elo K-factor.
+            initial_rating (float): Starting Elo rating.
+            draw_margin (float): Total-score difference at or below which a match is a draw.
+            early_stop (bool): Skip pairings, and stop, once the ranking is statistically separated.
+            confidence_z (float): Standard errors two ratings must be apart to count as separated.
+            min_matches (int): Matches each contestant plays before its pairings can be skipped.
+            noise_floor (float): Minimum per-match score-margin noise assumed by the separation test.
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unknown tournament format: {format}")
+        if len({spec.name for spec in contestants}) != len(contestants):
+            raise ValueError("Contestant names must be unique")
+        self.contestants = {spec.name: spec for spec in contestants}
+        self.topics = [_topic_stances(topic) for topic in topics]
+        self.judge_factory = judge_factory
+        self.orchestrator_cls = orchestrator_cls
+        self.orchestrator_kwargs = orchestrator_kwargs or {}
+        self.num_rounds = num_rounds
+        self.format = format
+        self.swiss_rounds = swiss_rounds or math.ceil(math.log2(max(2, len(contestants)))) + 2
+        self.max_concurrent_matches = max_concurrent_matches
+        self.engine = engine or DebateEngine()
+        self.k_factor = k_factor
+        self.draw_margin = draw_margin
+        self.early_stop = early_stop
+        self.confidence_z = confidence_z
+        self.min_matches = min_matches
+        self.noise_floor = noise_floor
+        self.ratings = {name: initial_rating for name in self.contestants}
+        self.matches: List[Dict[str, Any]] = [] # finished matches, in the order their scores landed
+        self.stats = {"played": 0, "failed": 0, "skipped": 0}
+        self._opponents: Dict[str, List[str]] = {name: [] for name in self.contestants}
+        self._fit = None # margin_ratings() of the finished matches, refitted lazily after each one
+
+    # --- Ratings ---
+    def _expected(self, a: str, b: str) -> float:
+        return 1 / (1 + 10 ** ((self.ratings[b] - self.ratings[a]) / ELO_SCALE))
+
+    def performance(self) -> Tuple[Dict[str, float], List[List[float]], Dict[str, int]]:
+        """The `margin_ratings` fit of the matches so far."""
+        if self._fit is None:
+            self._fit = margin_ratings(self.matches, list(self.contestants), self.noise_floor)
+        return self._fit
+
+    def difference_error(self, a: str, b: str) -> float:
+        """Standard error of the difference between two performance ratings (inf while it can't be estimated)."""
+        _, covariance, index = self.performance()
+        if covariance is None:
+            return float("inf")
+        i, j = index[a], index[b]
+        return math.sqrt(max(0.0, covariance[i][i] + covariance[j][j] - 2 * covariance[i][j]))
+
+    def separated(self, a: str, b: str) -> bool:
+        """Whether two contestants' performance ratings differ by more than `confidence_z` standard errors."""
+        if min(len(self._opponents[a]), len(self._opponents[b])) < self.min_matches:
+            return False
+        ratings = self.performance()[0]
+        return abs(ratings[a] - ratings[b]) > self.confidence_z * self.difference_error(a, b)
+
+    def ranking_settled(self) -> bool:
+        """Whether every pair of neighbours in the performance ranking is separated."""
+        ratings = self.performance()[0]
+        ranked = sorted(ratings, key=ratings.get, reverse=True)
+        return all(self.separated(a, b) for a, b in zip(ranked, ranked[1:]))
+
+    def _record(self, match: Dict[str, Any]):
+        # Runs without awaiting, so concurrent matches update ratings one at a time
+        a, b, result = match["a"], match["b"], match["result"]
+        expected = self._expected(a, b)
+        match["elo_before"] = (round(self.ratings[a], 1), round(self.ratings[b], 1))
+        self.ratings[a] += self.k_factor * (result - expected)
+        self.ratings[b] -= self.k_factor * (result - expected)
+        self._opponents[a].append(b)
+        self._opponents[b].append(a)
+        self.matches.append(match)
+        self._fit = None
+        self.stats["played"] += 1
+        winner = a if result == 1 else b if result == 0 else "draw"
+        print(f"[TOURNAMENT] {a} vs {b} on '{match['topic']}': {match['score_a']:g}-{match['score_b']:g} -> {winner} "
+              f"(Elo {self.ratings[a]:.0f} / {self.ratings[b]:.0f})")
+
+    # --- Matches ---
+    async def _play(self, a: str, b: str, topic_index: int, a_for: bool) -> Dict[str, Any]:
+        topic, stance_for, stance_against = self.topics[topic_index]
+        debater_a = self.contestants[a].build(stance_for if a_for else stance_against)
+        debater_b = self.contestants[b].build(stance_against if a_for else stance_for)
+        orchestrator = self.orchestrator_cls(debater_a, debater_b, self.judge_factory(), topic, engine=self.engine,
+                                             **self.orchestrator_kwargs)
+        history = await orchestrator.arun_debate(self.num_rounds)
+        score_a, score_b = match_score(history, a), match_score(history, b)
+        margin = score_a - score_b
+        result = 0.5 if abs(margin) <= self.draw_margin else (1.0 if margin > 0 else 0.0)
+        return {"a": a, "b": b, "topic": topic, "a_for": a_for, "score_a": score_a, "score_b": score_b,
+                "result": result, "history": history}
+
+    async def _match(self, semaphore: asyncio.Semaphore, a: str, b: str, topic_index: int, a_for: bool):
+        async with semaphore:
+            # Checked once a slot is free: the ratings may have settled while this match was queued
+            if self.early_stop and (self.separated(a, b) or self.ranking_settled()):
+                self.stats["skipped"] += 1
+                return
+            try:
+                match = await self._play(a, b, topic_index, a_for)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"[TOURNAMENT] {a} vs {b} failed: {e}")
+                return
+            self._record(match)
+
+    def _round_robin_schedule(self) -> List[Tuple[str, str, int, bool]]:
+        # Topic by topic, so every contestant plays early; sides alternate between pairs and topics
+        pairs = list(itertools.combinations(self.contestants, 2))
+        return [(a, b, topic_index, (pair_index + topic_index) % 2 == 0)
+                for topic_index in range(len(self.topics)) for pair_index, (a, b) in enumerate(pairs)]
+
+    def _swiss_pairings(self) -> List[Tuple[str, str]]:
+        # Highest-rated unpaired contestant meets the closest-rated one it has met least often; odd one out sits out
+        unpaired = sorted(self.ratings, key=self.ratings.get, reverse=True)
+        pairs = []
+        while len(unpaired) > 1:
+            a = unpaired.pop(0)
+            b = min(unpaired, key=lambda name: (self._opponents[a].count(name), abs(self.ratings[a] - self.ratings[name])))
+            unpaired.remove(b)
+            pairs.append((a, b))
+        return pairs
+
+    async def arun(self) -> List[Dict[str, Any]]:
+        """
+        Plays the tournament.
+
+        Returns:
+            List[Dict[str, Any]]: The final standings (see `standings`).
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_matches)
+        if self.format == "round_robin":
+            await asyncio.gather(*[self._match(semaphore, *match) for match in self._round_robin_schedule()])
+        else:
+            for swiss_round in range(self.swiss_rounds):
+                if self.early_stop and self.ranking_settled():
+                    print(f"[TOURNAMENT] Ranking settled after {swiss_round} Swiss rounds.")
+                    break
+                topic_index = swiss_round % len(self.topics)
+                await asyncio.gather(*[self._match(semaphore, a, b, topic_index, (swiss_round + i) % 2 == 0)
+                                       for i, (a, b) in enumerate(self._swiss_pairings())])
+        print(f"[TOURNAMENT] {self.stats['played']} matches played, {self.stats['skipped']} skipped, {self.stats['failed']} failed.")
+        return self.standings()
+
+    def run(self) -> List[Dict[str, Any]]:
+        """Plays the tournament. Blocking wrapper around `arun`."""
+        return run_sync(self.arun())
+
+    def standings(self) -> List[Dict[str, Any]]:
+        """Contestants by performance rating (the ranking early stopping tests), with Elo, record and Bradley–Terry strength."""
+        strengths = bradley_terry(self.matches, list(self.contestants))
+        performance, covariance, index = self.performance()
+        table = []
+        for name in sorted(performance, key=performance.get, reverse=True):
+            results = [m["result"] if m["a"] == name else 1 - m["result"] for m in self.matches if name in (m["a"], m["b"])]
+            table.append({
+                "name": name,
+                "rating": round(self.ratings[name], 1),
+                "performance": round(performance[name], 2),
+                "performance_error": round(math.sqrt(covariance[index[name]][index[name]]), 2) if covariance else None,
+                "bradley_terry": strengths[name],
+                "played": len(results),
+                "wins": results.count(1.0),
+                "draws": results.count(0.5),
+                "losses": results.count(0.0),
+            })
+        return table
@@ -0,0 +1,201 @@
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import contextlib
+from datetime import datetime
+from typing import Any, Dict, List
+import llm_helper
+from llm_prompt_cache import usage_tracker
+from llm_tracing import tracer
+from DebaterAgent import DebaterAgent
+from JudgeAgent import JudgeAgent
+from DebateEngine import DebateEngine
+from debate_config import ORCHESTRATORS, JUDGE_MODES, SCHEDULES
+
+# Offline benchmark of the debate pipeline on the deterministic fake model (llm_fake).
+# Each scenario runs a batch of concurrent debates and reports throughput, per-phase
+# latency and LLM call counts; results are appended to a JSON-lines file and compared
+# with the previous run of the same configuration, so regressions show up.
+
+DEFAULT_RESULTS_PATH = "benchmark_results.jsonl"
+TOPIC = "Should cities ban private cars from their centres?"
+
+
+def _build_debate(orchestrator: str, judge_mode: str, schedule: str, index: int, engine: DebateEngine):
+    settings = dict(JUDGE_MODES[judge_mode])
+    pairwise = settings.pop("pairwise_judging", False)
+    debater_a = DebaterAgent(f"Advocate {index}", "fake-debater", "Cities should ban private cars from their centres.",
+                             "You argue for car-free city centres.")
+    debater_b = DebaterAgent(f"Sceptic {index}", "fake-debater", "Cities should not ban private cars from their centres.",
+                             "You argue against banning cars from city centres.")
+    judge = JudgeAgent(f"Judge {index}", "fake-judge", **settings)
+    return ORCHESTRATORS[orchestrator](debater_a, debater_b, judge, TOPIC, pipelined=schedule == "pipelined",
+                                       engine=engine, pairwise_judging=pairwise)
+
+
+def run_scenario(orchestrator: str, judge_mode: str, schedule: str, debates: int, rounds: int, time_scale: float,
+                 trace_dir: str = None) -> Dict[str, Any]:
+    """
+    Runs `debates` concurrent debates of one scenario on the fake backend.
+
+    Args:
+        trace_dir (str, optional): Also trace the scenario, write its spans there (JSON lines and Chrome trace)
+            and add the mean critical-path split to the metrics.
+
+    Returns:
+        Dict[str, Any]: Throughput, per-phase latency (simulated seconds), call and token counts.
+    """
+    provider = llm_helper.get_registered_provider("fake")
+    provider.reset_stats()
+    usage_tracker.reset()
+    llm_helper.configure_tracing(enabled=trace_dir is not None)
+    engine = DebateEngine()
+    with contextlib.redirect_stdout(io.StringIO()): # the agents log every step
+        orchestrators = [_build_debate(orchestrator, judge_mode, schedule, i, engine) for i in range(debates)]
+
+        async def run_all():
+            return await asyncio.gather(*[o.arun_debate(rounds) for o in orchestrators])
+
+        started = time.monotonic()
+        llm_helper.run_sync(run_all())
+        elapsed = (time.monotonic() - started) / time_scale
+
+    fake_stats = provider.stats()
+    usage = usage_tracker.stats()
+    metrics = {
+        "debates_per_minute": round(debates * 60 / elapsed, 3),
+        "seconds_per_debate": round(elapsed / debates, 3),
+        "phase_latency": {kind: {"count": entry["count"], "mean": round(entry["mean"] / time_scale, 3), "max": round(entry["max"] / time_scale, 3)}
+                          for kind, entry in sorted(engine.phase_stats().items())},
+        "llm_calls": fake_stats["calls"],
+        "calls_by_kind": fake_stats["kinds"],
+        "injected_errors": fake_stats["rate_limited"] + fake_stats["failed"],
+        "calls_by_model": {model: totals["calls"] for model, totals in usage["models"].items()},
+        "prompt_tokens": usage["total"]["prompt_tokens"],
+        "cached_tokens": usage["total"]["cached_tokens"],
+        "completion_tokens": usage["total"]["completion_tokens"],
+        "parse_stats": _merge_counts([o.judge.score_stats for o in orchestrators]),
+    }
+    if trace_dir is not None:
+        tracer.enable(False)
+        name = f"{orchestrator}_{judge_mode}_{schedule}"
+        tracer.export_jsonl(os.path.join(trace_dir, f"{name}.spans.jsonl"))
+        tracer.export_chrome_trace(os.path.join(trace_dir, f"{name}.trace.json"))
+        reports = tracer.report()
+        metrics["critical_path"] = {key: round(sum(r["critical_path_seconds"][key] for r in reports) / len(reports) / time_scale, 3)
+                                    for key in reports[0]["critical_path_seconds"]}
+        metrics["mean_llm_concurrency"] = round(sum(r["mean_concurrency"] for r in reports) / len(reports), 2)
+    return metrics
+
+
+def _merge_counts(counters: List[Dict[str, int]]) -> Dict[str, int]:
+    merged = {}
+    for counter in counters:
+        for key, value in counter.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return ""
+
+
+def load_previous(path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the most recent stored run with the same configuration, or None."""
+    previous = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("config") == config:
+                        previous = record
+    except FileNotFoundError:
+        pass
+    return previous
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any], threshold: float) -> List[str]:
+    """Lists scenarios whose throughput dropped by more than `threshold` or whose call/token counts grew."""
+    regressions = []
+    for name, metrics in current["scenarios"].items():
+        before = previous["scenarios"].get(name) if previous else None
+        if not before:
+            continue
+        if metrics["debates_per_minute"] < before["debates_per_minute"] * (1 - threshold):
+            regressions.append(f"{name}: debates/minute {before['debates_per_minute']} -> {metrics['debates_per_minute']}")
+        for key in ("llm_calls", "prompt_tokens", "completion_tokens"):
+            if metrics[key] > before[key]:
+                regressions.append(f"{name}: {key} {before[key]} -> {metrics[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the debate orchestrators and judge modes on the fake LLM backend.")
+    parser.add_argument("--orchestrators", nargs="+", choices=list(ORCHESTRATORS), default=list(ORCHESTRATORS))
+    parser.add_argument("--judge-modes", nargs="+", choices=list(JUDGE_MODES), default=list(JUDGE_MODES))
+    parser.add_argument("--schedules", nargs="+", choices=SCHEDULES, default=list(SCHEDULES))
+    parser.add_argument("--debates", type=int, default=4, help="Concurrent debates per scenario.")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="Real seconds per simulated second.")
+    parser.add_argument("--latency-distribution", default="lognormal", choices=["constant", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--base-latency", type=float, default=0.5, help="Mean simulated seconds per call, before token costs.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Injected 503 rate per attempt.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Injected 429 rate per attempt.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results", default=DEFAULT_RESULTS_PATH, help="JSON-lines file the run is appended to.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative throughput drop reported as a regression.")
+    parser.add_argument("--no-save", action="store_true", help="Compare with stored results but don't append this run.")
+    parser.add_argument("--trace", metavar="DIR", help="Trace every scenario and write its spans and Chrome trace to DIR.")
+    args = parser.parse_args()
+    if args.trace:
+        os.makedirs(args.trace, exist_ok=True)
+
+    config = {key: getattr(args, key) for key in ("debates", "rounds", "time_scale", "latency_distribution", "base_latency",
+                                                 "error_rate", "rate_limit_rate", "seed")}
+    llm_helper.configure_cache(enabled=False)
+    llm_helper.set_rate_limiting(False)
+    llm_helper.configure_retry(max_attempts=6, base_delay=0.05, max_delay=0.5)
+    llm_helper.configure_local_backend(time_scale=args.time_scale, latency_distribution=args.latency_distribution,
+                                       base_latency=args.base_latency, error_rate=args.error_rate,
+                                       rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+
+    record = {"timestamp": datetime.now().isoformat(), "git_commit": _git_commit(), "config": config, "scenarios": {}}
+    print(f"{'scenario':<42} {'debates/min':>11} {'s/debate':>9} {'calls':>6} {'generate':>9} {'evaluate':>9}")
+    for orchestrator in args.orchestrators:
+        for judge_mode in args.judge_modes:
+            for schedule in args.schedules:
+                name = f"{orchestrator}/{judge_mode}/{schedule}"
+                metrics = run_scenario(orchestrator, judge_mode, schedule, args.debates, args.rounds, args.time_scale, args.trace)
+                record["scenarios"][name] = metrics
+                phases = metrics["phase_latency"]
+                print(f"{name:<42} {metrics['debates_per_minute']:>11.2f} {metrics['seconds_per_debate']:>9.1f} {metrics['llm_calls']:>6} "
+                      f"{phases.get('generate', {}).get('mean', 0):>8.2f}s {phases.get('evaluate', {}).get('mean', 0):>8.2f}s")
+                if "critical_path" in metrics:
+                    path = metrics["critical_path"]
+                    print(f"{'':<4}critical path: generation {path['generation']:.1f}s, judging {path['judging']:.1f}s, "
+                          f"other {path['other']:.1f}s, waiting {path['waiting']:.1f}s; {metrics['mean_llm_concurrency']} LLM calls in flight")
+
+    previous = load_previous(args.results, config)
+    if previous is None:
+        print("\nNo stored run with this configuration to compare against.")
+    else:
+        regressions = compare(record, previous, args.threshold)
+        print(f"\nCompared with run {previous.get('git_commit') or '?'} from {previous['timestamp']}:")
+        print("\n".join(f"  REGRESSION {line}" for line in regressions) if regressions else "  no regressions")
+    if not args.no_save:
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
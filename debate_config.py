@@ -0,0 +1,18 @@
+from DebateOrchestrator import DebateOrchestrator
+from SelfImprovingDebateOrchestrator import SelfImprovingDebateOrchestrator
+
+# Named debate setups shared by the sweep CLI (socraitic) and the offline benchmark.
+
+ORCHESTRATORS = {
+    "debate": DebateOrchestrator,
+    "self_improving": SelfImprovingDebateOrchestrator,
+}
+# Judge modes: JudgeAgent settings plus the orchestrator's pairwise_judging flag
+JUDGE_MODES = {
+    "layered": {"use_strategic_layers": True},
+    "comprehensive": {"use_strategic_layers": False},
+    "structured": {"use_strategic_layers": False, "structured_output": True},
+    "pairwise": {"use_strategic_layers": True, "pairwise_judging": True},
+}
+# Orchestrator scheduling: 'pipelined' sets pipelined=True
+SCHEDULES = ("sequential", "pipelined")
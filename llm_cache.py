@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalizes line endings and surrounding/trailing whitespace so cosmetic differences share a cache entry."""
+    if not text:
+        return ""
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def make_cache_key(model_name: str, prompt: str, context: List[Dict[str, str]] = None, params: Dict[str, Any] = None) -> str:
+    """
+    Builds a content-addressed key for an LLM request.
+
+    Args:
+        model_name (str): The model the request is sent to.
+        prompt (str): The prompt text (normalized before hashing).
+        context (List[Dict[str, str]], optional): Conversation history sent with the prompt.
+        params (Dict[str, Any], optional): Sampling parameters (temperature, max_tokens, ...). None values are ignored.
+
+    Returns:
+        str: A SHA-256 hex digest identifying the request.
+    """
+    payload = {
+        "model": model_name,
+        "prompt": normalize_prompt(prompt),
+        "context": [[msg.get("role", "user"), normalize_prompt(msg.get("content", ""))] for msg in (context or [])],
+        "params": {k: v for k, v in sorted((params or {}).items()) if v is not None},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier LLM response cache: an in-memory LRU in front of an on-disk SQLite store.
+
+    Entries are keyed by `make_cache_key`. The disk tier is evicted least-recently-used
+    once it exceeds `max_disk_entries` or `max_disk_bytes`, and entries older than
+    `ttl_seconds` are treated as misses and removed. Safe to share across threads.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite", max_memory_entries: int = 1024, max_disk_entries: int = 100_000,
+                 max_disk_bytes: int = None, ttl_seconds: float = None):
+        """
+        Initializes the cache.
+
+        Args:
+            path (str): SQLite file for the disk tier, or None for a memory-only cache.
+            max_memory_entries (int): Capacity of the in-memory LRU tier.
+            max_disk_entries (int): Max rows kept on disk before LRU eviction.
+            max_disk_bytes (int, optional): Max total response bytes kept on disk before LRU eviction.
+            ttl_seconds (float, optional): Entries older than this are expired. None keeps entries forever.
+        """
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple[str, float]]" = OrderedDict() # key -> (response, created_at)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+        self._conn = None
+        # Running totals of the disk tier, so a write doesn't have to scan the table
+        self._disk_entries = 0
+        self._disk_bytes = 0
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created_at ON responses(created_at)")
+            self._disk_entries, self._disk_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, response: str, created_at: float):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+            if self._conn is not None:
+                row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                        self._remember(key, row[0], row[1])
+                        self._stats["disk_hits"] += 1
+                        return row[0]
+                    self._delete_keys([key])
+                    self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, response: str, model_name: str = None):
+        """Stores a response under `key` in both tiers, evicting old entries if needed."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._stats["writes"] += 1
+            if self._conn is not None:
+                size = len(response.encode("utf-8"))
+                previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_name, response, size, now, now),
+                )
+                if previous is None:
+                    self._disk_entries += 1
+                self._disk_bytes += size - (previous[0] if previous else 0)
+                self._evict_disk(now)
+
+    def _delete_keys(self, keys: List[str]) -> int:
+        # Deletes rows by key, keeping the running totals in step
+        removed = 0
+        for start in range(0, len(keys), 500): # stay under SQLite's bound-parameter limit
+            chunk = keys[start:start + 500]
+            marks = ", ".join("?" * len(chunk))
+            count, size = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE key IN ({marks})", chunk).fetchone()
+            self._conn.execute(f"DELETE FROM responses WHERE key IN ({marks})", chunk)
+            self._disk_entries -= count
+            self._disk_bytes -= size
+            removed += count
+        return removed
+
+    def _evict_disk(self, now: float):
+        # Every query here walks an index and touches only the rows it removes
+        if self.ttl_seconds is not None:
+            expired = [key for (key,) in self._conn.execute("SELECT key FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))]
+            if expired:
+                self._stats["expired"] += self._delete_keys(expired)
+        over_entries = self.max_disk_entries and self._disk_entries > self.max_disk_entries
+        over_bytes = self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes
+        if not (over_entries or over_bytes):
+            return
+        # Walk the LRU order until both limits are met
+        excess = max(0, self._disk_entries - self.max_disk_entries) if self.max_disk_entries else 0
+        victims, freed = [], 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if len(victims) >= excess and (self.max_disk_bytes is None or self._disk_bytes - freed <= self.max_disk_bytes):
+                break
+            victims.append(key)
+            freed += size
+        self._stats["evictions"] += self._delete_keys(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters, the hit rate and the current tier sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._disk_entries if self._conn is not None else 0
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Removes every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._disk_entries = self._disk_bytes = 0
+
+    def close(self):
+        """Closes the SQLite connection; the memory tier stays usable."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,181 @@
+import re
+import gzip
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List
+
+
+class CassetteMissError(LookupError):
+    """Raised in strict replay when a request has no recorded response."""
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Cassette:
+    """
+    Record/replay of LLM interactions, one JSON line per request.
+
+    In 'record' mode every call through `llm_helper.call_llm_api_async` is appended as it
+    completes: request hash (the response-cache key), model, response, start offset and
+    latency, plus a short prompt preview for humans. In 'replay' mode those responses are
+    served without any provider call, either immediately or after the recorded latency, and
+    matched by request hash (repeated identical requests get their recordings in order) or by
+    order: the Nth call to a model gets the Nth recording for that model whatever its prompt,
+    which lets a debate be replayed after its prompts were changed. Paths ending in '.gz' are
+    gzip-compressed.
+    """
+
+    def __init__(self, path: str, mode: str = "record", match: str = "hash", latency: Any = "none", strict: bool = True):
+        """
+        Initializes the cassette; in 'record' mode an existing file is appended to.
+
+        Args:
+            path (str): Cassette file (JSON lines, gzip if it ends in '.gz').
+            mode (str): 'record' or 'replay'.
+            match (str): Replay matching: 'hash' (by request) or 'order' (the Nth call to a model gets its Nth
+                recording, prompts ignored; concurrent calls to one model may then swap responses).
+            latency (str | float): Replay timing: 'none' (full speed), 'recorded', or a multiplier on the recorded latency.
+            strict (bool): In replay, raise `CassetteMissError` for unrecorded requests instead of calling the provider.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if match not in ("hash", "order"):
+            raise ValueError(f"Unknown cassette matching: {match}")
+        self.path = path
+        self.mode = mode
+        self.match = match
+        self.latency_scale = {"none": 0.0, "recorded": 1.0}.get(latency, latency)
+        if not isinstance(self.latency_scale, (int, float)):
+            raise ValueError(f"Unknown replay latency: {latency}")
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0, "prompt_changed": 0}
+        self._entries: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._last_by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_model: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._file = None
+        self.active = True
+        if mode == "replay":
+            self._load()
+        else:
+            self._file = _open(path, "a")
+
+    def _load(self):
+        with _open(self.path, "r") as f:
+            self._entries = [json.loads(line) for line in f if line.strip()]
+        self._entries.sort(key=lambda entry: entry.get("t", 0))
+        for entry in self._entries:
+            self._by_key.setdefault(entry["key"], deque()).append(entry)
+            self._by_model.setdefault(entry["model"], deque()).append(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries) if self.mode == "replay" else self._stats["recorded"]
+
+    # --- Recording ---
+    def record(self, key: str, model_name: str, prompt: str, response: str, started: float, latency: float, cached: bool = False):
+        """
+        Appends one interaction.
+
+        Args:
+            key (str): Request hash (`make_cache_key`).
+            model_name (str): Model the request went to.
+            prompt (str): The prompt; only a preview is stored.
+            response (str): The response text.
+            started (float): `time.monotonic()` when the call started.
+            latency (float): Seconds the call took.
+            cached (bool): Whether the response came from the response cache.
+        """
+        entry = {
+            "t": round(started - self._started, 6), # replay order is call-start order, not completion order
+            "key": key,
+            "model": model_name,
+            "latency": round(latency, 4),
+            "prompt": prompt[:80],
+            "response": response,
+        }
+        if cached:
+            entry["cached"] = True
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush() # a crashed debate still leaves a usable cassette
+            self._stats["recorded"] += 1
+
+    def close(self):
+        """Stops the cassette; `llm_helper` ignores it from then on."""
+        with self._lock:
+            self.active = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # --- Replay ---
+    def _next(self, key: str, model_name: str) -> Dict[str, Any]:
+        with self._lock:
+            if self.match == "order":
+                queue = self._by_model.get(model_name)
+                if not queue:
+                    return None
+                entry = queue.popleft()
+                if entry["key"] != key:
+                    self._stats["prompt_changed"] += 1
+                return entry
+            queue = self._by_key.get(key)
+            if queue:
+                self._last_by_key[key] = queue.popleft()
+            # Once a request's recordings are used up, keep serving its last one
+            return self._last_by_key.get(key)
+
+    async def replay(self, key: str, model_name: str, on_text: Callable[[str, str], Any] = None) -> str:
+        """
+        Returns the recorded response for a request, after the (scaled) recorded latency.
+
+        Returns:
+            str: The response, or None on a miss when the cassette is not strict.
+        """
+        entry = self._next(key, model_name)
+        if entry is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            if self.strict:
+                what = f"{model_name} call (recordings used up)" if self.match == "order" else f"{model_name} request"
+                raise CassetteMissError(f"No recorded response for this {what} in {self.path}")
+            return None
+        with self._lock:
+            self._stats["replayed"] += 1
+        response = entry["response"]
+        delay = entry.get("latency", 0.0) * self.latency_scale
+        if on_text is None:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return response
+        # Streamed replay: spread the recorded latency over the chunks, honouring early stops
+        chunks = re.findall(r"\S+\s*", response) or [response]
+        text = ""
+        for chunk in chunks:
+            if delay > 0:
+                await asyncio.sleep(delay / len(chunks))
+            text += chunk
+            if on_text(chunk, text):
+                break
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"path": self.path, "mode": self.mode, "entries": len(self), **self._stats}
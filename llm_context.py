@@ -0,0 +1,160 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List
+from llm_ratelimit import estimate_tokens
+from llm_helper import call_llm_api_async
+from llm_tracing import tracer
+
+# History budgets (estimated tokens, excluding the pinned system prompt) by model-name prefix.
+# Deliberately well below the models' context windows: the point is a roughly constant prompt
+# size per turn, not filling the window.
+MODEL_HISTORY_BUDGETS = {
+    "sonar-pro": 6000,
+    "sonar": 3000,
+    "gemini": 6000,
+}
+DEFAULT_HISTORY_BUDGET = 3000
+# Cap on the running summary of compacted turns
+DEFAULT_SUMMARY_TOKENS = 400
+
+
+def history_budget_for(model_name: str) -> int:
+    """Returns the history token budget for a model (longest matching prefix), or the default."""
+    for prefix in sorted(MODEL_HISTORY_BUDGETS, key=len, reverse=True):
+        if model_name.startswith(prefix):
+            return MODEL_HISTORY_BUDGETS[prefix]
+    return DEFAULT_HISTORY_BUDGET
+
+
+def _message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(msg.get("content", "")) for msg in messages)
+
+
+class ConversationContext:
+    """
+    Token-budgeted conversation history for an agent.
+
+    The system prompt is pinned and always sent first. When the turns after it exceed the
+    budget, the oldest turns are folded into a running summary by a background task started
+    right after a turn, so summarization overlaps with judging instead of delaying the next
+    turn. Until the summary is ready the original turns are kept, so nothing is ever dropped
+    unsummarized.
+    """
+
+    def __init__(self, system_prompt: str, model_name: str, budget_tokens: int = None, summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+                 keep_recent: int = 2, summarizer: Callable[[str, List[Dict[str, str]], int], Awaitable[str]] = None):
+        """
+        Initializes the context.
+
+        Args:
+            system_prompt (str): The pinned system message (persona and stance).
+            model_name (str): Model the context is sent to; picks the default budget and the summarizer model.
+            budget_tokens (int, optional): History budget in estimated tokens; defaults to `history_budget_for(model_name)`.
+            summary_tokens (int): Output-token cap for the running summary.
+            keep_recent (int): Number of most recent messages never folded into the summary.
+            summarizer (Callable, optional): `async (previous_summary, messages, max_tokens) -> summary`;
+                defaults to an LLM call on `model_name`.
+        """
+        self.system_prompt = system_prompt
+        self.model_name = model_name
+        self.budget_tokens = budget_tokens if budget_tokens is not None else history_budget_for(model_name)
+        self.summary_tokens = summary_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer or self._llm_summarize
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        self._pending = None
+        # Bumped by `restore`, so a compaction started on the replaced turns discards its result
+        self._generation = 0
+        self.compactions = 0
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Returns the messages to send: the pinned system prompt (with the summary, if any), then the recent turns."""
+        system = self.system_prompt
+        if self.summary:
+            system += f"\n\nSummary of the earlier debate turns:\n{self.summary}"
+        return [{"role": "system", "content": system}] + list(self.turns)
+
+    def state(self) -> Dict[str, Any]:
+        """Returns a JSON-serializable snapshot of the summary and turns (see `restore`)."""
+        return {"summary": self.summary, "turns": [dict(turn) for turn in self.turns], "compactions": self.compactions}
+
+    def restore(self, state: Dict[str, Any]):
+        """
+        Replaces the summary and turns with a `state()` snapshot, e.g. when resuming a checkpointed debate.
+        A running compaction is cancelled; it was slicing the old turns.
+        """
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        self._generation += 1
+        self.summary = state.get("summary", "")
+        self.turns = [dict(turn) for turn in state.get("turns", [])]
+        self.compactions = state.get("compactions", 0)
+
+    def append(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+
+    def history_tokens(self) -> int:
+        return _message_tokens(self.turns)
+
+    def _fold_count(self) -> int:
+        # Oldest messages to fold so the rest fits in the budget, never touching the `keep_recent` newest
+        limit = len(self.turns) - self.keep_recent
+        excess = self.history_tokens() - self.budget_tokens
+        count = 0
+        while count < limit and excess > 0:
+            excess -= estimate_tokens(self.turns[count].get("content", ""))
+            count += 1
+        # End on a turn boundary: the remaining history must start with a user message
+        while count < limit and self.turns[count]["role"] != "user":
+            count += 1
+        while 0 < count < len(self.turns) and self.turns[count]["role"] != "user":
+            count -= 1
+        return count
+
+    def schedule_compaction(self):
+        """Starts folding old turns into the summary in the background if the history is over budget."""
+        if self._pending is not None or self.history_tokens() <= self.budget_tokens:
+            return
+        count = self._fold_count()
+        if count > 0:
+            self._pending = asyncio.ensure_future(self._compact(count, self._generation))
+
+    async def ready(self):
+        """Waits for a running compaction, so `messages()` reflects it."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+
+    async def _compact(self, count: int, generation: int):
+        folded = self.turns[:count]
+        try:
+            with tracer.span("context summary", kind="summary"):
+                summary = await self.summarizer(self.summary, folded, self.summary_tokens)
+        except Exception as e:
+            print(f"[CONTEXT] Summarization failed ({e}); keeping a truncated summary instead.")
+            summary = self._truncated_summary(folded)
+        if generation != self._generation:
+            return
+        # Turns appended meanwhile are after the folded ones, so slicing stays correct
+        self.summary = summary.strip()
+        self.turns = self.turns[count:]
+        self.compactions += 1
+        print(f"[CONTEXT] Folded {count} messages into the summary (history now ~{self.history_tokens()} tokens).")
+
+    def _truncated_summary(self, folded: List[Dict[str, str]]) -> str:
+        # Local fallback: previous summary plus the start of each folded message, within the summary cap
+        parts = [self.summary] if self.summary else []
+        parts += [f"{msg['role']}: {msg.get('content', '')[:300]}..." for msg in folded]
+        return "\n".join(parts)[-self.summary_tokens * 4:]
+
+    async def _llm_summarize(self, previous_summary: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        transcript = "\n\n".join(f"[{msg['role']}]\n{msg.get('content', '')}" for msg in messages)
+        prompt = (
+            "You maintain a running summary of a debate from one debater's point of view.\n"
+            + (f"Current summary:\n{previous_summary}\n\n" if previous_summary else "")
+            + f"New turns to fold into the summary:\n{transcript}\n\n"
+            f"Write the updated summary in at most {int(max_tokens * 0.75)} words. Keep the debater's main claims, "
+            f"the opponent's main claims, and judge feedback still worth acting on. Output only the summary."
+        )
+        return await call_llm_api_async(prompt, self.model_name, max_tokens=max_tokens)
@@ -0,0 +1,239 @@
+import re
+import json
+import math
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, Callable, Dict, List
+from llm_providers import LLMProvider
+from llm_prompt_cache import SimulatedPrefixCache, usage_tracker
+from llm_ratelimit import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+# Score labels in the order the judge lists them (see JudgeAgent.SCORE_LABELS)
+FAKE_SCORE_LINES = {
+    "logic": "LOGICAL CONSISTENCY",
+    "persuasive": "PERSUASIVE QUALITY",
+    "factual": "FACTUAL ACCURACY",
+    "belief": "BELIEF-SHIFT",
+}
+ARGUMENT_SENTENCES = (
+    "The evidence on {topic} points clearly toward our position: {stance}.",
+    "Consider the practical consequences, which my opponent has not addressed.",
+    "Independent studies and historical precedent both support this conclusion.",
+    "Any fair reading of the costs and benefits favours this side of the motion.",
+    "The strongest objection rests on an assumption that does not survive scrutiny.",
+    "Communities that adopted this approach saw measurable and lasting improvements.",
+    "We should judge the proposal by its outcomes, not by the fears raised against it.",
+    "This is why the motion deserves your support.",
+)
+
+
+class FakeRateLimitError(Exception):
+    """Injected 429 response."""
+    status_code = 429
+
+
+class FakeServerError(Exception):
+    """Injected 503 response."""
+    status_code = 503
+
+
+def _seed(*parts: Any) -> int:
+    return int(hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:16], 16)
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Deterministic offline model for tests and benchmarks.
+
+    Replies are a function of the request only: debater prompts get an argument of
+    `argument_words` words, judge prompts get critiques with scores in whatever format was
+    asked for (score lines, '### DEBATER A/B' sections or JSON), and the other helper prompts
+    (summaries, distillation, winner) get short well-formed answers. Latency is drawn from a
+    configurable distribution plus simulated prefill/decode time (with prefix-cache discounts,
+    see `SimulatedPrefixCache`), and 429/503 errors can be injected at given rates. Random draws
+    are seeded per request and attempt, so results don't depend on scheduling order.
+    """
+
+    name = "fake"
+
+    def __init__(self, prefixes: tuple = ("fake", "local"), responder: Callable[[str, str, List[Dict[str, str]], int], str] = None,
+                 argument_words: int = 300, strengths: Dict[str, float] = None, latency_distribution: str = "constant",
+                 latency_spread: float = 0.5, error_rate: float = 0.0, rate_limit_rate: float = 0.0, time_scale: float = 1.0,
+                 seed: int = 0, **simulator_kwargs):
+        """
+        Initializes the fake backend.
+
+        Args:
+            prefixes (tuple): Model-name prefixes routed to this backend.
+            responder (Callable, optional): `(prompt, model_name, context, max_tokens) -> str` replacing the built-in replies.
+            argument_words (int): Length of generated debater arguments.
+            strengths (Dict[str, float], optional): Score offset per debater name (default: derived from the name's hash),
+                so the same debater consistently scores higher or lower.
+            latency_distribution (str): 'constant', 'uniform', 'exponential' or 'lognormal' base latency around
+                `base_latency`.
+            latency_spread (float): Relative half-width (uniform) or sigma (lognormal) of the distribution.
+            error_rate (float): Probability that an attempt fails with a 503.
+            rate_limit_rate (float): Probability that an attempt fails with a 429.
+            time_scale (float): Multiplier on all simulated latency (0 to skip sleeping).
+            seed (int): Seed mixed into every random draw.
+            **simulator_kwargs: Passed to `SimulatedPrefixCache` (base_latency, block_tokens, min_tokens, ...).
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.prefixes = tuple(prefixes)
+        self.responder = responder
+        self.argument_words = argument_words
+        self.strengths = strengths or {}
+        self.latency_distribution = latency_distribution
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.time_scale = time_scale
+        self.seed = seed
+        self.prefix_cache = SimulatedPrefixCache(**simulator_kwargs)
+        self._lock = threading.Lock()
+        self._attempts: Dict[int, int] = {}
+        self._counters = {"calls": 0, "rate_limited": 0, "failed": 0}
+        self._kinds: Dict[str, int] = {}
+
+    # --- Randomness and latency ---
+    def _sample_base_latency(self, rng: random.Random) -> float:
+        mean = self.prefix_cache.base_latency
+        if self.latency_distribution == "uniform":
+            return rng.uniform(mean * (1 - self.latency_spread), mean * (1 + self.latency_spread))
+        if self.latency_distribution == "exponential":
+            return rng.expovariate(1 / mean) if mean > 0 else 0.0
+        if self.latency_distribution == "lognormal" and mean > 0:
+            sigma = self.latency_spread
+            return rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma) # mean stays `base_latency`
+        return mean
+
+    async def _sleep(self, seconds: float):
+        if self.time_scale > 0 and seconds > 0:
+            await asyncio.sleep(seconds * self.time_scale)
+
+    def strength(self, debater_name: str) -> float:
+        """Score offset of a debater: the configured one, or 0-3 derived from the name."""
+        if debater_name in self.strengths:
+            return self.strengths[debater_name]
+        return _seed(self.seed, "strength", debater_name) % 4
+
+    # --- Replies ---
+    def _score(self, rng: random.Random, debater_name: str) -> int:
+        return max(0, min(10, round(4 + self.strength(debater_name) + rng.choice((-1, 0, 0, 1)))))
+
+    def _argument(self, rng: random.Random, prompt: str, improved: bool = False) -> str:
+        topic = re.search(r"Debate Topic: (.*)", prompt)
+        stance = re.search(r"Your Stance: (.*)", prompt)
+        values = {"topic": topic.group(1).strip() if topic else "this motion", "stance": stance.group(1).strip() if stance else "our side"}
+        sentences = ["Building on the feedback, here is a sharper case."] if improved else []
+        words = sum(len(sentence.split()) for sentence in sentences)
+        while words < self.argument_words:
+            sentence = rng.choice(ARGUMENT_SENTENCES).format(**values)
+            sentences.append(sentence)
+            words += len(sentence.split())
+        return " ".join(" ".join(sentences).split()[:self.argument_words])
+
+    def _judge(self, rng: random.Random, prompt: str, instructions: str) -> str:
+        text = instructions + "\n" + prompt
+        pair = re.search(r"Debater A: (.*?); Debater B: (.*)", prompt)
+        single = re.search(r"^DEBATER: (.*)$|^Debater: (.*)$", prompt, re.MULTILINE)
+        names = [pair.group(1).strip(), pair.group(2).strip()] if pair else [next((g for g in single.groups() if g), "").strip() if single else ""]
+        critique = "The case is coherent, but it should cite more specific evidence and answer the strongest counterargument directly."
+        if "JSON object" in text:
+            schema = text[text.rindex("JSON object"):]
+            keys = [key for key in FAKE_SCORE_LINES if f'"{key}"' in schema] or list(FAKE_SCORE_LINES)
+            with_critique = '"critique"' in schema
+            entries = []
+            for name in names:
+                scores = {key: self._score(rng, name) for key in keys}
+                entries.append({"critique": critique, "scores": scores} if with_critique else ({"scores": scores} if pair else scores))
+            return json.dumps({"A": entries[0], "B": entries[1]} if pair else entries[0])
+        keys = [key for key, label in FAKE_SCORE_LINES.items() if label in text.upper().replace("BELIEF SHIFT", "BELIEF-SHIFT")] or list(FAKE_SCORE_LINES)
+        sections = []
+        for name in names:
+            lines = "\n".join(f"- {FAKE_SCORE_LINES[key]} SCORE: {self._score(rng, name)}" for key in keys)
+            sections.append(f"{critique}\n{lines}")
+        if pair:
+            return f"### DEBATER A\n{sections[0]}\n\n### DEBATER B\n{sections[1]}"
+        return sections[0]
+
+    def respond(self, prompt: str, model_name: str, context: List[Dict[str, str]] = None, max_tokens: int = None) -> str:
+        """Returns the deterministic reply to a request (without latency or errors); also counts the request kind."""
+        if self.responder is not None:
+            return self.responder(prompt, model_name, context, max_tokens)
+        instructions = "\n".join(msg.get("content", "") for msg in (context or []))
+        rng = random.Random(_seed(self.seed, model_name, prompt, instructions))
+        if "Generate your argument:" in prompt:
+            kind, reply = "argument", self._argument(rng, prompt)
+        elif "Please improve your argument" in prompt:
+            kind, reply = "improve", self._argument(rng, prompt, improved=True)
+        elif "winner's name" in prompt:
+            names = list(dict.fromkeys(re.findall(r"^Round \d+ - (.+?):", prompt, re.MULTILINE)))
+            kind, reply = "winner", max(names, key=self.strength) if names else "Draw"
+        elif "running summary" in prompt:
+            kind, reply = "summary", "Both debaters restated their positions; the judge asked for more specific evidence."
+        elif "actionable" in prompt and "Feedback:" in prompt:
+            kind, reply = "distill", "- Cite specific evidence for the main claim.\n- Answer the opponent's strongest point directly."
+        elif "SCORE" in (instructions + prompt).upper() or "JSON object" in instructions + prompt:
+            kind, reply = "judge", self._judge(rng, prompt, instructions)
+        else:
+            kind, reply = "other", "Acknowledged."
+        with self._lock:
+            self._kinds[kind] = self._kinds.get(kind, 0) + 1
+        return reply
+
+    # --- Provider interface ---
+    async def agenerate(self, prompt: str, model_name: str, context: List[Dict[str, str]] = None, temperature: float = None,
+                        max_tokens: int = None, on_text: Callable[[str, str], Any] = None) -> str:
+        request = _seed(model_name, prompt, [msg.get("content", "") for msg in (context or [])])
+        with self._lock:
+            attempt = self._attempts.get(request, 0) + 1
+            self._attempts[request] = attempt
+            self._counters["calls"] += 1
+        rng = random.Random(_seed(self.seed, request, attempt))
+        base_latency = self._sample_base_latency(rng)
+
+        # Injected failures cost a round trip but no tokens
+        draw = rng.random()
+        if draw < self.rate_limit_rate + self.error_rate:
+            await self._sleep(base_latency)
+            limited = draw < self.rate_limit_rate
+            with self._lock:
+                self._counters["rate_limited" if limited else "failed"] += 1
+            if limited:
+                raise FakeRateLimitError(f"429 Too Many Requests (injected) for {model_name}")
+            raise FakeServerError(f"503 Service Unavailable (injected) for {model_name}")
+
+        simulator = self.prefix_cache
+        prompt_tokens, cached_tokens = simulator.lookup(model_name, [msg.get("content", "") for msg in (context or [])] + [prompt])
+        response = self.respond(prompt, model_name, context, max_tokens)
+        prefill = simulator.latency(prompt_tokens, cached_tokens, 0) - simulator.base_latency
+        if on_text is not None:
+            await self._sleep(base_latency + prefill)
+            text = ""
+            for word in re.findall(r"\S+\s*", response):
+                await self._sleep(estimate_tokens(word) * simulator.seconds_per_completion_token)
+                text += word
+                if on_text(word, text):
+                    break
+            response = text
+        else:
+            await self._sleep(base_latency + prefill + estimate_tokens(response) * simulator.seconds_per_completion_token)
+        usage_tracker.record(model_name, prompt_tokens, cached_tokens, estimate_tokens(response))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns call and injected-error counters plus successful replies per request kind."""
+        with self._lock:
+            return {**self._counters, "kinds": dict(self._kinds)}
+
+    def reset_stats(self):
+        with self._lock:
+            self._attempts.clear()
+            self._counters = {"calls": 0, "rate_limited": 0, "failed": 0}
+            self._kinds.clear()
@@ -1,72 +1,800 @@
 import os
-from typing import List, Dict, Any
-import sys
-os.environ["GEMINI_API_KEY"] = "<API_KEY>"
-os.environ["PERPLEXITY_API_KEY"] = "<API_KEY>"
-def call_llm_api(prompt: str, model_name: str = "gpt-4", context: List[Dict[str, str]] = None) -> str:
+import time
+import asyncio
+import threading
+import weakref
+from typing import List, Dict, Any, Tuple, Callable, AsyncIterator
+import hashlib
+from llm_cache import LLMCache, make_cache_key
+from llm_cassette import Cassette
+from llm_ratelimit import RateLimiterRegistry, estimate_tokens, DEFAULT_COMPLETION_TOKENS
+from llm_retry import RetryPolicy, HedgePolicy, LatencyTracker, call_with_retry, call_with_hedge
+from llm_prompt_cache import usage_tracker as _usage, usage_from_openai, usage_from_gemini
+from llm_providers import LLMProvider
+from llm_tracing import Tracer, tracer
+from llm_fake import FakeLLMProvider
+# API keys are read from the GEMINI_API_KEY and PERPLEXITY_API_KEY environment variables
+
+PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+
+# --- Shared background event loop ---
+# The synchronous API is a thin wrapper over the async one: sync calls are submitted to a
+# single long-lived event loop running in a daemon thread. This keeps one implementation
+# of every call path and lets pooled async clients outlive individual calls.
+_loop_lock = threading.Lock()
+_background_loop = None
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Returns the shared event loop used by the sync wrappers, starting it on first use."""
+    global _background_loop
+    with _loop_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-helper-loop", daemon=True)
+            thread.start()
+            _background_loop = loop
+        return _background_loop
+
+
+def run_sync(coro):
     """
-    Function to call Gemini or Perplexity API based on the model name.
+    Runs a coroutine on the shared background loop and blocks until it finishes.
+
+    Args:
+        coro: The coroutine to run (e.g. `call_llm_api_async(...)`).
+
+    Returns:
+        Any: The coroutine's result; its exception is re-raised in the caller's thread.
+    """
+    loop = get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the background loop; await the coroutine instead.")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel() # e.g. Ctrl-C: don't leave the request running in the background
+        raise
+
+
+# --- Provider client registry ---
+# Clients are created once per (provider, api_key) and event loop and reused by every
+# caller, so the judge layers and debater turns share keep-alive connections instead of
+# paying client setup and a fresh TLS handshake on each call. Async HTTP connections are
+# bound to the loop that opened them, hence one registry per loop.
+_client_lock = threading.Lock()
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], Any]]" = weakref.WeakKeyDictionary()
+_pool_settings = {"pool_size": 20, "keepalive_expiry": 60.0}
+
+
+def configure_client_pool(pool_size: int = 20, keepalive_expiry: float = 60.0):
+    """
+    Sets the connection pool limits used by provider clients.
+
+    Clients on the background loop are closed so the next call picks up the new limits;
+    clients on other loops are dropped.
+
+    Args:
+        pool_size (int): Max open (and keep-alive) connections per provider client.
+        keepalive_expiry (float): Seconds an idle pooled connection is kept open.
+    """
+    with _client_lock:
+        _pool_settings["pool_size"] = pool_size
+        _pool_settings["keepalive_expiry"] = keepalive_expiry
+    close_clients()
+    with _client_lock:
+        _clients.clear()
+
+
+async def aclose_clients():
+    """Closes every pooled provider client belonging to the running event loop."""
+    with _client_lock:
+        stale = list(_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client in stale:
+        try:
+            if hasattr(client, "aio"):
+                await client.aio.aclose()
+            else:
+                await client.close()
+        except Exception as e:
+            print(f"Error closing client: {e}")
+
+
+def close_clients():
+    """Closes the pooled provider clients used by the sync API (e.g. at the end of a batch run)."""
+    if _background_loop is not None and not _background_loop.is_closed():
+        run_sync(aclose_clients())
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=_pool_settings["pool_size"],
+        max_keepalive_connections=_pool_settings["pool_size"],
+        keepalive_expiry=_pool_settings["keepalive_expiry"],
+    )
+
+
+def _create_client(provider: str, api_key: str) -> Any:
+    if provider == "perplexity":
+        import httpx
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, base_url=PERPLEXITY_BASE_URL, http_client=httpx.AsyncClient(limits=_http_limits()))
+    if provider == "google":
+        from google import genai
+        from google.genai import types
+        try:
+            return genai.Client(api_key=api_key, http_options=types.HttpOptions(async_client_args={"limits": _http_limits()}))
+        except Exception:
+            # Older google-genai releases do not accept async_client_args; they still pool internally.
+            return genai.Client(api_key=api_key)
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def get_client(provider: str, api_key: str = None) -> Any:
+    """
+    Returns the shared client for a provider on the running event loop, creating it on first use.
+
+    Args:
+        provider (str): 'perplexity' or 'google'.
+        api_key (str, optional): API key; defaults to the provider's environment variable.
+
+    Returns:
+        Any: An `AsyncOpenAI` client for Perplexity or a `genai.Client` (used via `.aio`) for Gemini.
+    """
+    if api_key is None:
+        api_key = os.getenv("PERPLEXITY_API_KEY" if provider == "perplexity" else "GEMINI_API_KEY")
+    loop = asyncio.get_running_loop()
+    key = (provider, api_key)
+    with _client_lock:
+        loop_clients = _clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            client = _create_client(provider, api_key)
+            loop_clients[key] = client
+    return client
+
+
+# --- Provider plugins ---
+# Model names are routed by prefix to a registered `LLMProvider`. Gemini and Perplexity are
+# built in and use the pooled clients above; 'fake*' and 'local*' models run on the
+# deterministic offline backend (llm_fake.FakeLLMProvider). Register a provider to add a backend.
+class GoogleProvider(LLMProvider):
+    """Gemini models, via `call_google_async`."""
+    name = "google"
+    prefixes = ("gemini",)
+
+    async def agenerate(self, prompt: str, model_name: str, context: List[Dict[str, str]] = None, temperature: float = None,
+                        max_tokens: int = None, on_text: Callable[[str, str], Any] = None) -> str:
+        return await call_google_async(prompt, model_name, context, temperature, max_tokens, on_text)
+
+    async def aping(self):
+        # Any response (even an error status) leaves an open connection in the pool.
+        await get_client("google").aio.models.list(config={"page_size": 1})
+
+
+class PerplexityProvider(LLMProvider):
+    """Perplexity models (sonar, sonar-pro), via `call_perplexity_async`."""
+    name = "perplexity"
+    prefixes = ("sonar",)
+
+    async def agenerate(self, prompt: str, model_name: str, context: List[Dict[str, str]] = None, temperature: float = None,
+                        max_tokens: int = None, on_text: Callable[[str, str], Any] = None) -> str:
+        return await call_perplexity_async(prompt, model_name, context, temperature, max_tokens, on_text)
+
+    async def aping(self):
+        await get_client("perplexity").with_options(max_retries=0).models.list()
+
+
+_providers_lock = threading.Lock()
+_providers: Dict[str, LLMProvider] = {}
+
+
+def register_provider(provider: LLMProvider) -> LLMProvider:
+    """
+    Registers a provider plugin, replacing any provider with the same name.
+
+    Args:
+        provider (LLMProvider): The backend; calls to models starting with one of its prefixes are routed to it
+            (the longest matching prefix across providers wins).
+
+    Returns:
+        LLMProvider: The registered provider.
+    """
+    if not provider.name:
+        raise ValueError("Provider plugins need a name")
+    with _providers_lock:
+        _providers[provider.name] = provider
+    return provider
+
+
+def unregister_provider(name: str):
+    with _providers_lock:
+        _providers.pop(name, None)
+
+
+def get_registered_provider(name: str) -> LLMProvider:
+    """Returns the provider plugin registered under `name`, or None."""
+    return _providers.get(name)
+
+
+def get_provider(model_name: str) -> str:
+    """Maps a model name to the name of the provider serving it (e.g. 'google', 'perplexity', 'fake'), or None if unsupported."""
+    best, best_prefix = None, ""
+    with _providers_lock:
+        providers = list(_providers.values())
+    for provider in providers:
+        prefix = provider.matches(model_name)
+        if prefix is not None and len(prefix) > len(best_prefix):
+            best, best_prefix = provider.name, prefix
+    return best
+
+
+register_provider(GoogleProvider())
+register_provider(PerplexityProvider())
+register_provider(FakeLLMProvider())
+
+
+async def _ping_provider(provider: str):
+    try:
+        await _providers[provider].aping()
+    except Exception as e:
+        print(f"Warm-up request to {provider} returned: {e}")
+
+
+async def warm_up_clients_async(model_names: List[str], connections: int = 1):
+    """
+    Creates the clients for the given models on the running loop and opens pooled
+    connections ahead of time, so the first round of a debate doesn't pay the
+    cold-start (import, DNS, TLS) penalty.
+
+    Args:
+        model_names (List[str]): Models that will be called (e.g. debater and judge models).
+        connections (int): Concurrent warm-up requests per provider, i.e. connections to open.
+    """
+    providers = {get_provider(m) for m in model_names if m} - {None}
+    if not providers:
+        return
+    print(f"Warming up LLM clients for: {', '.join(sorted(providers))} ({connections} connection(s) each)")
+    await asyncio.gather(*[_ping_provider(provider) for provider in providers for _ in range(max(1, connections))])
+
+
+def warm_up_clients(model_names: List[str], connections: int = 1):
+    """Sync wrapper for `warm_up_clients_async`; warms the clients used by the sync API."""
+    run_sync(warm_up_clients_async(model_names, connections))
+
+
+# --- Response cache ---
+# Opt-in: enabled by configure_cache() or by setting the LLM_CACHE_PATH environment variable.
+_cache = None
+_cache_configured = False
+
+
+def configure_cache(path: str = "llm_cache.sqlite", enabled: bool = True, **kwargs) -> LLMCache:
+    """
+    Enables (or disables) the response cache used by `call_llm_api`.
+
+    Args:
+        path (str): SQLite file for the disk tier, or None for a memory-only cache.
+        enabled (bool): Pass False to turn caching off.
+        **kwargs: Forwarded to `LLMCache` (max_memory_entries, max_disk_entries, max_disk_bytes, ttl_seconds).
+
+    Returns:
+        LLMCache: The active cache, or None if disabled.
+    """
+    global _cache, _cache_configured
+    if _cache is not None:
+        _cache.close()
+    _cache = LLMCache(path, **kwargs) if enabled else None
+    _cache_configured = True
+    return _cache
+
+
+def get_cache() -> LLMCache:
+    """Returns the active response cache, or None if caching is off."""
+    global _cache, _cache_configured
+    if not _cache_configured:
+        _cache_configured = True
+        if os.getenv("LLM_CACHE_PATH"):
+            _cache = LLMCache(os.getenv("LLM_CACHE_PATH"))
+    return _cache
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Returns the response cache's hit/miss counters (empty if caching is off)."""
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
+
+
+# --- Record/replay cassettes ---
+# A recording cassette captures every call_llm_api request/response with timing; a replaying
+# one serves them back with no provider call, so a debate can be re-run offline.
+_cassette = None
+
+
+def use_cassette(path: str = None, mode: str = "record", match: str = "hash", latency: Any = "none", strict: bool = True) -> Cassette:
+    """
+    Records every subsequent LLM call to, or replays them from, a cassette file.
+
+    Usable as a context manager: `with use_cassette("debate.jsonl"): orchestrator.run_debate()`.
+
+    Args:
+        path (str, optional): Cassette file; None stops (and closes) the current cassette.
+        mode (str): 'record' or 'replay'.
+        match (str): Replay matching, 'hash' or 'order' (see `Cassette`).
+        latency (str | float): Replay timing: 'none', 'recorded' or a multiplier on the recorded latency.
+        strict (bool): In replay, fail on unrecorded requests instead of calling the provider.
+
+    Returns:
+        Cassette: The active cassette (None when stopped).
+    """
+    global _cassette
+    previous, _cassette = _cassette, None
+    if previous is not None:
+        previous.close()
+    if path is not None:
+        _cassette = Cassette(path, mode, match, latency, strict)
+        print(f"[CASSETTE] {'Recording to' if mode == 'record' else 'Replaying from'} {path}")
+    return _cassette
+
+
+def get_cassette() -> Cassette:
+    """Returns the active cassette, or None."""
+    return _cassette if _cassette is not None and _cassette.active else None
+
+
+# --- Tracing ---
+# Every call_llm_api_async call is an 'llm' span (model, provider, tokens, retries, cache hit,
+# coalesced, replayed) nested under whatever span is current: the graph task that made it,
+# inside its round and debate (see DebateEngine and the orchestrators' arun_debate).
+def configure_tracing(enabled: bool = True, reset: bool = True) -> Tracer:
+    """
+    Turns span collection on or off.
+
+    Args:
+        enabled (bool): Collect spans from now on.
+        reset (bool): Drop the spans collected so far.
+
+    Returns:
+        Tracer: The process-wide tracer; see its `export_jsonl`, `export_chrome_trace` and `format_report`.
+    """
+    if reset:
+        tracer.reset()
+    tracer.enable(enabled)
+    return tracer
+
+
+# --- Single-flight request coalescing ---
+# Concurrent identical requests (same cache key) on the same event loop share one
+# provider call; every waiter gets its result or its exception. Sync callers all run on
+# the background loop, so they are coalesced with each other.
+_inflight_lock = threading.Lock()
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+_coalescing_stats = {"leaders": 0, "coalesced": 0}
+
+
+def _consume_exception(task: asyncio.Task):
+    # Avoid "exception was never retrieved" warnings when every waiter was cancelled.
+    if not task.cancelled():
+        task.exception()
+
+
+async def _single_flight(key: str, factory):
+    """Awaits the in-flight call for `key`, or starts `factory()` as that call if there is none."""
+    loop = asyncio.get_running_loop()
+    with _inflight_lock:
+        inflight = _inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is None:
+            task = loop.create_task(factory())
+            inflight[key] = task
+            task.add_done_callback(lambda t: inflight.pop(key, None))
+            task.add_done_callback(_consume_exception)
+            _coalescing_stats["leaders"] += 1
+        else:
+            _coalescing_stats["coalesced"] += 1
+    # shield(): a cancelled waiter must not cancel the call the others are waiting on
+    return await asyncio.shield(task)
+
+
+def get_coalescing_stats() -> Dict[str, int]:
+    """Returns how many calls went to the provider ('leaders'), how many were collapsed into them ('coalesced'), and how many are in flight."""
+    with _inflight_lock:
+        stats = dict(_coalescing_stats)
+        stats["in_flight"] = sum(len(v) for v in _inflight.values())
+    return stats
+
+
+# --- Rate limiting ---
+# Every provider call acquires capacity from the shared per-provider/model limiter:
+# RPM and TPM token buckets plus an AIMD concurrency window that shrinks on 429s.
+_rate_limiters = RateLimiterRegistry()
+
+
+def configure_rate_limit(target: str, rpm: float = None, tpm: float = None, initial_concurrency: int = 8, max_concurrency: int = 32):
+    """
+    Sets rate limits for a provider ('perplexity', 'google') or a specific model.
+
+    Args:
+        target (str): Provider name or model name (model settings take precedence).
+        rpm (float, optional): Requests per minute; None disables the request bucket.
+        tpm (float, optional): Tokens per minute; None disables the token bucket.
+        initial_concurrency (int): Starting size of the adaptive concurrency window.
+        max_concurrency (int): Upper bound the window can grow to.
+    """
+    _rate_limiters.configure(target, rpm, tpm, initial_concurrency, max_concurrency)
+
+
+def set_rate_limiting(enabled: bool):
+    """Turns the shared rate limiter on or off for all subsequent calls."""
+    _rate_limiters.enabled = enabled
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns queue depth, in-flight calls, concurrency window and bucket levels per provider/model."""
+    return _rate_limiters.stats()
+
+
+# --- Retries and hedging ---
+# Transient failures are retried with jittered exponential backoff (outside the limiter,
+# so a backing-off call doesn't hold a slot). Hedging is opt-in: a duplicate is sent once
+# a call outlives the observed p95 latency for its model.
+_retry_policy = RetryPolicy()
+_hedge_policy = HedgePolicy()
+_latencies = LatencyTracker()
+
+
+def configure_retry(max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0, deadline: float = 300.0):
+    """
+    Sets the retry policy for all LLM calls.
+
+    Args:
+        max_attempts (int): Total attempts including the first one (1 disables retries).
+        base_delay (float): Backoff ceiling for the first retry, in seconds; doubles per attempt.
+        max_delay (float): Upper bound for a single backoff.
+        deadline (float, optional): Overall time budget across attempts, in seconds.
+    """
+    global _retry_policy
+    _retry_policy = RetryPolicy(max_attempts, base_delay, max_delay, deadline)
+
+
+def configure_hedging(enabled: bool = True, percentile: float = 0.95, min_samples: int = 20, min_delay: float = 0.5):
+    """
+    Enables or disables hedged requests.
+
+    Args:
+        enabled (bool): Whether slow calls get a duplicate request.
+        percentile (float): Latency quantile after which the duplicate is sent.
+        min_samples (int): Latencies to observe per model before hedging starts.
+        min_delay (float): Never hedge earlier than this many seconds.
+    """
+    global _hedge_policy
+    _hedge_policy = HedgePolicy(enabled, percentile, min_samples, min_delay)
+
+
+def get_latency_stats() -> Dict[str, Any]:
+    """Returns observed p50/p95 latency per model plus hedging counters."""
+    return {"models": _latencies.stats(), "hedges_sent": _hedge_policy.hedges_sent, "hedges_won": _hedge_policy.hedges_won}
+
+
+# --- Prompt prefix caching ---
+# Providers discount prompt tokens that repeat a recently seen prefix, so long stable
+# instructions go first as a context message tagged {"cache": True} (see JudgeAgent._call_judge).
+# Perplexity caches automatically; for Gemini the tagged prefix can also be stored as explicit
+# cached content (opt-in). Reported usage, including cached tokens, is collected per model
+# in llm_prompt_cache.usage_tracker.
+_prompt_cache_settings = {"explicit": False, "ttl_seconds": 600, "min_tokens": 1024}
+_explicit_caches: Dict[Tuple[str, str], Tuple[str, float]] = {} # (model, prefix digest) -> (cached content name, expiry)
+_explicit_unsupported = set() # models whose cached-content creation failed
+
+
+def configure_prompt_caching(explicit: bool = False, ttl_seconds: int = 600, min_tokens: int = 1024):
+    """
+    Configures explicit prompt caching.
+
+    Args:
+        explicit (bool): Store cacheable prefixes as Gemini cached content and reference them by name.
+        ttl_seconds (int): Lifetime of each cached content entry.
+        min_tokens (int): Shorter prefixes (estimated tokens) are sent normally; Gemini rejects small caches.
+    """
+    _prompt_cache_settings.update(explicit=explicit, ttl_seconds=ttl_seconds, min_tokens=min_tokens)
+    _explicit_unsupported.clear()
+
+
+def configure_local_backend(responder=None, time_scale: float = 1.0, **kwargs) -> FakeLLMProvider:
+    """
+    Replaces the offline backend serving 'fake*' and 'local*' models.
+
+    Args:
+        responder (Callable, optional): `(prompt, model_name, context, max_tokens) -> str`; defaults to the
+            deterministic debater/judge replies of `FakeLLMProvider`.
+        time_scale (float): Multiplier on the simulated latency (0 to skip sleeping).
+        **kwargs: Other `FakeLLMProvider` options (latency distribution, error injection) and `SimulatedPrefixCache`
+            settings (block_tokens, min_tokens, cached_price_ratio, ...).
+
+    Returns:
+        FakeLLMProvider: The new backend (see its `stats()` and `prefix_cache`).
+    """
+    return register_provider(FakeLLMProvider(responder=responder, time_scale=time_scale, **kwargs))
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """Returns prompt/cached/completion token totals and cache-hit ratios per model, plus explicit cache counts."""
+    stats = _usage.stats()
+    stats["explicit_caches"] = sum(1 for _, expiry in _explicit_caches.values() if expiry > time.time())
+    return stats
+
+
+def reset_prompt_cache_stats():
+    _usage.reset()
+
+
+def _cacheable_prefix(context: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+    """Splits off the leading cache-tagged message: returns (its content or None, the remaining messages)."""
+    if context and context[0].get("cache"):
+        return context[0]["content"], context[1:]
+    return None, context
+
+
+async def _gemini_cached_content(client: Any, model_name: str, prefix: str) -> str:
+    """Returns the name of a Gemini cached content holding `prefix`, creating it once; None to send the prefix inline."""
+    if (not _prompt_cache_settings["explicit"] or model_name in _explicit_unsupported
+            or estimate_tokens(prefix) < _prompt_cache_settings["min_tokens"]):
+        return None
+    key = (model_name, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+    entry = _explicit_caches.get(key)
+    if entry is not None and entry[1] > time.time() + 30: # leave headroom so it doesn't expire mid-request
+        return entry[0]
+
+    async def create() -> str:
+        ttl = _prompt_cache_settings["ttl_seconds"]
+        cached = await client.aio.caches.create(model=model_name, config={"contents": [prefix], "ttl": f"{ttl}s"})
+        _explicit_caches[key] = (cached.name, time.time() + ttl)
+        print(f"[PROMPT CACHE] Created cached content for {model_name} (~{estimate_tokens(prefix)} tokens, ttl {ttl}s)")
+        return cached.name
+
+    try:
+        return await _single_flight("cached-content:" + ":".join(key), create)
+    except Exception as e:
+        print(f"[PROMPT CACHE] Explicit caching unavailable for {model_name} ({e}); sending prefixes inline.")
+        _explicit_unsupported.add(model_name)
+        return None
+
+
+async def _call_provider(prompt: str, model_name: str, context: List[Dict[str, str]], temperature: float, max_tokens: int,
+                         on_text: Callable[[str, str], Any] = None) -> str:
+    provider = get_provider(model_name)
+    if provider is None:
+        print(f"Model {model_name} not supported. Please use a Gemini, Perplexity or fake/local model, or register a provider.")
+        raise ValueError(f"Model {model_name} not supported.")
+
+    attempts = 0
+    async def attempt() -> str:
+        nonlocal attempts
+        attempts += 1
+        if on_text is not None: # a hedge would feed the caller two interleaved streams
+            return await _limited_call(provider, prompt, model_name, context, temperature, max_tokens, on_text)
+        return await call_with_hedge(lambda: _limited_call(provider, prompt, model_name, context, temperature, max_tokens),
+                                     _hedge_policy, _latencies, model_name)
+
+    try:
+        return await call_with_retry(attempt, _retry_policy, label=f"{model_name} call")
+    finally:
+        tracer.annotate(retries=attempts - 1)
+
+
+async def _limited_call(provider: str, prompt: str, model_name: str, context: List[Dict[str, str]], temperature: float, max_tokens: int,
+                        on_text: Callable[[str, str], Any] = None) -> str:
+    limiter = _rate_limiters.get(provider, model_name)
+    if limiter is None:
+        return await _timed_dispatch(provider, prompt, model_name, context, temperature, max_tokens, on_text)
+
+    prompt_tokens = estimate_tokens(prompt) + sum(estimate_tokens(msg.get("content", "")) for msg in (context or []))
+    async with limiter.slot(prompt_tokens + (max_tokens or DEFAULT_COMPLETION_TOKENS)) as permit:
+        response = await _timed_dispatch(provider, prompt, model_name, context, temperature, max_tokens, on_text)
+        permit.record(prompt_tokens + estimate_tokens(response))
+    return response
+
+
+async def _timed_dispatch(provider: str, prompt: str, model_name: str, context: List[Dict[str, str]], temperature: float, max_tokens: int,
+                          on_text: Callable[[str, str], Any] = None) -> str:
+    started = time.monotonic()
+    response = await _dispatch(provider, prompt, model_name, context, temperature, max_tokens, on_text)
+    _latencies.record(model_name, time.monotonic() - started)
+    return response
+
+
+async def _dispatch(provider: str, prompt: str, model_name: str, context: List[Dict[str, str]], temperature: float, max_tokens: int,
+                    on_text: Callable[[str, str], Any] = None) -> str:
+    print(f"\n--- Calling LLM ({model_name}) ---")
+    print(f"Prompt: {prompt[:100]}...") # Print truncated prompt
+
+    return await _providers[provider].agenerate(prompt, model_name, context, temperature, max_tokens, on_text)
+
+
+async def call_llm_api_async(prompt: str, model_name: str = "gpt-4", context: List[Dict[str, str]] = None,
+                             temperature: float = None, max_tokens: int = None, use_cache: bool = True,
+                             coalesce: bool = True, on_text: Callable[[str, str], Any] = None) -> str:
+    """
+    Function to call Gemini or Perplexity API based on the model name, without blocking the event loop.
 
     Args:
         prompt (str): The input prompt for the LLM.
         model_name (str): The specific LLM model to use (e.g., 'gemini-1.5-flash', 'sonar-pro').
         context (List[Dict[str, str]]): Optional conversation history or context.
+        temperature (float, optional): Sampling temperature; provider default if None.
+        max_tokens (int, optional): Cap on output tokens; provider default if None.
+        use_cache (bool): Set to False to bypass the response cache for this call.
+        coalesce (bool): Share one provider call with concurrent identical requests.
+        on_text (Callable, optional): Streams the response: called as `on_text(delta, text_so_far)` for every
+            chunk, before the response is complete. Returning True stops generation early; the text so far
+            is then returned (and not cached). If a failed stream is retried, `text_so_far` starts over.
 
     Returns:
         str: The response from the LLM.
     """
+    with tracer.span("llm", kind="llm", model=model_name, provider=get_provider(model_name)):
+        return await _call_llm(prompt, model_name, context, temperature, max_tokens, use_cache, coalesce, on_text)
 
-    print(f"\n--- Calling LLM ({model_name}) ---")
-    print(f"Prompt: {prompt[:100]}...") # Print truncated prompt
-    
-    # Handle Gemini models
-    if model_name.startswith('gemini'):
-        return call_google(prompt, model_name, context)    
-    # Handle Perplexity models (sonar or sonar-pro)
-    elif model_name.startswith('sonar'):
-        return call_perplexity(prompt, model_name, context)
-    # Default case for unsupported models
+
+async def _call_llm(prompt: str, model_name: str, context: List[Dict[str, str]], temperature: float, max_tokens: int,
+                    use_cache: bool, coalesce: bool, on_text: Callable[[str, str], Any]) -> str:
+    cache = get_cache() if use_cache else None
+    request_key = make_cache_key(model_name, prompt, context, {"temperature": temperature, "max_tokens": max_tokens})
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == "replay":
+        replayed = await cassette.replay(request_key, model_name, on_text)
+        if replayed is not None:
+            tracer.annotate(replayed=True)
+            return replayed
+    recording = cassette is not None and cassette.mode == "record"
+    started = time.monotonic()
+    if cache is not None:
+        cached = cache.get(request_key)
+        if cached is not None:
+            print(f"\n--- LLM cache hit ({model_name}) ---")
+            tracer.annotate(cache_hit=True)
+            if on_text is not None:
+                on_text(cached, cached)
+            if recording:
+                cassette.record(request_key, model_name, prompt, cached, started, time.monotonic() - started, cached=True)
+            return cached
+
+    stopped = False
+    def watch(delta: str, text: str) -> bool:
+        nonlocal stopped
+        stopped = bool(on_text(delta, text))
+        return stopped
+
+    async def fetch() -> str:
+        response = await _call_provider(prompt, model_name, context, temperature, max_tokens, watch if on_text else None)
+        if cache is not None and response and not stopped: # an early-stopped stream is not the full response
+            cache.set(request_key, response, model_name)
+        return response
+
+    if coalesce and on_text is None: # every streaming caller needs its own stream
+        if tracer.enabled:
+            with _inflight_lock:
+                tracer.annotate(coalesced=request_key in _inflight.get(asyncio.get_running_loop(), {}))
+        response = await _single_flight(request_key, fetch)
     else:
-        print(f"Model {model_name} not supported. Please use a Gemini or Perplexity model.")
-        raise
+        response = await fetch()
+    if stopped:
+        tracer.annotate(stopped=True)
+    if recording:
+        cassette.record(request_key, model_name, prompt, response, started, time.monotonic() - started)
+    return response
+
+
+def call_llm_api(prompt: str, model_name: str = "gpt-4", context: List[Dict[str, str]] = None,
+                 temperature: float = None, max_tokens: int = None, use_cache: bool = True,
+                 coalesce: bool = True, on_text: Callable[[str, str], Any] = None) -> str:
+    """
+    Function to call Gemini or Perplexity API based on the model name.
+    Blocking wrapper around `call_llm_api_async`.
+
+    Args:
+        prompt (str): The input prompt for the LLM.
+        model_name (str): The specific LLM model to use (e.g., 'gemini-1.5-flash', 'sonar-pro').
+        context (List[Dict[str, str]]): Optional conversation history or context.
+        temperature (float, optional): Sampling temperature; provider default if None.
+        max_tokens (int, optional): Cap on output tokens; provider default if None.
+        use_cache (bool): Set to False to bypass the response cache for this call.
+        coalesce (bool): Share one provider call with concurrent identical requests.
+        on_text (Callable, optional): Streaming callback `on_text(delta, text_so_far)`, run on the background
+            loop's thread; return True to stop generation early.
+
+    Returns:
+        str: The response from the LLM.
+    """
+    return run_sync(call_llm_api_async(prompt, model_name, context, temperature, max_tokens, use_cache, coalesce, on_text))
+
+
+# --- Streaming ---
+async def _consume_stream(deltas: AsyncIterator[str], on_text: Callable[[str, str], Any]) -> Tuple[str, bool]:
+    """Feeds streamed text deltas to `on_text`; returns (text, stopped_early)."""
+    text = ""
+    async for delta in deltas:
+        if not delta:
+            continue
+        text += delta
+        if on_text(delta, text):
+            return text, True
+    return text, False
 
-def call_perplexity(prompt: str, model_name: str = "sonar", context: List[Dict[str, str]] = None):
+
+def print_stream(delta: str, text: str):
+    """`on_text` callback that echoes a streamed response to the console as it arrives."""
+    print(delta, end="", flush=True)
+
+
+async def call_perplexity_async(prompt: str, model_name: str = "sonar", context: List[Dict[str, str]] = None,
+                                temperature: float = None, max_tokens: int = None, on_text: Callable[[str, str], Any] = None):
     try:
-        from openai import OpenAI
-        # Initialize with API key from environment variable
-        api_key = os.getenv("PERPLEXITY_API_KEY")
-        client = OpenAI(api_key=api_key, base_url="https://api.perplexity.ai")
-        
+        # Reuse the pooled client for the key from the environment variable
+        client = get_client("perplexity", os.getenv("PERPLEXITY_API_KEY"))
+
         # Prepare messages for the chat completion
         messages = []
-        
-        # Add context if provided
+
+        # Add context if provided (the cacheable prefix needs no marker: Perplexity caches repeated prefixes itself)
         if context:
             for msg in context:
                 messages.append({"role": msg.get("role", "user"), "content": msg.get("content", "")})
-        
+
         # Add the current prompt
         messages.append({"role": "user", "content": prompt})
-        response = client.chat.completions.create(
+        sampling = {k: v for k, v in {"temperature": temperature, "max_tokens": max_tokens}.items() if v is not None}
+        if on_text is not None:
+            stream = await client.chat.completions.create(model=model_name, messages=messages, stream=True, **sampling)
+            last_chunk = None
+            async def deltas():
+                nonlocal last_chunk
+                async for chunk in stream:
+                    last_chunk = chunk
+                    if chunk.choices:
+                        yield chunk.choices[0].delta.content or ""
+            try:
+                text, _ = await _consume_stream(deltas(), on_text)
+            finally:
+                await stream.close() # ends generation (and billing) when the caller stopped early
+            _usage.record(model_name, *usage_from_openai(last_chunk))
+            return text
+
+        response = await client.chat.completions.create(
             model=model_name,
-            messages=messages
+            messages=messages,
+            **sampling
         )
-        
+        _usage.record(model_name, *usage_from_openai(response))
+
         return response.choices[0].message.content
-        
+
     except Exception as e:
         print(f"Error calling Perplexity API: {e}")
         raise
 
 
-def call_google(prompt: str, model_name: str = "gpt-4", context: List[Dict[str, str]] = None):
+async def call_google_async(prompt: str, model_name: str = "gpt-4", context: List[Dict[str, str]] = None,
+                            temperature: float = None, max_tokens: int = None, on_text: Callable[[str, str], Any] = None):
     try:
-        from google import genai
-        
-        # Initialize with API key from environment variable
-        api_key = os.getenv("GEMINI_API_KEY")
-        client = genai.Client(api_key=api_key)
-        
+        # Reuse the pooled client for the key from the environment variable
+        client = get_client("google", os.getenv("GEMINI_API_KEY"))
+        config = {k: v for k, v in {"temperature": temperature, "max_output_tokens": max_tokens}.items() if v is not None}
+
+        # Reference the cacheable prefix as explicit cached content when enabled
+        prefix, rest = _cacheable_prefix(context)
+        cached_content = await _gemini_cached_content(client, model_name, prefix) if prefix else None
+        if cached_content:
+            config["cached_content"] = cached_content
+            context = rest
+
         # Convert context to format expected by Gemini
         if context:
             # For Gemini, we need to flatten the context messages
@@ -74,18 +802,46 @@ def call_google(prompt: str, model_name: str = "gpt-4", context: List[Dict[str,
             for msg in context:
                 contents.append(msg["content"])
             contents.append(prompt)
-            response = client.models.generate_content(
-                model=model_name,
-                contents=contents
-            )
         else:
-            response = client.models.generate_content(
-                model=model_name,
-                contents=prompt
-            )
-        
+            contents = prompt
+
+        if on_text is not None:
+            stream = await client.aio.models.generate_content_stream(model=model_name, contents=contents, config=config or None)
+            last_chunk = None
+            async def deltas():
+                nonlocal last_chunk
+                async for chunk in stream:
+                    last_chunk = chunk
+                    yield chunk.text or ""
+            try:
+                text, _ = await _consume_stream(deltas(), on_text)
+            finally:
+                if hasattr(stream, "aclose"):
+                    await stream.aclose() # ends generation when the caller stopped early
+            _usage.record(model_name, *usage_from_gemini(last_chunk))
+            return text
+
+        response = await client.aio.models.generate_content(
+            model=model_name,
+            contents=contents,
+            config=config or None
+        )
+        _usage.record(model_name, *usage_from_gemini(response))
+
         return response.text
-        
+
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         raise
+
+
+def call_perplexity(prompt: str, model_name: str = "sonar", context: List[Dict[str, str]] = None,
+                    temperature: float = None, max_tokens: int = None, on_text: Callable[[str, str], Any] = None):
+    """Blocking wrapper around `call_perplexity_async`."""
+    return run_sync(call_perplexity_async(prompt, model_name, context, temperature, max_tokens, on_text))
+
+
+def call_google(prompt: str, model_name: str = "gpt-4", context: List[Dict[str, str]] = None,
+                temperature: float = None, max_tokens: int = None, on_text: Callable[[str, str], Any] = None):
+    """Blocking wrapper around `call_google_async`."""
+    return run_sync(call_google_async(prompt, model_name, context, temperature, max_tokens, on_text))
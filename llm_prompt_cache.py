@@ -0,0 +1,150 @@
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Tuple
+from llm_ratelimit import estimate_tokens
+from llm_tracing import tracer
+
+
+def usage_from_openai(response: Any) -> Tuple[int, int, int]:
+    """
+    Reads token usage from an OpenAI-compatible chat completion (Perplexity).
+
+    Returns:
+        Tuple[int, int, int]: (prompt_tokens, cached_prompt_tokens, completion_tokens); 0 for anything not reported.
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (
+        getattr(usage, "prompt_tokens", None) or 0,
+        getattr(details, "cached_tokens", None) or 0,
+        getattr(usage, "completion_tokens", None) or 0,
+    )
+
+
+def usage_from_gemini(response: Any) -> Tuple[int, int, int]:
+    """
+    Reads token usage from a Gemini `generate_content` response.
+
+    Returns:
+        Tuple[int, int, int]: (prompt_tokens, cached_prompt_tokens, completion_tokens); 0 for anything not reported.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    return (
+        getattr(usage, "prompt_token_count", None) or 0,
+        getattr(usage, "cached_content_token_count", None) or 0,
+        getattr(usage, "candidates_token_count", None) or 0,
+    )
+
+
+class PromptUsageTracker:
+    """Thread-safe per-model totals of prompt, cached-prompt and completion tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model_name: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int):
+        with self._lock:
+            totals = self._models.setdefault(model_name, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["cached_tokens"] += cached_tokens
+            totals["completion_tokens"] += completion_tokens
+        # Also counted on the current LLM call's span (attempts and hedges add up)
+        tracer.add(prompt_tokens=prompt_tokens, cached_tokens=cached_tokens, completion_tokens=completion_tokens)
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the totals per model and overall, each with the share of prompt tokens served from cache."""
+        with self._lock:
+            models = {model: dict(totals) for model, totals in self._models.items()}
+        overall = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        for totals in models.values():
+            for key in overall:
+                overall[key] += totals[key]
+        for totals in list(models.values()) + [overall]:
+            totals["cache_hit_ratio"] = round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0
+        return {"models": models, "total": overall}
+
+
+class SimulatedPrefixCache:
+    """
+    Offline stand-in for provider-side prompt prefix caching.
+
+    Mirrors how the providers bill it: prompts are hashed in fixed-size token blocks, a request
+    reuses the longest block-aligned prefix seen before on the same model (if the prompt is at
+    least `min_tokens` long), and cached tokens are cheaper and faster to process. Tokens are
+    the usual ~4 characters estimate.
+    """
+
+    def __init__(self, block_tokens: int = 128, min_tokens: int = 1024, ttl_seconds: float = 300.0,
+                 cached_price_ratio: float = 0.25, base_latency: float = 0.2, seconds_per_prompt_token: float = 0.0002,
+                 seconds_per_completion_token: float = 0.01):
+        """
+        Initializes the simulator.
+
+        Args:
+            block_tokens (int): Cache granularity; only whole blocks are reused.
+            min_tokens (int): Shorter prompts are never cached.
+            ttl_seconds (float): Seconds a cached prefix survives without being reused.
+            cached_price_ratio (float): Price of a cached prompt token relative to an uncached one.
+            base_latency (float): Fixed seconds per request.
+            seconds_per_prompt_token (float): Prefill time per uncached prompt token (cached tokens cost `cached_price_ratio` of it).
+            seconds_per_completion_token (float): Decode time per output token.
+        """
+        self.block_tokens = block_tokens
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds
+        self.cached_price_ratio = cached_price_ratio
+        self.base_latency = base_latency
+        self.seconds_per_prompt_token = seconds_per_prompt_token
+        self.seconds_per_completion_token = seconds_per_completion_token
+        self._lock = threading.Lock()
+        self._blocks: Dict[Tuple[str, str], float] = {} # (model, digest of the prefix up to a block) -> expiry
+
+    def lookup(self, model_name: str, segments: List[str]) -> Tuple[int, int]:
+        """
+        Looks up the prompt made of `segments` (context messages, then the prompt) and caches its blocks.
+
+        Returns:
+            Tuple[int, int]: (prompt_tokens, cached_tokens).
+        """
+        text = "\n".join(segments)
+        prompt_tokens = estimate_tokens(text)
+        if prompt_tokens < self.min_tokens:
+            return prompt_tokens, 0
+        block_chars = self.block_tokens * 4
+        digest = hashlib.sha256(model_name.encode("utf-8"))
+        now = time.monotonic()
+        cached_blocks, still_hitting = 0, True
+        with self._lock:
+            for end in range(block_chars, len(text) + 1, block_chars):
+                digest.update(text[end - block_chars:end].encode("utf-8"))
+                key = (model_name, digest.hexdigest())
+                if still_hitting and self._blocks.get(key, 0) > now:
+                    cached_blocks += 1
+                else:
+                    still_hitting = False
+                self._blocks[key] = now + self.ttl_seconds
+        return prompt_tokens, cached_blocks * self.block_tokens
+
+    def latency(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+        """Simulated seconds to serve a request with this usage."""
+        prefill = (prompt_tokens - cached_tokens) + cached_tokens * self.cached_price_ratio
+        return self.base_latency + prefill * self.seconds_per_prompt_token + completion_tokens * self.seconds_per_completion_token
+
+    def billed_prompt_tokens(self, prompt_tokens: int, cached_tokens: int) -> float:
+        """Prompt tokens as billed, counting cached tokens at `cached_price_ratio`."""
+        return (prompt_tokens - cached_tokens) + cached_tokens * self.cached_price_ratio
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+# Process-wide token usage, filled by every provider call (see llm_helper.get_prompt_cache_stats)
+usage_tracker = PromptUsageTracker()
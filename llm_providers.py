@@ -0,0 +1,44 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class LLMProvider:
+    """
+    A model backend that `llm_helper` routes calls to by model-name prefix.
+
+    Subclasses set `name` (used for rate limits and logs) and `prefixes`, and implement
+    `agenerate`. Register an instance with `llm_helper.register_provider`; caching,
+    coalescing, rate limiting, retries and hedging are applied around it by `llm_helper`.
+    Errors should carry a `status_code` (e.g. 429, 503) where one applies, so they are
+    classified as retryable the same way as provider SDK errors.
+    """
+
+    name: str = ""
+    prefixes: Tuple[str, ...] = ()
+
+    def matches(self, model_name: str) -> str:
+        """Returns the longest of `prefixes` that `model_name` starts with, or None."""
+        matching = [prefix for prefix in self.prefixes if model_name.startswith(prefix)]
+        return max(matching, key=len) if matching else None
+
+    async def agenerate(self, prompt: str, model_name: str, context: List[Dict[str, str]] = None, temperature: float = None,
+                        max_tokens: int = None, on_text: Callable[[str, str], Any] = None) -> str:
+        """
+        Generates a response.
+
+        Args:
+            prompt (str): The input prompt.
+            model_name (str): The model the call was routed by.
+            context (List[Dict[str, str]], optional): Messages sent before the prompt; a leading message
+                tagged {"cache": True} is a stable, cacheable prefix.
+            temperature (float, optional): Sampling temperature; backend default if None.
+            max_tokens (int, optional): Cap on output tokens; backend default if None.
+            on_text (Callable, optional): Streaming callback `on_text(delta, text_so_far)`; stop generating and
+                return the text so far once it returns True.
+
+        Returns:
+            str: The response text.
+        """
+        raise NotImplementedError
+
+    async def aping(self):
+        """Opens a connection ahead of the first call (see `llm_helper.warm_up_clients`); a no-op by default."""
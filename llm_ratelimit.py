@@ -0,0 +1,277 @@
+import re
+import time
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional
+
+# Completion size assumed when reserving tokens for a call without max_tokens
+DEFAULT_COMPLETION_TOKENS = 800
+
+# Conservative per-provider defaults; override with RateLimiterRegistry.configure().
+# None disables a bucket. The adaptive window still backs off on 429s either way.
+DEFAULT_LIMITS = {
+    "perplexity": {"rpm": 50, "tpm": None, "initial_concurrency": 8, "max_concurrency": 32},
+    "google": {"rpm": 60, "tpm": 1_000_000, "initial_concurrency": 8, "max_concurrency": 32},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for TPM accounting."""
+    return max(1, len(text or "") // 4)
+
+
+# Fallback for errors without a status attribute: a standalone 429 or the usual throttling phrases,
+# so ids, token counts or ports that merely contain "429" don't count as throttling
+RATE_LIMIT_MESSAGE = re.compile(r"\b429\b|too many requests|resource_exhausted|rate limit", re.IGNORECASE)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Returns True if a provider exception signals rate limiting (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    for attr in ("status_code", "code", "status"):
+        if getattr(exc, attr, None) in (429, "429", "RESOURCE_EXHAUSTED"):
+            return True
+    if type(exc).__name__ == "RateLimitError":
+        return True
+    return RATE_LIMIT_MESSAGE.search(str(exc)) is not None
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at `rate_per_minute`, holding at most `capacity` tokens."""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity) # an oversized request waits for a full bucket, not forever
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.rate_per_minute
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Corrects a reservation once the real cost is known (may leave the bucket in debt)."""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency window: grows by ~1 slot per window's worth of successes and is
+    multiplied by `decrease_factor` on a rate-limit error (at most once per `cooldown` seconds,
+    so one burst of 429s counts as a single congestion signal).
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 32, decrease_factor: float = 0.5, cooldown: float = 2.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._last_decrease = 0.0
+
+    @property
+    def window(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def on_success(self):
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_rate_limit(self, now: float):
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            self._last_decrease = now
+
+
+class _Permit:
+    """Held for the duration of one provider call; see `RateLimiter.slot`."""
+
+    def __init__(self, limiter: "RateLimiter", reserved_tokens: int):
+        self.limiter = limiter
+        self.reserved_tokens = reserved_tokens
+        self.actual_tokens = None
+
+    def record(self, actual_tokens: int):
+        """Reports the call's real token cost so the TPM bucket can be corrected."""
+        self.actual_tokens = actual_tokens
+
+
+class _Slot:
+    def __init__(self, limiter: "RateLimiter", tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.permit = None
+
+    async def __aenter__(self) -> _Permit:
+        self.permit = await self.limiter.acquire(self.tokens)
+        return self.permit
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter.release(self.permit, exc)
+        return False
+
+
+class RateLimiter:
+    """
+    Limits calls to one provider/model with a requests-per-minute bucket, a tokens-per-minute
+    bucket and an adaptive concurrency window. Thread-safe and usable from any event loop.
+    """
+
+    def __init__(self, name: str, rpm: float = None, tpm: float = None, initial_concurrency: int = 8, max_concurrency: int = 32):
+        """
+        Initializes the limiter.
+
+        Args:
+            name (str): Label used in stats (e.g. 'perplexity/sonar').
+            rpm (float, optional): Requests per minute; None for no request bucket.
+            tpm (float, optional): Tokens per minute; None for no token bucket.
+            initial_concurrency (int): Starting size of the adaptive concurrency window.
+            max_concurrency (int): Upper bound the window can grow to.
+        """
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.window = AdaptiveConcurrency(initial=min(initial_concurrency, max_concurrency), max_limit=max_concurrency)
+        self._lock = threading.Lock()
+        self._waiters: List[tuple] = [] # (loop, future) pairs woken when capacity frees up
+        self._in_flight = 0
+        self._queued = 0
+        self._counters = {"completed": 0, "failed": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    def slot(self, tokens: int) -> _Slot:
+        """Async context manager that acquires capacity for a call of ~`tokens` tokens and releases it afterwards."""
+        return _Slot(self, tokens)
+
+    def _try_acquire(self, tokens: int) -> float:
+        # Returns 0 after taking capacity, otherwise a suggested wait in seconds (caller holds the lock)
+        now = time.monotonic()
+        if self._in_flight >= self.window.window:
+            return 1.0 # woken early by release()
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.token_bucket is not None:
+            self.token_bucket.take(tokens)
+        self._in_flight += 1
+        return 0.0
+
+    async def acquire(self, tokens: int) -> _Permit:
+        """Waits until a call of ~`tokens` tokens fits in the buckets and the concurrency window."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        with self._lock:
+            self._queued += 1
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_acquire(tokens)
+                    if wait == 0:
+                        self._counters["wait_seconds"] += time.monotonic() - started
+                        return _Permit(self, tokens)
+                    waiter = loop.create_future()
+                    self._waiters.append((loop, waiter))
+                try:
+                    await asyncio.wait_for(waiter, timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._lock:
+                        if (loop, waiter) in self._waiters:
+                            self._waiters.remove((loop, waiter))
+        finally:
+            with self._lock:
+                self._queued -= 1
+
+    def release(self, permit: _Permit, exc: BaseException = None):
+        """Returns a permit, feeding the outcome into the adaptive window and the TPM bucket."""
+        with self._lock:
+            self._in_flight -= 1
+            if exc is None:
+                self._counters["completed"] += 1
+                self.window.on_success()
+            elif is_rate_limit_error(exc):
+                self._counters["rate_limited"] += 1
+                self.window.on_rate_limit(time.monotonic())
+            else:
+                self._counters["failed"] += 1
+            if self.token_bucket is not None and permit.actual_tokens is not None:
+                self.token_bucket.adjust(permit.actual_tokens - permit.reserved_tokens)
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the limiter's observable state: queue depth, in-flight calls, window and bucket levels."""
+        with self._lock:
+            now = time.monotonic()
+            if self.requests is not None:
+                self.requests.wait_time(0, now)
+            if self.token_bucket is not None:
+                self.token_bucket.wait_time(0, now)
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "concurrency_window": self.window.window,
+                "requests_available": round(self.requests.tokens, 2) if self.requests is not None else None,
+                "tokens_available": round(self.token_bucket.tokens) if self.token_bucket is not None else None,
+                **self._counters,
+            }
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RateLimiterRegistry:
+    """Process-wide set of limiters, one per (provider, model), configured per provider or per model."""
+
+    def __init__(self, defaults: Dict[str, Dict[str, Any]] = None):
+        self._config: Dict[str, Dict[str, Any]] = {k: dict(v) for k, v in (defaults if defaults is not None else DEFAULT_LIMITS).items()}
+        self._limiters: Dict[tuple, RateLimiter] = {}
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def configure(self, target: str, rpm: float = None, tpm: float = None, initial_concurrency: int = 8, max_concurrency: int = 32):
+        """
+        Sets limits for a provider ('perplexity', 'google') or a specific model ('sonar-pro').
+        Model settings take precedence; existing limiters for the target are rebuilt.
+        """
+        with self._lock:
+            self._config[target] = {"rpm": rpm, "tpm": tpm, "initial_concurrency": initial_concurrency, "max_concurrency": max_concurrency}
+            for key in [k for k in self._limiters if target in k]:
+                del self._limiters[key]
+
+    def get(self, provider: str, model_name: str) -> Optional[RateLimiter]:
+        """Returns the limiter for a provider/model, or None when rate limiting is disabled."""
+        if not self.enabled:
+            return None
+        key = (provider, model_name)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                config = self._config.get(model_name) or self._config.get(provider) or {}
+                limiter = RateLimiter(f"{provider}/{model_name}", **config)
+                self._limiters[key] = limiter
+        return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns `RateLimiter.stats()` for every limiter created so far."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.stats() for limiter in limiters}
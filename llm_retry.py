@@ -0,0 +1,163 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable
+from llm_ratelimit import is_rate_limit_error
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+# Exception class names raised by the openai / google-genai / httpx SDKs for transient failures
+RETRYABLE_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "InternalServerError", "RateLimitError", "ServerError",
+    "ServiceUnavailable", "ConnectError", "ReadTimeout", "WriteTimeout", "PoolTimeout", "RemoteProtocolError",
+}
+
+
+class RetryPolicy:
+    """
+    When and how to retry a failed LLM call: classified retryable errors, exponential
+    backoff with full jitter, a max number of attempts and an overall deadline.
+    """
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0, deadline: float = 300.0,
+                 is_retryable: Callable[[BaseException], bool] = None):
+        """
+        Initializes the policy.
+
+        Args:
+            max_attempts (int): Total attempts including the first one (1 disables retries).
+            base_delay (float): Backoff ceiling for the first retry, in seconds; doubles per attempt.
+            max_delay (float): Upper bound for a single backoff.
+            deadline (float, optional): Give up rather than sleep past this many seconds since the first attempt.
+            is_retryable (Callable, optional): Custom error classifier; defaults to `is_retryable_error`.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.classifier = is_retryable or is_retryable_error
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """Returns True for rate limits, timeouts, connection errors and 5xx responses."""
+    if is_rate_limit_error(exc):
+        return True
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, TimeoutError)):
+        return True
+    if type(exc).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    for attr in ("status_code", "code"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int) and status in RETRYABLE_STATUS_CODES:
+            return True
+    return False
+
+
+async def call_with_retry(attempt_fn: Callable[[], Awaitable[Any]], policy: RetryPolicy, label: str = "LLM call") -> Any:
+    """
+    Awaits `attempt_fn()` until it succeeds, the error is not retryable, attempts run out,
+    or the next backoff would cross the deadline; the last error is re-raised.
+    """
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await attempt_fn()
+        except Exception as e:
+            if attempt >= policy.max_attempts or not policy.classifier(e):
+                raise
+            delay = policy.backoff(attempt)
+            if policy.deadline is not None and time.monotonic() - started + delay > policy.deadline:
+                raise
+            print(f"[RETRY] {label} attempt {attempt}/{policy.max_attempts} failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """Returns the q-quantile (0-1) of recorded latencies, or None with fewer than `min_samples`."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            keys = list(self._samples)
+        return {key: {"samples": len(self._samples[key]), "p50": self.percentile(key, 0.5), "p95": self.percentile(key, 0.95)} for key in keys}
+
+
+class HedgePolicy:
+    """
+    Hedged requests: if a call hasn't returned after the observed p95 latency (or the
+    configured percentile), a duplicate is fired and whichever finishes first wins.
+    """
+
+    def __init__(self, enabled: bool = False, percentile: float = 0.95, min_samples: int = 20, min_delay: float = 0.5):
+        """
+        Initializes the policy.
+
+        Args:
+            enabled (bool): Hedging costs extra calls, so it is off by default.
+            percentile (float): Latency quantile after which the duplicate is sent.
+            min_samples (int): Don't hedge until this many latencies have been observed for the model.
+            min_delay (float): Never hedge earlier than this many seconds.
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+
+async def call_with_hedge(attempt_fn: Callable[[], Awaitable[Any]], policy: HedgePolicy, tracker: LatencyTracker, key: str) -> Any:
+    """
+    Awaits `attempt_fn()`, firing one duplicate if it is slower than the hedge threshold.
+    The first successful result wins and the loser is cancelled; if both fail, the last error is raised.
+    """
+    threshold = tracker.percentile(key, policy.percentile, policy.min_samples) if policy.enabled else None
+    if threshold is None:
+        return await attempt_fn()
+
+    primary = asyncio.ensure_future(attempt_fn())
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=max(threshold, policy.min_delay))
+        if primary in done:
+            return primary.result()
+        print(f"[HEDGE] {key} slower than p{int(policy.percentile * 100)} ({threshold:.1f}s); sending a duplicate request")
+        policy.hedges_sent += 1
+        hedge = asyncio.ensure_future(attempt_fn())
+        pending.add(hedge)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        policy.hedges_won += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
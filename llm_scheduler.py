@@ -0,0 +1,244 @@
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class SchedulerShutdownError(RuntimeError):
+    """Raised when work is submitted to (or still queued in) a scheduler that has been shut down."""
+
+
+class TaskScheduler:
+    """
+    Long-lived executor for LLM calls, meant to be shared by many judges, debaters and debates.
+
+    A fixed set of worker coroutines consumes a bounded queue, so the number of calls in flight
+    is capped process-wide and no workers are created or joined per evaluation. When the queue
+    is full, submitters wait (backpressure) instead of piling up unbounded work.
+
+    Only leaf calls (a single LLM request or argument generation) should be submitted: a task
+    that itself waits on the same scheduler can deadlock it once every worker is busy.
+    """
+
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 256, name: str = "scheduler"):
+        """
+        Initializes the scheduler. Workers start on first use, on the event loop that uses it first
+        (the shared background loop for sync submissions).
+
+        Args:
+            max_concurrency (int): Number of workers, i.e. max calls running at once.
+            max_queue (int): Max calls waiting for a worker; 0 for an unbounded queue.
+            name (str): Label used in logs and stats.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.name = name
+        self._loop = None
+        self._queue = None
+        self._workers: List[asyncio.Task] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._running = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = loop
+                self._queue = None
+                self._workers = []
+            return self._loop
+
+    def _start_workers(self):
+        # Runs on the scheduler's loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def run(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Queues `fn(*args, **kwargs)` and waits for its result.
+
+        Args:
+            fn (Callable): Coroutine function to run on a worker.
+
+        Returns:
+            Any: The coroutine's result; its exception is re-raised. Cancelling the caller
+            cancels the queued or running call.
+        """
+        if self._closed:
+            raise SchedulerShutdownError(f"TaskScheduler '{self.name}' is shut down")
+        running = asyncio.get_running_loop()
+        loop = self._bind(running)
+        if loop is not running:
+            # Bound to another loop (e.g. the background loop): hop over and wait from here
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.run(fn, *args, **kwargs), loop))
+
+        self._start_workers()
+        future = running.create_future()
+        self._counters["submitted"] += 1
+        try:
+            # The caller's context goes along, so context variables (the current tracing span) reach the call
+            await self._queue.put((fn, args, kwargs, future, contextvars.copy_context())) # waits while the queue is full
+            return await future
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def submit(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Thread-safe submission from synchronous code.
+
+        Returns:
+            concurrent.futures.Future: Resolves with the call's result.
+        """
+        if self._loop is None:
+            from llm_helper import get_background_loop
+            self._bind(get_background_loop())
+        return asyncio.run_coroutine_threadsafe(self.run(fn, *args, **kwargs), self._loop)
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                if item is None: # shutdown sentinel
+                    return
+                fn, args, kwargs, future, context = item
+                if future.done(): # caller gave up while queued
+                    self._counters["cancelled"] += 1
+                    continue
+                self._running += 1
+                task = context.run(asyncio.ensure_future, fn(*args, **kwargs))
+                future.add_done_callback(lambda f, task=task: task.cancel() if f.cancelled() else None)
+                try:
+                    await asyncio.wait([task])
+                except asyncio.CancelledError: # worker cancelled by a non-waiting shutdown
+                    task.cancel()
+                    self._counters["cancelled"] += 1
+                    if not future.done():
+                        future.set_exception(SchedulerShutdownError(f"TaskScheduler '{self.name}' shut down during the call"))
+                    raise
+                finally:
+                    self._running -= 1
+                if task.cancelled():
+                    self._counters["cancelled"] += 1
+                    future.cancel()
+                elif task.exception() is not None:
+                    self._counters["failed"] += 1
+                    if not future.done():
+                        future.set_exception(task.exception())
+                else:
+                    self._counters["completed"] += 1
+                    if not future.done():
+                        future.set_result(task.result())
+            finally:
+                self._queue.task_done()
+
+    async def ashutdown(self, wait: bool = True):
+        """
+        Stops accepting work and stops the workers.
+
+        Args:
+            wait (bool): Let queued and running calls finish first; otherwise they are cancelled.
+        """
+        self._closed = True
+        if self._loop is None or self._queue is None:
+            return
+        running = asyncio.get_running_loop()
+        if running is not self._loop:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.ashutdown(wait), self._loop))
+            return
+        if not wait:
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None and not item[3].done():
+                    item[3].set_exception(SchedulerShutdownError(f"TaskScheduler '{self.name}' shut down before the call started"))
+                    self._counters["cancelled"] += 1
+                self._queue.task_done()
+            for worker in self._workers:
+                worker.cancel()
+        else:
+            for _ in self._workers:
+                await self._queue.put(None)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def shutdown(self, wait: bool = True):
+        """Blocking wrapper around `ashutdown`; call it from synchronous code."""
+        self._closed = True
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("shutdown() cannot be called from the scheduler's loop; await ashutdown() instead.")
+        asyncio.run_coroutine_threadsafe(self.ashutdown(wait), loop).result()
+
+    def __enter__(self) -> "TaskScheduler":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=exc_type is None)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns queue depth, running calls and completion counters."""
+        return {
+            "name": self.name,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "closed": self._closed,
+            **self._counters,
+        }
+
+
+async def run_scheduled(scheduler: TaskScheduler, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """Awaits `fn(*args, **kwargs)` through `scheduler`, or directly when no scheduler is set."""
+    if scheduler is None:
+        return await fn(*args, **kwargs)
+    return await scheduler.run(fn, *args, **kwargs)
+
+
+# --- Process-wide default scheduler ---
+_default_lock = threading.Lock()
+_default_scheduler = None
+
+
+def get_default_scheduler() -> TaskScheduler:
+    """Returns the process-wide scheduler, creating it on first use."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None or _default_scheduler.closed:
+            _default_scheduler = TaskScheduler(name="default")
+        return _default_scheduler
+
+
+def configure_scheduler(max_concurrency: int = 16, max_queue: int = 256) -> TaskScheduler:
+    """
+    Replaces the process-wide scheduler, letting the previous one finish its queued work.
+
+    Args:
+        max_concurrency (int): Max LLM calls running at once across every debate using it.
+        max_queue (int): Max calls waiting for a worker before submitters block.
+
+    Returns:
+        TaskScheduler: The new default scheduler.
+    """
+    global _default_scheduler
+    with _default_lock:
+        previous, _default_scheduler = _default_scheduler, TaskScheduler(max_concurrency, max_queue, name="default")
+    if previous is not None:
+        previous.shutdown(wait=True)
+    return _default_scheduler
@@ -0,0 +1,285 @@
+import json
+import time
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+# Span kinds that make up the time of a debate (see `Tracer.report`)
+GENERATION_KINDS = ("generate", "improve")
+JUDGING_KINDS = ("evaluate", "declare_winner")
+# Container spans; the caller of an LLM call is the path of spans below them
+CONTAINER_KINDS = ("debate", "round")
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation: a debate, a round, a graph task, a judge layer or an LLM call."""
+
+    def __init__(self, span_id: int, name: str, kind: str, parent: "Span" = None, attributes: Dict[str, Any] = None):
+        self.span_id = span_id
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start = time.monotonic()
+        self.end: float = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **counts):
+        """Adds to numeric attributes (token counts of several attempts, ...)."""
+        for key, value in counts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def caller(self) -> str:
+        """Names of the enclosing spans below the debate/round, outermost first (e.g. 'evaluate_A_2/layer Logic')."""
+        names = []
+        span = self.parent
+        while span is not None and span.kind not in CONTAINER_KINDS:
+            names.append(span.name)
+            span = span.parent
+        return "/".join(reversed(names))
+
+    def debate(self) -> "Span":
+        span = self
+        while span is not None and span.kind != "debate":
+            span = span.parent
+        return span
+
+
+class Tracer:
+    """
+    Collects spans for debates, rounds, graph tasks and LLM calls.
+
+    Spans nest through a context variable, so the current span follows asyncio tasks: a span
+    opened around `DebateEngine.run` is the parent of every task it starts, and an LLM call
+    made inside a task is its child. Disabled by default; `span` is then a no-op yielding None.
+    Finished spans export to JSON lines or to a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._origin = time.monotonic()
+        self.spans: List[Span] = []
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def reset(self):
+        """Drops the finished spans and restarts the trace clock."""
+        with self._lock:
+            self.spans = []
+            self._origin = time.monotonic()
+
+    def current(self) -> Span:
+        return _current_span.get() if self.enabled else None
+
+    def start_span(self, name: str, kind: str = "local", parent: Span = None, **attributes) -> Span:
+        """Starts a span without making it current (for spans whose extent is known only later, like rounds)."""
+        if not self.enabled:
+            return None
+        return Span(next(self._ids), name, kind, parent or _current_span.get(), attributes)
+
+    def finish(self, span: Span, end: float = None):
+        if span is None:
+            return
+        span.end = end if end is not None else time.monotonic()
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "local", parent: Span = None, **attributes) -> Iterator[Span]:
+        """
+        Times the enclosed block as a span, current for everything started inside it.
+
+        Args:
+            name (str): Span name (task name, 'llm', ...).
+            kind (str): 'debate', 'round', a graph task kind, 'judge_layer', 'llm', ...
+            parent (Span, optional): Parent span; defaults to the current span.
+            **attributes: Initial attributes.
+
+        Yields:
+            Span: The span (None when tracing is disabled). An exception is recorded as its 'error' attribute.
+        """
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, kind, parent, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def annotate(self, **attributes):
+        """Sets attributes on the current span, if any."""
+        span = self.current()
+        if span is not None:
+            span.set(**attributes)
+
+    def add(self, **counts):
+        """Adds to numeric attributes of the current span, if any."""
+        span = self.current()
+        if span is not None:
+            span.add(**counts)
+
+    # --- Export ---
+    def _finished(self) -> List[Span]:
+        with self._lock:
+            return sorted(self.spans, key=lambda span: (span.start, -span.end))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Finished spans as dicts, times in seconds since the trace started."""
+        return [{
+            "id": span.span_id,
+            "parent": span.parent.span_id if span.parent else None,
+            "name": span.name,
+            "kind": span.kind,
+            "start": round(span.start - self._origin, 6),
+            "duration": round(span.end - span.start, 6),
+            **({"caller": span.caller()} if span.kind == "llm" else {}),
+            "attributes": span.attributes,
+        } for span in self._finished()]
+
+    def export_jsonl(self, path: str):
+        """Writes one JSON line per finished span."""
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.to_records():
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def export_chrome_trace(self, path: str):
+        """
+        Writes the spans in Chrome trace-event format: one process per debate, and within it
+        as many threads as are needed to lay overlapping spans out without breaking nesting.
+        """
+        processes: Dict[int, List[List[float]]] = {} # pid -> open end times per lane
+        debates: Dict[int, int] = {}
+        events = []
+        for span in self._finished():
+            debate = span.debate()
+            pid = debates.setdefault(debate.span_id if debate else 0, len(debates) + 1)
+            if pid not in processes:
+                events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": debate.name if debate else "outside debates"}})
+                processes[pid] = []
+            lanes = processes[pid]
+            for lane, stack in enumerate(lanes): # first lane where the span starts after or nests inside the open ones
+                while stack and stack[-1] <= span.start:
+                    stack.pop()
+                if not stack or stack[-1] >= span.end:
+                    break
+            else:
+                lanes.append([])
+                lane, stack = len(lanes) - 1, lanes[-1]
+            stack.append(span.end)
+            args = dict(span.attributes, **({"caller": span.caller()} if span.kind == "llm" else {}))
+            events.append({"name": span.name, "cat": span.kind, "ph": "X", "pid": pid, "tid": lane,
+                           "ts": round((span.start - self._origin) * 1e6), "dur": round((span.end - span.start) * 1e6),
+                           "args": {key: str(value) if not isinstance(value, (int, float, bool)) else value for key, value in args.items()}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    # --- Analysis ---
+    def report(self) -> List[Dict[str, Any]]:
+        """
+        Summarizes each finished debate.
+
+        The critical path is walked back from the task that finished last, each time to the
+        dependency that finished last; its time is split into generation (generate, improve),
+        judging (evaluate, declare_winner), other task kinds (distill, local bookkeeping), and
+        waiting (gaps between a dependency finishing and the next task starting, e.g. for a
+        concurrency slot). Concurrency is the mean number of LLM calls in flight over the debate.
+
+        Returns:
+            List[Dict[str, Any]]: One summary per debate.
+        """
+        spans = self._finished()
+        children: Dict[int, List[Span]] = {}
+        for span in spans:
+            if span.parent is not None:
+                children.setdefault(span.parent.span_id, []).append(span)
+        summaries = []
+        for debate in (span for span in spans if span.kind == "debate"):
+            below = self._descendants(debate, children)
+            tasks = {span.name: span for span in below if "dependencies" in span.attributes}
+            calls = [span for span in below if span.kind == "llm"]
+            path = self._critical_path(tasks)
+            split = {"generation": 0.0, "judging": 0.0, "other": 0.0, "waiting": 0.0}
+            previous_end = debate.start
+            for task in path:
+                split["waiting"] += max(0.0, task.start - previous_end)
+                group = "generation" if task.kind in GENERATION_KINDS else "judging" if task.kind in JUDGING_KINDS else "other"
+                split[group] += task.duration
+                previous_end = task.end
+            split["waiting"] += max(0.0, debate.end - previous_end)
+            summaries.append({
+                "debate": debate.name,
+                "wall_seconds": round(debate.duration, 3),
+                "critical_path": [task.name for task in path],
+                "critical_path_seconds": {key: round(value, 3) for key, value in split.items()},
+                "llm_calls": len(calls),
+                "llm_seconds": round(sum(call.duration for call in calls), 3),
+                "mean_concurrency": round(sum(call.duration for call in calls) / debate.duration, 2) if debate.duration > 0 else 0.0,
+                "peak_concurrency": self._peak(calls),
+                "retries": sum(call.attributes.get("retries", 0) for call in calls),
+                "cache_hits": sum(1 for call in calls if call.attributes.get("cache_hit")),
+                "prompt_tokens": sum(call.attributes.get("prompt_tokens", 0) for call in calls),
+                "completion_tokens": sum(call.attributes.get("completion_tokens", 0) for call in calls),
+            })
+        return summaries
+
+    @staticmethod
+    def _descendants(root: Span, children: Dict[int, List[Span]]) -> List[Span]:
+        found, stack = [], [root]
+        while stack:
+            for child in children.get(stack.pop().span_id, ()):
+                found.append(child)
+                stack.append(child)
+        return found
+
+    @staticmethod
+    def _critical_path(tasks: Dict[str, Span]) -> List[Span]:
+        if not tasks:
+            return []
+        path = [max(tasks.values(), key=lambda task: task.end)]
+        while True:
+            dependencies = [tasks[name] for name in path[-1].attributes["dependencies"] if name in tasks]
+            if not dependencies:
+                return list(reversed(path))
+            path.append(max(dependencies, key=lambda task: task.end))
+
+    @staticmethod
+    def _peak(calls: List[Span]) -> int:
+        edges = sorted([(call.start, 1) for call in calls] + [(call.end, -1) for call in calls])
+        peak = running = 0
+        for _, delta in edges:
+            running += delta
+            peak = max(peak, running)
+        return peak
+
+    def format_report(self) -> str:
+        """The `report` as a text table."""
+        lines = [f"{'debate':<40} {'wall':>7} {'generate':>9} {'judge':>7} {'other':>7} {'wait':>7} {'calls':>6} {'conc':>5} {'peak':>5} {'retry':>5} {'hits':>5}"]
+        for summary in self.report():
+            split = summary["critical_path_seconds"]
+            lines.append(f"{summary['debate'][:40]:<40} {summary['wall_seconds']:>6.2f}s {split['generation']:>8.2f}s {split['judging']:>6.2f}s "
+                         f"{split['other']:>6.2f}s {split['waiting']:>6.2f}s {summary['llm_calls']:>6} {summary['mean_concurrency']:>5.1f} "
+                         f"{summary['peak_concurrency']:>5} {summary['retries']:>5} {summary['cache_hits']:>5}")
+        return "\n".join(lines)
+
+
+# Process-wide tracer; enable it with llm_helper.configure_tracing
+tracer = Tracer()
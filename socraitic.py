@@ -0,0 +1,420 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import itertools
+import threading
+import contextlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set
+import yaml
+import llm_helper
+from llm_prompt_cache import usage_tracker
+from DebaterAgent import DebaterAgent
+from JudgeAgent import JudgeAgent
+from DebateEngine import DebateEngine
+from ResultsStore import ResultsStore, debate_record
+from debate_config import ORCHESTRATORS, JUDGE_MODES, SCHEDULES
+
+# Batch experiment runner: `python -m socraitic run sweep.yaml`.
+#
+# A sweep file declares a grid of topics, agents, judges and round counts (see
+# sweep_example.yaml). Every cell of the grid is one debate; debates run concurrently, at most
+# `parallelism` at a time, while a live line shows debates/min, LLM calls/min and the ETA. Each
+# finished debate goes to the results store within seconds, and debates already in it are
+# skipped, so an interrupted sweep is continued by running it again. `export` writes the
+# stored results as one row per debate (CSV/XLSX) or as Parquet tables.
+#
+# Sweep keys:
+#   name            Sweep name, stored with every result.
+#   topics          Strings, or {topic, for, against} mappings with explicit stances.
+#   agents          {name, model, system_prompt, [stance], other DebaterAgent options}; the first
+#                   agent of a pair argues for the topic and the second against it.
+#   pairs           [[name, name], ...] to debate; defaults to every pair of agents.
+#   swap_sides      Also run every pair with sides swapped.
+#   judges          Judge mode names (layered, comprehensive, structured, pairwise) or
+#                   {mode, [model], [name], other JudgeAgent options}.
+#   judge_model     Default judge model.
+#   rounds          Round count, or a list of them.
+#   repeats         Debates per grid cell.
+#   orchestrator    'debate' or 'self_improving', or a list of both.
+#   schedule        'sequential' or 'pipelined'.
+#   declare_winner  Ask the judge for a final verdict.
+#   parallelism     Debates running at once.
+#   max_concurrent_steps  Cap on LLM steps in flight across all debates (DebateEngine).
+#   results         Results file: a SQLite ResultsStore, or JSON lines if it ends in .jsonl.
+#   llm             {cache: path or false, fake: configure_local_backend options}.
+
+DEFAULT_RESULTS_PATH = "sweep_results.sqlite"
+SWEEP_DEFAULTS = {
+    "name": "sweep",
+    "pairs": None,
+    "swap_sides": False,
+    "judges": ["layered"],
+    "judge_model": "sonar",
+    "rounds": 3,
+    "repeats": 1,
+    "orchestrator": "debate",
+    "schedule": "pipelined",
+    "declare_winner": False,
+    "parallelism": 4,
+    "max_concurrent_steps": None,
+    "results": DEFAULT_RESULTS_PATH,
+    "llm": {},
+}
+
+
+def _as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def load_sweep(path: str) -> Dict[str, Any]:
+    """
+    Reads and validates a sweep file.
+
+    Args:
+        path (str): YAML sweep file.
+
+    Returns:
+        Dict[str, Any]: The sweep with defaults filled in and judges normalized to dicts.
+
+    Raises:
+        ValueError: If the sweep is missing topics or agents, or names an unknown agent, judge mode,
+            orchestrator or schedule.
+    """
+    with open(path, encoding="utf-8") as f:
+        sweep = dict(SWEEP_DEFAULTS, **(yaml.safe_load(f) or {}))
+    if not sweep.get("topics"):
+        raise ValueError(f"{path}: no topics")
+    if not sweep.get("agents") or len(sweep["agents"]) < 2:
+        raise ValueError(f"{path}: at least two agents are needed")
+    names = [agent.get("name") for agent in sweep["agents"]]
+    if None in names or len(set(names)) != len(names):
+        raise ValueError(f"{path}: every agent needs a unique name")
+    for agent in sweep["agents"]:
+        if "model" not in agent:
+            raise ValueError(f"{path}: agent {agent['name']} has no model")
+    for pair in sweep["pairs"] or []:
+        if len(pair) != 2 or any(name not in names for name in pair):
+            raise ValueError(f"{path}: bad pair {pair}")
+    judges = []
+    for judge in _as_list(sweep["judges"]):
+        judge = {"mode": judge} if isinstance(judge, str) else dict(judge)
+        judge.setdefault("mode", "layered")
+        if judge["mode"] not in JUDGE_MODES:
+            raise ValueError(f"{path}: unknown judge mode {judge['mode']} (expected one of {', '.join(JUDGE_MODES)})")
+        judge.setdefault("model", sweep["judge_model"])
+        judges.append(judge)
+    sweep["judges"] = judges
+    for orchestrator in _as_list(sweep["orchestrator"]):
+        if orchestrator not in ORCHESTRATORS:
+            raise ValueError(f"{path}: unknown orchestrator {orchestrator}")
+    if sweep["schedule"] not in SCHEDULES:
+        raise ValueError(f"{path}: unknown schedule {sweep['schedule']}")
+    return sweep
+
+
+def _topic_sides(topic: Any) -> Dict[str, str]:
+    if isinstance(topic, str):
+        return {"topic": topic, "for": f"In favour of: {topic}", "against": f"Against: {topic}"}
+    return {"topic": topic["topic"], "for": topic.get("for") or f"In favour of: {topic['topic']}",
+            "against": topic.get("against") or f"Against: {topic['topic']}"}
+
+
+def _job_id(job: Dict[str, Any]) -> str:
+    # Content hash of everything that defines the debate, so edited prompts or settings make new jobs
+    return hashlib.sha256(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def expand_grid(sweep: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Lists the debates of a sweep: topics x agent pairs x judges x round counts x orchestrators x repeats.
+
+    Returns:
+        List[Dict[str, Any]]: One job per debate, each with a stable 'id'.
+    """
+    agents = {agent["name"]: agent for agent in sweep["agents"]}
+    pairs = [tuple(pair) for pair in sweep["pairs"]] if sweep["pairs"] else list(itertools.combinations(agents, 2))
+    if sweep["swap_sides"]:
+        pairs += [(b, a) for a, b in pairs]
+    jobs = []
+    for topic, (a, b), judge, rounds, orchestrator, repeat in itertools.product(
+            [_topic_sides(topic) for topic in sweep["topics"]], pairs, sweep["judges"], _as_list(sweep["rounds"]),
+            _as_list(sweep["orchestrator"]), range(sweep["repeats"])):
+        job = {"topic": topic, "debater_a": agents[a], "debater_b": agents[b], "judge": judge, "rounds": rounds,
+               "orchestrator": orchestrator, "schedule": sweep["schedule"], "declare_winner": sweep["declare_winner"],
+               "repeat": repeat}
+        jobs.append(dict(job, id=_job_id(job)))
+    return jobs
+
+
+def _build_debater(spec: Dict[str, Any], default_stance: str) -> DebaterAgent:
+    options = {key: value for key, value in spec.items() if key not in ("name", "model", "system_prompt", "stance")}
+    return DebaterAgent(spec["name"], spec["model"], spec.get("stance") or default_stance,
+                        spec.get("system_prompt", "You are a skilled debater."), **options)
+
+
+def build_orchestrator(job: Dict[str, Any], engine: DebateEngine):
+    """Builds the agents, judge and orchestrator of one job."""
+    topic = job["topic"]
+    settings = dict(JUDGE_MODES[job["judge"]["mode"]])
+    pairwise = settings.pop("pairwise_judging", False)
+    settings.update({key: value for key, value in job["judge"].items() if key not in ("mode", "model", "name")})
+    judge = JudgeAgent(job["judge"].get("name", f"{job['judge']['mode']} judge"), job["judge"]["model"], **settings)
+    return ORCHESTRATORS[job["orchestrator"]](
+        _build_debater(job["debater_a"], topic["for"]), _build_debater(job["debater_b"], topic["against"]), judge,
+        topic["topic"], pipelined=job["schedule"] == "pipelined", engine=engine, pairwise_judging=pairwise)
+
+
+class JsonlResults:
+    """Results file with one JSON record per debate (see `ResultsStore.append`), appended as each debate finishes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def done_ids(self) -> Set[str]:
+        """Ids of the debates already stored without an error."""
+        done = set()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError: # torn last line of an interrupted run
+                        continue
+                    if not record.get("error"):
+                        done.add(record["id"])
+        except FileNotFoundError:
+            pass
+        return done
+
+    def append(self, record: Dict[str, Any]):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_results(path: str):
+    """Opens a results file: JSON lines for '.jsonl' paths, a `ResultsStore` otherwise."""
+    return JsonlResults(path) if path.endswith(".jsonl") else ResultsStore(path)
+
+
+class SweepProgress:
+    """Live sweep status on stderr: a line redrawn in place on a terminal, a periodic log line otherwise."""
+
+    def __init__(self, total: int, stream=None, interval: float = None):
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.live = self.stream.isatty()
+        self.interval = interval if interval is not None else (1.0 if self.live else 30.0)
+        self.finished = 0
+        self.failed = 0
+        self.running = 0
+        self.started = time.monotonic()
+        self._calls_at_start = usage_tracker.stats()["total"]["calls"]
+
+    def status(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        calls = usage_tracker.stats()["total"]["calls"] - self._calls_at_start
+        done = self.finished + self.failed
+        eta = _format_seconds(elapsed / done * (self.total - done)) if done else "?"
+        return (f"[SWEEP] {done}/{self.total} debates ({self.failed} failed, {self.running} running) | "
+                f"{self.finished * 60 / elapsed:.1f} debates/min, {calls * 60 / elapsed:.0f} calls/min | "
+                f"elapsed {_format_seconds(elapsed)}, ETA {eta}")
+
+    def show(self):
+        if self.live:
+            self.stream.write("\r\033[K" + self.status())
+        else:
+            self.stream.write(self.status() + "\n")
+        self.stream.flush()
+
+    def log(self, message: str):
+        """Prints a message above the live line."""
+        self.stream.write(("\r\033[K" if self.live else "") + message + "\n")
+        if self.live:
+            self.show()
+        self.stream.flush()
+
+    async def refresh(self):
+        while True:
+            self.show()
+            await asyncio.sleep(self.interval)
+
+    def close(self):
+        self.show()
+        if self.live:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m" if seconds >= 3600 else f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+async def _run_job(job: Dict[str, Any], sweep_name: str, engine: DebateEngine, semaphore: asyncio.Semaphore,
+                   results: ResultsStore, progress: SweepProgress):
+    async with semaphore:
+        progress.running += 1
+        started = time.monotonic()
+        fields = {"id": job["id"], "sweep": sweep_name, "orchestrator": job["orchestrator"], "rounds": job["rounds"],
+                  "judge": {"name": job["judge"].get("name", f"{job['judge']['mode']} judge"), "model": job["judge"]["model"],
+                            "mode": job["judge"]["mode"]},
+                  "config": job}
+        try:
+            orchestrator = build_orchestrator(job, engine)
+            await orchestrator.arun_debate(job["rounds"], declare_winner=job["declare_winner"])
+            record = debate_record(orchestrator, **fields)
+            progress.finished += 1
+        except Exception as e:
+            record = dict(fields, timestamp=datetime.now().isoformat(), topic=job["topic"]["topic"],
+                          debater_a={"name": job["debater_a"]["name"], "model": job["debater_a"]["model"]},
+                          debater_b={"name": job["debater_b"]["name"], "model": job["debater_b"]["model"]},
+                          error=f"{type(e).__name__}: {e}")
+            progress.failed += 1
+            progress.log(f"[SWEEP] {job['id']} ({job['debater_a']['name']} vs {job['debater_b']['name']}) failed: {record['error']}")
+        finally:
+            progress.running -= 1
+        record["seconds"] = round(time.monotonic() - started, 3)
+        # Appending can flush a batch to disk: do it off the event loop, and don't let a storage
+        # error abort the sweep while other debates are still running
+        try:
+            await asyncio.to_thread(results.append, record)
+        except Exception as e:
+            progress.log(f"[SWEEP] Storing {job['id']} failed: {type(e).__name__}: {e}")
+
+
+async def _flush_periodically(results: ResultsStore, interval: float, progress: SweepProgress):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(results.flush)
+        except Exception as e: # the batch stays buffered for the next flush
+            progress.log(f"[SWEEP] Flushing results failed: {type(e).__name__}: {e}")
+
+
+async def arun_sweep(sweep: Dict[str, Any], results: ResultsStore, parallelism: int = None, jobs: List[Dict[str, Any]] = None,
+                     progress_stream=None) -> Dict[str, int]:
+    """
+    Runs the debates of a sweep that aren't in `results` yet, streaming each one into it as it finishes.
+
+    Args:
+        sweep (Dict[str, Any]): A sweep from `load_sweep`.
+        results (ResultsStore | JsonlResults): Store the debates are appended to.
+        parallelism (int, optional): Debates running at once; defaults to the sweep's `parallelism`.
+        jobs (List[Dict[str, Any]], optional): Jobs to run; defaults to `expand_grid(sweep)`.
+        progress_stream (optional): Stream for the progress display; defaults to stderr.
+
+    Returns:
+        Dict[str, int]: Counts of 'total', 'skipped' (already stored), 'finished' and 'failed' debates.
+    """
+    jobs = expand_grid(sweep) if jobs is None else jobs
+    done = results.done_ids()
+    pending = [job for job in jobs if job["id"] not in done]
+    engine = DebateEngine(sweep["max_concurrent_steps"])
+    semaphore = asyncio.Semaphore(parallelism or sweep["parallelism"])
+    progress = SweepProgress(len(pending), progress_stream)
+    if len(pending) < len(jobs):
+        progress.log(f"[SWEEP] Skipping {len(jobs) - len(pending)} debates already in the results.")
+    refresher = asyncio.ensure_future(progress.refresh())
+    flusher = asyncio.ensure_future(_flush_periodically(results, getattr(results, "flush_seconds", 5.0), progress))
+    try:
+        await asyncio.gather(*[_run_job(job, sweep["name"], engine, semaphore, results, progress) for job in pending])
+    finally:
+        refresher.cancel()
+        flusher.cancel()
+        try:
+            await asyncio.to_thread(results.flush)
+        finally:
+            progress.close()
+    return {"total": len(jobs), "skipped": len(jobs) - len(pending), "finished": progress.finished, "failed": progress.failed}
+
+
+def configure_llm(settings: Dict[str, Any]):
+    """Applies a sweep's `llm` settings: the response cache and the offline fake backend."""
+    if "cache" in settings:
+        llm_helper.configure_cache(settings["cache"], enabled=bool(settings["cache"]))
+    if settings.get("fake") is not None:
+        llm_helper.configure_local_backend(**settings["fake"])
+
+
+def _command_run(args: argparse.Namespace):
+    sweep = load_sweep(args.sweep)
+    jobs = expand_grid(sweep)
+    if args.dry_run:
+        for job in jobs:
+            print(f"{job['id']}  {job['debater_a']['name']} vs {job['debater_b']['name']} | {job['topic']['topic'][:50]} | "
+                  f"{job['judge']['mode']} judge, {job['rounds']} rounds, {job['orchestrator']} #{job['repeat']}")
+        print(f"{len(jobs)} debates")
+        return
+    configure_llm(sweep["llm"])
+    results = open_results(args.results or sweep["results"])
+    # The agents log every step; keep that off the terminal so the progress line stays readable
+    log = open(args.log, "a", encoding="utf-8") if args.log else open(os.devnull, "w") if not args.verbose else None
+    try:
+        with contextlib.redirect_stdout(log) if log else contextlib.nullcontext():
+            counts = llm_helper.run_sync(arun_sweep(sweep, results, args.parallelism, jobs))
+    finally:
+        results.close()
+        if log:
+            log.close()
+    print(f"[SWEEP] {counts['finished']} debates finished, {counts['failed']} failed, {counts['skipped']} already done; "
+          f"results in {results.path}")
+
+
+def _command_export(args: argparse.Namespace):
+    if args.results.endswith(".jsonl"): # an earlier JSON-lines sweep: load it into a throwaway store first
+        store = ResultsStore(":memory:")
+        store.import_jsonl(args.results)
+    else:
+        store = ResultsStore(args.results)
+    filters = {key: getattr(args, key) for key in ("sweep", "topic", "debater", "model")}
+    try:
+        if args.output.endswith(".parquet") or args.parquet:
+            for path in store.export_parquet(args.output, **filters):
+                print(f"[RESULTS] Wrote {path}")
+        else:
+            store.export_wide(args.output, **filters)
+    except ImportError as e: # optional export dependency missing
+        raise SystemExit(f"[RESULTS] {e}")
+    finally:
+        store.close()
+
+
+def main(argv: Iterable[str] = None):
+    parser = argparse.ArgumentParser(prog="python -m socraitic", description="Run batches of debates.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run every debate of a sweep file.")
+    run.add_argument("sweep", help="YAML sweep file.")
+    run.add_argument("--parallelism", type=int, help="Debates running at once (overrides the sweep).")
+    run.add_argument("--results", help="Results file (overrides the sweep).")
+    run.add_argument("--log", help="Append the agents' output to this file instead of discarding it.")
+    run.add_argument("--verbose", action="store_true", help="Show the agents' output.")
+    run.add_argument("--dry-run", action="store_true", help="List the debates without running them.")
+    run.set_defaults(handler=_command_run)
+    export = commands.add_parser("export", help="Export stored results as one row per debate, or as Parquet tables.")
+    export.add_argument("results", help="Results store (SQLite, or a .jsonl results file).")
+    export.add_argument("output", help="Output .csv or .xlsx file, or a directory for --parquet.")
+    export.add_argument("--parquet", action="store_true", help="Write the long-format tables as Parquet files (needs pyarrow).")
+    export.add_argument("--sweep", help="Only this sweep's debates.")
+    export.add_argument("--topic", help="Only debates on this topic.")
+    export.add_argument("--debater", help="Only debates with this debater.")
+    export.add_argument("--model", help="Only debates with a debater on this model.")
+    export.set_defaults(handler=_command_export)
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
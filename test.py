@@ -2,78 +2,30 @@ from DebaterAgent import DebaterAgent
 from DebateOrchestrator import DebateOrchestrator
 from SelfImprovingDebateOrchestrator import SelfImprovingDebateOrchestrator
 from JudgeAgent import JudgeAgent
-import csv
-import os
-from datetime import datetime
-
-def write_debate_to_csv(history, topic, debater_a_name, debater_b_name, final_judgement, final_scores, filename="debate_log.csv"):
-    """Appends a completed debate run as a single row to a CSV file."""
-
-    # --- Define CSV Headers ---
-    # Adjust headers based on the number of rounds and desired scores
-    max_rounds = max(turn['round'] for turn in history) if history else 0
-    headers = ['timestamp', 'topic', 'debater_a', 'debater_b']
-    for i in range(1, max_rounds + 1):
-        headers.extend([
-            f'round_{i}_A_arg', f'round_{i}_A_feedback',
-            f'round_{i}_A_score_logic', f'round_{i}_A_score_evidence', f'round_{i}_A_score_rhetoric', f'round_{i}_A_score_belief', # Add more scores if needed
-            f'round_{i}_B_arg', f'round_{i}_B_feedback',
-            f'round_{i}_B_score_logic', f'round_{i}_B_score_evidence', f'round_{i}_B_score_rhetoric', f'round_{i}_B_score_belief', # Add more scores if needed
-        ])
-    headers.extend(['final_judgement', 'final_score_A', 'final_score_B']) # Adjust final score headers as needed
-
-    # --- Prepare Data Row ---
-    row_data = {'timestamp': datetime.now().isoformat(), 'topic': topic, 'debater_a': debater_a_name, 'debater_b': debater_b_name}
-
-    for i in range(1, max_rounds + 1):
-        # Find data for round i, debater A
-        turn_a = next((t for t in history if t['round'] == i and t['debater'] == debater_a_name), None)
-        if turn_a:
-            row_data[f'round_{i}_A_arg'] = turn_a.get('argument', '')
-            row_data[f'round_{i}_A_feedback'] = turn_a.get('feedback', '')
-            row_data[f'round_{i}_A_score_logic'] = turn_a.get('scores', {}).get('logic', '')
-            row_data[f'round_{i}_A_score_evidence'] = turn_a.get('scores', {}).get('factual', '')  # Updated to match JudgeAgent scores
-            row_data[f'round_{i}_A_score_rhetoric'] = turn_a.get('scores', {}).get('persuasive', '') # Updated to match JudgeAgent scores
-            row_data[f'round_{i}_A_score_belief'] = turn_a.get('scores', {}).get('belief', '') # Updated to match JudgeAgent scores
-        else: # Fill blanks if turn data missing
-             for key in ['arg', 'feedback', 'score_logic', 'score_evidence', 'score_rhetoric']:
-                 row_data[f'round_{i}_A_{key}'] = ''
-
-
-        # Find data for round i, debater B
-        turn_b = next((t for t in history if t['round'] == i and t['debater'] == debater_b_name), None)
-        if turn_b:
-            row_data[f'round_{i}_B_arg'] = turn_b.get('argument', '')
-            row_data[f'round_{i}_B_feedback'] = turn_b.get('feedback', '')
-            row_data[f'round_{i}_B_score_logic'] = turn_b.get('scores', {}).get('logic', '')
-            row_data[f'round_{i}_B_score_evidence'] = turn_b.get('scores', {}).get('factual', '')  # Updated to match JudgeAgent scores
-            row_data[f'round_{i}_B_score_rhetoric'] = turn_b.get('scores', {}).get('persuasive', '') # Updated to match JudgeAgent scores
-            row_data[f'round_{i}_B_score_belief'] = turn_a.get('scores', {}).get('belief', '') # Updated to match JudgeAgent scores
-        else: # Fill blanks if turn data missing
-             for key in ['arg', 'feedback', 'score_logic', 'score_evidence', 'score_rhetoric']:
-                 row_data[f'round_{i}_B_{key}'] = ''
-
-    # # Add final judgement and scores
-    # row_data['final_judgement'] = final_judgement
-    # # Adapt how final scores are stored based on how declare_winner returns them
-    # row_data['final_score_A'] = final_scores.get(debater_a_name, '') if isinstance(final_scores, dict) else ''
-    # row_data['final_score_B'] = final_scores.get(debater_b_name, '') if isinstance(final_scores, dict) else ''
-
-    # --- Write to CSV ---
-    file_exists = os.path.isfile(filename)
+from ResultsStore import ResultsStore
+from Tournament import match_score
+
+def write_debate_to_csv(history, topic, debater_a_name, debater_b_name, final_judgement, final_scores, filename="debate_log.csv",
+                        store_path="debate_results.sqlite"):
+    """
+    Stores a completed debate in the results store and re-exports the store to `filename`,
+    one row per debate. The CSV is regenerated rather than appended to, so its columns always
+    cover the longest stored debate.
+    """
+    record = {
+        "topic": topic,
+        "debater_a": {"name": debater_a_name},
+        "debater_b": {"name": debater_b_name},
+        "history": history,
+        "final_judgement": final_judgement or None,
+        "scores": final_scores or {debater_a_name: match_score(history, debater_a_name), debater_b_name: match_score(history, debater_b_name)},
+    }
     try:
-        with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            if not file_exists:
-                writer.writeheader() # Write header only if file is new
-            # Ensure all header fields exist in row_data, filling missing ones with empty strings
-            row_to_write = {header: row_data.get(header, '') for header in headers}
-            writer.writerow(row_to_write)
-        print(f"Debate results appended to {filename}")
-    except IOError as e:
-        print(f"Error writing to CSV file {filename}: {e}")
+        with ResultsStore(store_path) as store:
+            store.append(record)
+            store.export_wide(filename)
     except Exception as e:
-         print(f"An unexpected error occurred during CSV writing: {e}")
+        print(f"Error storing the debate results in {store_path} / {filename}: {e}")
 
 if __name__ == "__main__":
     # Configure your agents (replace with desired models and prompts)
@@ -1,122 +1,30 @@
 from DebaterAgent import DebaterAgent
 from SelfImprovingDebateOrchestrator import SelfImprovingDebateOrchestrator
 from JudgeAgent import JudgeAgent
-import csv
-import os
-from datetime import datetime
+from ResultsStore import ResultsStore
+from Tournament import match_score
 
-def write_self_improving_debate_to_csv(history, topic, debater_a_name, debater_b_name, filename="debate_results_log.csv"):
+def write_self_improving_debate_to_csv(history, topic, debater_a_name, debater_b_name, filename="debate_results_log.csv",
+                                       store_path="debate_results_improve.sqlite"):
     """
-    Appends a completed self-improving debate run as a single row to a CSV file.
-    Includes both original and improved arguments for each debater in each round.
+    Stores a completed self-improving debate in the results store and re-exports the store to
+    `filename`, one row per debate with both the original and improved arguments of each round.
     """
-
-    # --- Define CSV Headers ---
-    # Headers need to include both original and improved arguments
-    max_rounds = max(turn['round'] for turn in history) if history else 0
-    headers = ['timestamp', 'topic', 'debater_a', 'debater_b']
-    
-    for i in range(1, max_rounds + 1):
-        headers.extend([
-            # Debater A - round i
-            f'round_{i}_A_original_arg', 
-            f'round_{i}_A_original_score_logic',
-            f'round_{i}_A_original_score_evidence',
-            f'round_{i}_A_original_score_rhetoric',
-            f'round_{i}_A_original_score_belief',
-            f'round_{i}_A_feedback',
-            f'round_{i}_A_improved_arg',
-            f'round_{i}_A_improved_score_logic', 
-            f'round_{i}_A_improved_score_evidence', 
-            f'round_{i}_A_improved_score_rhetoric',
-            f'round_{i}_A_improved_score_belief',
-            
-            # Debater B - round i 
-            f'round_{i}_B_original_arg',
-            f'round_{i}_B_original_score_logic',
-            f'round_{i}_B_original_score_evidence',
-            f'round_{i}_B_original_score_rhetoric',
-            f'round_{i}_B_original_score_belief',
-            f'round_{i}_B_feedback',
-            f'round_{i}_B_improved_arg',
-            f'round_{i}_B_improved_score_logic', 
-            f'round_{i}_B_improved_score_evidence', 
-            f'round_{i}_B_improved_score_rhetoric',
-            f'round_{i}_B_improved_score_belief',
-        ])
-
-    # --- Prepare Data Row ---
-    row_data = {
-        'timestamp': datetime.now().isoformat(), 
-        'topic': topic, 
-        'debater_a': debater_a_name, 
-        'debater_b': debater_b_name
+    record = {
+        "topic": topic,
+        "orchestrator": "SelfImprovingDebateOrchestrator",
+        "debater_a": {"name": debater_a_name},
+        "debater_b": {"name": debater_b_name},
+        "history": history,
+        "scores": {debater_a_name: match_score(history, debater_a_name), debater_b_name: match_score(history, debater_b_name)},
     }
-
-    for i in range(1, max_rounds + 1):
-        # Find data for round i, debater A
-        turn_a = next((t for t in history if t['round'] == i and t['debater'] == debater_a_name), None)
-        if turn_a:
-            row_data[f'round_{i}_A_original_arg'] = turn_a.get('original_argument', '')
-            row_data[f'round_{i}_A_original_score_logic'] = turn_a.get('scores', {}).get('logic', '')
-            row_data[f'round_{i}_A_original_score_evidence'] = turn_a.get('scores', {}).get('factual', '')
-            row_data[f'round_{i}_A_original_score_rhetoric'] = turn_a.get('scores', {}).get('persuasive', '')
-            row_data[f'round_{i}_A_original_score_belief'] = turn_a.get('scores', {}).get('belief', '')
-            row_data[f'round_{i}_A_feedback'] = turn_a.get('feedback', '')
-            row_data[f'round_{i}_A_improved_arg'] = turn_a.get('improved_argument', '')
-            
-            # Get scores for improved arguments if they exist
-            improved_scores = turn_a.get('improved_scores', {})
-            row_data[f'round_{i}_A_improved_score_logic'] = improved_scores.get('logic', '')
-            row_data[f'round_{i}_A_improved_score_evidence'] = improved_scores.get('factual', '')
-            row_data[f'round_{i}_A_improved_score_rhetoric'] = improved_scores.get('persuasive', '')
-            row_data[f'round_{i}_A_improved_score_belief'] = improved_scores.get('belief', '')
-        else:  # Fill blanks if turn data missing
-            for key in ['original_arg', 'original_score_logic', 'original_score_evidence', 
-                       'original_score_rhetoric', 'original_score_belief', 'feedback', 'improved_arg', 
-                       'improved_score_logic', 'improved_score_evidence', 'improved_score_rhetoric', 
-                       'improved_score_belief']:
-                row_data[f'round_{i}_A_{key}'] = ''
-
-        # Find data for round i, debater B
-        turn_b = next((t for t in history if t['round'] == i and t['debater'] == debater_b_name), None)
-        if turn_b:
-            row_data[f'round_{i}_B_original_arg'] = turn_b.get('original_argument', '')
-            row_data[f'round_{i}_B_original_score_logic'] = turn_b.get('scores', {}).get('logic', '')
-            row_data[f'round_{i}_B_original_score_evidence'] = turn_b.get('scores', {}).get('factual', '')
-            row_data[f'round_{i}_B_original_score_rhetoric'] = turn_b.get('scores', {}).get('persuasive', '')
-            row_data[f'round_{i}_B_original_score_belief'] = turn_b.get('scores', {}).get('belief', '')
-            row_data[f'round_{i}_B_feedback'] = turn_b.get('feedback', '')
-            row_data[f'round_{i}_B_improved_arg'] = turn_b.get('improved_argument', '')
-            
-            # Get scores for improved arguments if they exist
-            improved_scores = turn_b.get('improved_scores', {})
-            row_data[f'round_{i}_B_improved_score_logic'] = improved_scores.get('logic', '')
-            row_data[f'round_{i}_B_improved_score_evidence'] = improved_scores.get('factual', '')
-            row_data[f'round_{i}_B_improved_score_rhetoric'] = improved_scores.get('persuasive', '')
-            row_data[f'round_{i}_B_improved_score_belief'] = improved_scores.get('belief', '')
-        else:  # Fill blanks if turn data missing
-            for key in ['original_arg', 'original_score_logic', 'original_score_evidence', 
-                       'original_score_rhetoric', 'original_score_belief', 'feedback', 'improved_arg', 
-                       'improved_score_logic', 'improved_score_evidence', 'improved_score_rhetoric', 
-                       'improved_score_belief']:
-                row_data[f'round_{i}_B_{key}'] = ''
-
-    # --- Write to CSV ---
-    file_exists = os.path.isfile(filename)
     try:
-        with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            if not file_exists:
-                writer.writeheader()  # Write header only if file is new
-            # Ensure all header fields exist in row_data, filling missing ones with empty strings
-            row_to_write = {header: row_data.get(header, '') for header in headers}
-            writer.writerow(row_to_write)
-        print(f"Self-improving debate results appended to {filename}")
-    except IOError as e:
-        print(f"Error writing to CSV file {filename}: {e}")
+        with ResultsStore(store_path) as store:
+            store.append(record)
+            store.export_wide(filename)
+        print(f"Self-improving debate results stored in {store_path}")
     except Exception as e:
-        print(f"An unexpected error occurred during CSV writing: {e}")
+        print(f"Error storing the debate results in {store_path} / {filename}: {e}")
 
 
 def compare_original_and_improved_arguments(history, debater_a_name, debater_b_name):